@@ -0,0 +1,333 @@
+# =================================================================
+#  UnlearnAI – benchmark suite
+#
+#  For every (customers, shards) combination: generates a synthetic
+#  customer file, starts the API in a fresh process and measures
+#    • cold start: training from scratch, then restoring the checkpoint
+#    • /predict latency (p50/p99) and QPS, /predict_batch rows/s
+#    • per-erasure retrain latency (/unlearn_trigger, wait=true)
+#    • batch-unlearn throughput (/unlearn_batch, wait=true)
+#  through the in-process test client, and writes everything as JSON.
+#
+#  python benchmarks/bench.py --customers 1000,10000 --shards 1,4 -o bench.json
+#  python benchmarks/bench.py --compare old.json new.json
+# =================================================================
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+import numpy as np
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, API_DIR)
+
+from benchmarks.generate_customers import FIRST_ID, generate_customers  # noqa: E402
+
+RESULT_FORMAT = 1
+
+def _ints(text: str) -> List[int]:
+    return [int(float(v)) for v in text.split(",") if v]
+
+def latency_summary(seconds: List[float]) -> Dict[str, float]:
+    ms = np.asarray(seconds, dtype=np.float64) * 1000.0
+    if not len(ms):
+        return {}
+    return {
+        "n": int(len(ms)),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(ms.max()),
+    }
+
+# -----------------------------------------------------------------
+#  One case, run in its own process
+# -----------------------------------------------------------------
+
+def run_case(case: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Measure one (customers, shards) configuration. Must run in a fresh
+    process: the API reads its settings from the environment at import.
+    """
+    work = case["work_dir"]
+    os.environ.update({
+        "UNLEARNAI_DATA": case["data"],
+        "UNLEARNAI_DATA_DIR": work,
+        "UNLEARNAI_INGEST": case["ingest"],
+        "UNLEARNAI_NUM_SHARDS": str(case["shards"]),
+        "UNLEARNAI_AUG_FACTOR": str(case["aug_factor"]),
+        "UNLEARNAI_TRAIN_EPOCHS": str(case["epochs"]),
+        "UNLEARNAI_CHECKPOINT": os.path.join(work, "checkpoint.pt"),
+        "UNLEARNAI_AUDIT_DB": os.path.join(work, "audit.db"),
+        "UNLEARNAI_FORCE_TRAIN": "1",
+        # measure the retrain itself, not the coalescing window
+        "UNLEARNAI_UNLEARN_WINDOW_MS": "0",
+        "UNLEARNAI_INFERENCE": case["inference"],
+        "UNLEARNAI_PREDICT_CACHE_SIZE": str(case["predict_cache"]),
+        "UNLEARNAI_MICROBATCH": "1" if case["microbatch"] else "0",
+    })
+    os.chdir(API_DIR)
+
+    t0 = time.perf_counter()
+    import nn_sisa_api as api
+    from fastapi.testclient import TestClient
+    result: Dict[str, Any] = {"import_s": time.perf_counter() - t0}
+
+    rng = np.random.default_rng(case["seed"])
+    n = case["customers"]
+    order = [str(FIRST_ID + i) for i in rng.permutation(n)]
+    n_erase = min(case["erasures"], n // 2)
+    n_batch = min(case["batch_unlearn"], n - n_erase)
+    erase_ids, batch_ids = order[:n_erase], order[n_erase:n_erase + n_batch]
+    predict_ids = order[n_erase + n_batch:] or order
+
+    # Cold start: train from scratch, then restart from the checkpoint
+    t0 = time.perf_counter()
+    client = TestClient(api.app)
+    client.__enter__()
+    result["cold_start_train_s"] = time.perf_counter() - t0
+    result["training_rows"] = len(api.ALL_RECORDS)
+    client.__exit__(None, None, None)
+
+    api.FORCE_TRAIN = False
+    t0 = time.perf_counter()
+    client = TestClient(api.app)
+    client.__enter__()
+    result["cold_start_restore_s"] = time.perf_counter() - t0
+
+    try:
+        # /predict, one customer per request
+        def predict_one(cid: str) -> float:
+            t = time.perf_counter()
+            r = client.post("/predict", json={"customer_id": cid})
+            r.raise_for_status()
+            return time.perf_counter() - t
+
+        for cid in predict_ids[:min(20, len(predict_ids))]:
+            predict_one(cid)   # warm-up
+        requests = [predict_ids[i % len(predict_ids)] for i in range(case["predict_requests"])]
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(case["concurrency"]) as pool:
+            latencies = list(pool.map(predict_one, requests))
+        wall = time.perf_counter() - t0
+        result["predict"] = {
+            **latency_summary(latencies),
+            "concurrency": case["concurrency"],
+            "qps": len(requests) / wall,
+        }
+
+        # /predict_batch
+        batch = predict_ids[:case["predict_batch_size"]]
+        t0 = time.perf_counter()
+        client.post("/predict_batch", json={"customer_ids": batch}).raise_for_status()
+        wall = time.perf_counter() - t0
+        result["predict_batch"] = {"rows": len(batch), "wall_s": wall, "rows_per_s": len(batch) / wall}
+
+        # Per-erasure retrain latency, one customer at a time
+        latencies, training_s, shards = [], [], []
+        for cid in erase_ids:
+            t = time.perf_counter()
+            r = client.post("/unlearn_trigger", json={"customer_id": cid, "wait": True})
+            r.raise_for_status()
+            latencies.append(time.perf_counter() - t)
+            body = r.json()
+            shards.append(body["retrained_shard"])
+            job = client.get(f"/unlearn_jobs/{body['job_id']}").json()
+            if job.get("training_s") is not None:
+                training_s.append(job["training_s"])
+        result["unlearn_single"] = {
+            **latency_summary(latencies),
+            "training": latency_summary(training_s),
+            "distinct_shards": len(set(shards)),
+        }
+
+        # Batch unlearn throughput
+        if batch_ids:
+            t0 = time.perf_counter()
+            r = client.post("/unlearn_batch", json={"customer_ids": batch_ids, "wait": True})
+            r.raise_for_status()
+            wall = time.perf_counter() - t0
+            result["unlearn_batch"] = {
+                "customers": len(batch_ids),
+                "shards_retrained": len(r.json()["shards_retrained"]),
+                "wall_s": wall,
+                "customers_per_s": len(batch_ids) / wall,
+            }
+    finally:
+        client.__exit__(None, None, None)
+    return result
+
+def _case_main(case_path: str, result_path: str):
+    with open(case_path) as f:
+        case = json.load(f)
+    result = run_case(case)
+    with open(result_path, "w") as f:
+        json.dump(result, f)
+
+# -----------------------------------------------------------------
+#  Driver
+# -----------------------------------------------------------------
+
+def environment() -> Dict[str, Any]:
+    import torch
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=API_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "torch": torch.__version__,
+        "cuda": torch.cuda.is_available(),
+        "git_commit": commit,
+    }
+
+def run_suite(args) -> Dict[str, Any]:
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="unlearnai-bench-")
+    settings = {
+        "aug_factor": args.aug_factor,
+        "epochs": args.epochs,
+        "ingest": args.ingest,
+        "inference": args.inference,
+        "predict_cache": args.predict_cache,
+        "microbatch": args.microbatch,
+        "erasures": args.erasures,
+        "batch_unlearn": args.batch_unlearn,
+        "predict_requests": args.predict_requests,
+        "predict_batch_size": args.predict_batch_size,
+        "concurrency": args.concurrency,
+        "seed": args.seed,
+    }
+    cases = []
+    for n in args.customers:
+        data = os.path.join(data_dir, f"customers_{n}_{args.seed}.csv")
+        if not os.path.exists(data):
+            t0 = time.perf_counter()
+            generate_customers(n, data, seed=args.seed)
+            print(f"generated {n} customers in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+        for shards in args.shards:
+            case = {**settings, "customers": n, "shards": shards, "data": data}
+            case["work_dir"] = tempfile.mkdtemp(prefix=f"case-{n}-{shards}-", dir=data_dir)
+            case_path = os.path.join(case["work_dir"], "case.json")
+            result_path = os.path.join(case["work_dir"], "result.json")
+            with open(case_path, "w") as f:
+                json.dump(case, f)
+
+            print(f"customers={n} shards={shards} ...", file=sys.stderr)
+            proc = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--case", case_path, "--result", result_path],
+                cwd=API_DIR,
+            )
+            entry = {"customers": n, "shards": shards}
+            if proc.returncode == 0:
+                with open(result_path) as f:
+                    entry["metrics"] = json.load(f)
+            else:
+                entry["error"] = f"exit code {proc.returncode}"
+            cases.append(entry)
+            print(json.dumps(entry), file=sys.stderr)
+            shutil.rmtree(case["work_dir"], ignore_errors=True)
+
+    if not args.data_dir:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    return {
+        "format": RESULT_FORMAT,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": environment(),
+        "settings": settings,
+        "cases": cases,
+    }
+
+# -----------------------------------------------------------------
+#  Comparing two runs
+# -----------------------------------------------------------------
+
+def _flatten(d: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    out = {}
+    for k, v in d.items():
+        if isinstance(v, dict):
+            out.update(_flatten(v, f"{prefix}{k}."))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            out[prefix + k] = float(v)
+    return out
+
+def compare(old: Dict[str, Any], new: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Per case and metric: old value, new value and new/old ratio."""
+    before = {(c["customers"], c["shards"]): _flatten(c.get("metrics", {})) for c in old["cases"]}
+    rows = []
+    for c in new["cases"]:
+        key = (c["customers"], c["shards"])
+        if key not in before:
+            continue
+        for metric, value in _flatten(c.get("metrics", {})).items():
+            prev = before[key].get(metric)
+            if prev is None:
+                continue
+            rows.append({
+                "customers": key[0], "shards": key[1], "metric": metric,
+                "old": prev, "new": value, "ratio": value / prev if prev else None,
+            })
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="UnlearnAI benchmark suite")
+    parser.add_argument("--customers", type=_ints, default=[1000, 10000],
+                        help="comma-separated customer counts, e.g. 1e3,1e4,1e5 (default: 1000,10000)")
+    parser.add_argument("--shards", type=_ints, default=[1, 4], help="comma-separated shard counts (default: 1,4)")
+    parser.add_argument("--aug-factor", type=int, default=1,
+                        help="UNLEARNAI_AUG_FACTOR; synthetic files are already noisy, so 1 by default")
+    parser.add_argument("--epochs", type=int, default=20, help="UNLEARNAI_TRAIN_EPOCHS (default: 20)")
+    parser.add_argument("--ingest", default="memory", choices=["memory", "stream"])
+    parser.add_argument("--inference", default="torch", help="UNLEARNAI_INFERENCE (default: torch)")
+    parser.add_argument("--predict-cache", type=int, default=0,
+                        help="UNLEARNAI_PREDICT_CACHE_SIZE (default: 0, i.e. measure the model)")
+    parser.add_argument("--microbatch", action="store_true", help="enable UNLEARNAI_MICROBATCH")
+    parser.add_argument("--erasures", type=int, default=5, help="single-customer erasures timed (default: 5)")
+    parser.add_argument("--batch-unlearn", type=int, default=100, help="customers in the batch erasure (default: 100)")
+    parser.add_argument("--predict-requests", type=int, default=1000, help="/predict calls timed (default: 1000)")
+    parser.add_argument("--predict-batch-size", type=int, default=10000, help="rows in the /predict_batch call")
+    parser.add_argument("--concurrency", type=int, default=1, help="threads issuing /predict calls (default: 1)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=None, help="where synthetic files and checkpoints go (default: a temp dir)")
+    parser.add_argument("-o", "--out", default=None, help="result JSON path (default: stdout)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files and exit")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        _case_main(args.case, args.result)
+        return
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            old = json.load(f)
+        with open(args.compare[1]) as f:
+            new = json.load(f)
+        print(json.dumps(compare(old, new), indent=2))
+        return
+
+    results = run_suite(args)
+    text = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
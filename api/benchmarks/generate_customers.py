@@ -0,0 +1,113 @@
+# =================================================================
+#  UnlearnAI – synthetic customer file generator
+#
+#  Writes a customers CSV with the same schema as customers.csv, at any
+#  size, for benchmarks. Every synthetic customer is a noisy copy of one
+#  of the template personas (labels included), so the models still have
+#  something to learn.
+#
+#  python benchmarks/generate_customers.py 100000 -o data/customers_1e5.csv
+# =================================================================
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = [
+    "customer_id", "customer_name", "age", "income", "tenure_months", "travel_ratio",
+    "online_ratio", "num_cards", "late_12m", "mobile_logins", "segment_label", "nbo_label", "score_label",
+]
+
+FIRST_NAMES = np.array([
+    "Sarah", "Omar", "Priya", "John", "Ayesha", "David", "Riya", "Ahmed", "Maria", "Wei",
+    "Fatima", "James", "Elena", "Ravi", "Noor", "Lucas", "Hana", "Yusuf", "Grace", "Arjun",
+])
+LAST_NAMES = np.array([
+    "Smith", "Abdullah", "Kumar", "Doe", "Khan", "Lee", "Patel", "Hassan", "Garcia", "Chen",
+    "Ali", "Brown", "Rossi", "Singh", "Haddad", "Silva", "Tanaka", "Yilmaz", "Okafor", "Nair",
+])
+
+# Per-column std-dev of the noise added to a persona's features
+# (age, income, tenure_months, travel_ratio, online_ratio, num_cards, late_12m, mobile_logins)
+NOISE_SIGMA = np.array([3.0, 2000.0, 6.0, 0.05, 0.05, 0.0, 0.0, 3.0])
+SCORE_SIGMA = 0.03
+
+FIRST_ID = 1001
+CHUNK_ROWS = 100_000
+
+def load_personas(template: str) -> pd.DataFrame:
+    df = pd.read_csv(template)
+    missing = [c for c in COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"{template} lacks columns {missing}")
+    return df[COLUMNS].reset_index(drop=True)
+
+def synth_chunk(personas: pd.DataFrame, first_id: int, n: int, rng: np.random.Generator) -> pd.DataFrame:
+    feature_cols = COLUMNS[2:10]
+    base = personas[feature_cols].to_numpy(dtype=np.float64)
+    pick = rng.integers(0, len(personas), size=n)
+
+    feats = base[pick] + rng.normal(size=(n, len(feature_cols))) * NOISE_SIGMA
+    feats = np.maximum(feats, 0.0)
+    feats[:, 3:5] = np.clip(feats[:, 3:5], 0.0, 1.0)   # travel/online ratios
+
+    ids = np.arange(first_id, first_id + n)
+    names = np.char.add(np.char.add(FIRST_NAMES[rng.integers(0, len(FIRST_NAMES), n)], " "),
+                        LAST_NAMES[rng.integers(0, len(LAST_NAMES), n)])
+    score = personas["score_label"].to_numpy(dtype=np.float64)[pick] + rng.normal(size=n) * SCORE_SIGMA
+
+    df = pd.DataFrame({
+        "customer_id": ids,
+        "customer_name": names,
+        "age": np.rint(feats[:, 0]).astype(np.int64),
+        "income": np.rint(feats[:, 1] / 100.0).astype(np.int64) * 100,
+        "tenure_months": np.rint(feats[:, 2]).astype(np.int64),
+        "travel_ratio": np.round(feats[:, 3], 2),
+        "online_ratio": np.round(feats[:, 4], 2),
+        "num_cards": feats[:, 5].astype(np.int64),
+        "late_12m": feats[:, 6].astype(np.int64),
+        "mobile_logins": np.rint(feats[:, 7]).astype(np.int64),
+        "segment_label": personas["segment_label"].to_numpy()[pick],
+        "nbo_label": personas["nbo_label"].to_numpy()[pick],
+        "score_label": np.round(np.clip(score, 0.0, 1.0), 2),
+    })
+    return df
+
+def generate_customers(
+    n: int,
+    out_path: str,
+    template: str = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "customers.csv"),
+    seed: int = 0,
+    chunk_rows: int = CHUNK_ROWS,
+) -> str:
+    """
+    Write n synthetic customers to out_path, chunk by chunk so 10^6+ rows
+    never sit in memory at once. The same (n, template, seed) always gives
+    the same file, so its checkpoint fingerprint is stable across runs.
+    """
+    personas = load_personas(template)
+    rng = np.random.default_rng(seed)
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    tmp = out_path + ".tmp"
+    for start in range(0, n, chunk_rows):
+        chunk = synth_chunk(personas, FIRST_ID + start, min(chunk_rows, n - start), rng)
+        chunk.to_csv(tmp, mode="w" if start == 0 else "a", header=start == 0, index=False)
+    os.replace(tmp, out_path)
+    return out_path
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic customers CSV")
+    parser.add_argument("customers", type=int, help="number of customers")
+    parser.add_argument("-o", "--out", required=True, help="output CSV path")
+    parser.add_argument("--template", default=None, help="persona file to sample from (default: customers.csv)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    kwargs = {"template": args.template} if args.template else {}
+    generate_customers(args.customers, args.out, seed=args.seed, **kwargs)
+    print(f"Wrote {args.customers} customers to {args.out}")
+
+if __name__ == "__main__":
+    main()
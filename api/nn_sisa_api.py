@@ -3,17 +3,48 @@
 #  Persona-Augmented Training and Regulator-Grade Metrics
 # =================================================================
 
+import asyncio
+import atexit
+import bisect
+import copy
+import cProfile
+import functools
+import hashlib
+import inspect
+import itertools
+import json
+import multiprocessing as mp
+import os
+import pstats
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+
+try:
+    import fcntl   # POSIX; only needed for UNLEARNAI_SHARED_STATE
+except ImportError:
+    fcntl = None
+from collections import OrderedDict, deque
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack, asynccontextmanager, contextmanager, nullcontext, suppress
+from contextvars import ContextVar
+
 import numpy as np
 import pandas as pd
 import torch
 from torch import nn
-from torch.utils.data import Dataset, DataLoader
-from dataclasses import dataclass
-from typing import List, Dict, Any, Tuple
+from torch.func import functional_call, stack_module_state, vmap
+from dataclasses import dataclass, field, replace
+from typing import List, Dict, Any, Optional, Tuple, Callable
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, conlist
 
 # =================================================================
 #  LABEL MAPPINGS
@@ -35,9 +66,424 @@ CARD_NAMES = {
 BASELINE_NBO = np.array([0.78, 0.18, 0.04], dtype=np.float32)  # mostly Silver
 BASELINE_SCORE = 0.50
 
-# Demo mode: 1 shard, 7 personas with augmentation
-NUM_SHARDS = 1
-AUG_FACTOR = 20  # number of synthetic samples per customer persona
+# Demo mode: 1 shard, 7 personas with augmentation. With NUM_SHARDS > 1
+# customers are hashed to shards and an erasure retrains only the owning shard.
+NUM_SHARDS = int(os.environ.get("UNLEARNAI_NUM_SHARDS", 1))
+# SISA slices per shard: a checkpoint is kept before every slice so an
+# erasure only retrains the slices from the forgotten customer's onwards.
+NUM_SLICES = int(os.environ.get("UNLEARNAI_NUM_SLICES", 4))
+# number of synthetic samples per customer persona
+AUG_FACTOR = int(os.environ.get("UNLEARNAI_AUG_FACTOR", 20))
+
+# Data source (CSV or Parquet). INGEST_MODE "memory" loads it with pandas;
+# "stream" reads it in chunks into memory-mapped columns under DATA_DIR,
+# for customer bases that do not fit in RAM.
+DATA_PATH = os.environ.get("UNLEARNAI_DATA", "customers.csv")
+INGEST_MODE = os.environ.get("UNLEARNAI_INGEST", "memory")
+DATA_DIR = os.environ.get("UNLEARNAI_DATA_DIR", "data")
+INGEST_CHUNK_ROWS = int(os.environ.get("UNLEARNAI_CHUNK_ROWS", 100_000))
+# Most customers one /ingest call may add (memory mode only)
+INGEST_MAX_BATCH = int(os.environ.get("UNLEARNAI_INGEST_MAX_BATCH", 10_000))
+
+# Trained ensemble + unlearning state, saved after training and after every
+# unlearning run; startup restores it instead of training when it matches
+# the data file ("" disables it). UNLEARNAI_FORCE_TRAIN=1 retrains anyway.
+CHECKPOINT_PATH = os.environ.get("UNLEARNAI_CHECKPOINT", os.path.join(DATA_DIR, "checkpoint.pt"))
+FORCE_TRAIN = os.environ.get("UNLEARNAI_FORCE_TRAIN", "0") == "1"
+
+# SQLite file holding the unlearning event log and per-customer metrics,
+# shared across restarts and workers ("" keeps them in memory only).
+AUDIT_DB_PATH = os.environ.get("UNLEARNAI_AUDIT_DB", os.path.join(DATA_DIR, "audit.db"))
+
+# Multi-worker mode: workers share the checkpoint (models, forgotten set)
+# and the audit database (version counter, requested erasures). Training
+# and unlearning run in one worker at a time; the others hot-reload what
+# changed every SYNC_INTERVAL_S.
+SHARED_STATE = os.environ.get("UNLEARNAI_SHARED_STATE", "0") == "1"
+SYNC_INTERVAL_S = float(os.environ.get("UNLEARNAI_SYNC_INTERVAL_S", 1.0))
+
+# Unlearning mode when a request does not pick one: "exact" (SISA shard
+# retrain) or "approximate" (gradient ascent on the customer's rows plus a
+# short fine-tune on the rest of the shard, a few seconds). An approximate
+# update is only published if the customer's metrics show at least
+# APPROX_MIN_CE_CHANGE more NBO cross-entropy, a KL to BASELINE_NBO of at most
+# APPROX_MAX_BASELINE_KL_RATIO times the one before (the personalization gap
+# must not widen), and the shard's retained loss rose by at most
+# APPROX_MAX_RETAIN_LOSS_INCREASE; otherwise the shard is retrained exactly.
+UNLEARN_MODES = ("exact", "approximate")
+UNLEARN_MODE = os.environ.get("UNLEARNAI_UNLEARN_MODE", "exact")
+APPROX_ASCENT_STEPS = int(os.environ.get("UNLEARNAI_APPROX_ASCENT_STEPS", 20))
+APPROX_FINETUNE_STEPS = int(os.environ.get("UNLEARNAI_APPROX_FINETUNE_STEPS", 200))
+APPROX_MIN_CE_CHANGE = float(os.environ.get("UNLEARNAI_APPROX_MIN_CE_CHANGE", 0.1))
+APPROX_MAX_BASELINE_KL_RATIO = float(os.environ.get("UNLEARNAI_APPROX_MAX_BASELINE_KL_RATIO", 1.0))
+APPROX_MAX_RETAIN_LOSS_INCREASE = float(os.environ.get("UNLEARNAI_APPROX_MAX_RETAIN_LOSS_INCREASE", 0.05))
+
+# Erasures arriving within this window are merged into one retrain.
+UNLEARN_WINDOW_MS = float(os.environ.get("UNLEARNAI_UNLEARN_WINDOW_MS", 500))
+
+# Shard (re)training policy, see RetrainPolicy. The defaults train a fixed
+# 100-epoch budget; a patience > 0 stops each slice stage once the monitored
+# loss plateaus (on a held-out fraction of rows if EARLY_STOP_HOLDOUT > 0).
+TRAIN_EPOCHS = int(os.environ.get("UNLEARNAI_TRAIN_EPOCHS", 100))
+EARLY_STOP_PATIENCE = int(os.environ.get("UNLEARNAI_EARLY_STOP_PATIENCE", 0))
+EARLY_STOP_HOLDOUT = float(os.environ.get("UNLEARNAI_EARLY_STOP_HOLDOUT", 0.0))
+MAX_BATCH_SIZE = int(os.environ.get("UNLEARNAI_MAX_BATCH_SIZE", 4096))
+LR_SCHEDULE = os.environ.get("UNLEARNAI_LR_SCHEDULE", "constant")
+WARM_START = os.environ.get("UNLEARNAI_WARM_START", "1") == "1"
+
+# Shard training fans out to this many worker processes (1 = in-process).
+TRAIN_WORKERS = int(os.environ.get("UNLEARNAI_TRAIN_WORKERS", os.cpu_count() or 1))
+TRAIN_SEED = 42
+
+# Opt-in micro-batching for /predict: concurrent requests are coalesced
+# for up to MICROBATCH_WINDOW_MS (or MICROBATCH_MAX_BATCH rows) and scored
+# in one batched ensemble pass.
+MICROBATCH = os.environ.get("UNLEARNAI_MICROBATCH", "0") == "1"
+MICROBATCH_WINDOW_MS = float(os.environ.get("UNLEARNAI_MICROBATCH_WINDOW_MS", 2.0))
+MICROBATCH_MAX_BATCH = int(os.environ.get("UNLEARNAI_MICROBATCH_MAX_BATCH", 64))
+
+# Inference engine for the shard models: "torch" (vmapped modules),
+# "numpy" (fused float32 arrays, no torch dispatch), "int8" (numpy with
+# per-channel int8 weights, dequantized per call) or "jit" (traced stacked
+# module). A new engine is built for every published snapshot and checked
+# against torch on a probe batch; beyond INFERENCE_TOLERANCE it falls back
+# to torch.
+INFERENCE_ENGINE = os.environ.get("UNLEARNAI_INFERENCE", "torch")
+INFERENCE_TOLERANCE = float(os.environ.get(
+    "UNLEARNAI_INFERENCE_TOLERANCE", 0.05 if INFERENCE_ENGINE == "int8" else 1e-4
+))
+
+# /predict cache of per-shard outputs (entries = customer x shard pairs;
+# 0 disables it). Entries also expire after PREDICT_CACHE_TTL_S (0 = never).
+PREDICT_CACHE_SIZE = int(os.environ.get("UNLEARNAI_PREDICT_CACHE_SIZE", 100_000))
+PREDICT_CACHE_TTL_S = float(os.environ.get("UNLEARNAI_PREDICT_CACHE_TTL_S", 3600))
+
+# Embedding index behind /similar: largest k per query, and how many
+# retained customers the forgetting check compares a forgotten one with.
+SIMILAR_MAX_K = int(os.environ.get("UNLEARNAI_SIMILAR_MAX_K", 100))
+FORGETTING_CHECK_SAMPLE = int(os.environ.get("UNLEARNAI_FORGETTING_CHECK_SAMPLE", 1000))
+
+# On-demand profiling, off unless UNLEARNAI_PROFILE=1. A /predict* or
+# /unlearn_* call sent with header X-UnlearnAI-Profile (or ?profile=)
+# cprofile|torch is profiled; with PROFILE_SAMPLE_N > 0 so is one in N of
+# them. Profiles go to PROFILE_DIR (newest PROFILE_KEEP kept) and are
+# listed at /internal/profiles.
+PROFILE_ENABLED = os.environ.get("UNLEARNAI_PROFILE", "0") == "1"
+PROFILE_DIR = os.environ.get("UNLEARNAI_PROFILE_DIR", os.path.join(DATA_DIR, "profiles"))
+PROFILE_SAMPLE_N = int(os.environ.get("UNLEARNAI_PROFILE_SAMPLE_N", 0))
+PROFILE_SAMPLE_KIND = os.environ.get("UNLEARNAI_PROFILE_SAMPLE_KIND", "cprofile")
+PROFILE_KEEP = int(os.environ.get("UNLEARNAI_PROFILE_KEEP", 100))
+
+# Stage timers, counters and gauges served at /internal/stats
+# (Prometheus text format); "0" turns recording off.
+STATS_ENABLED = os.environ.get("UNLEARNAI_STATS", "1") == "1"
+
+# CSV feature columns, in model input order
+FEATURE_COLUMNS = [
+    "age",
+    "income",
+    "tenure_months",
+    "travel_ratio",
+    "online_ratio",
+    "num_cards",
+    "late_12m",
+    "mobile_logins",
+]
+
+# Per-column std-dev of the Gaussian noise used for persona augmentation
+# (num_cards and late_12m stay exact)
+AUG_NOISE_SIGMA = np.array([0.5, 500.0, 1.0, 0.02, 0.02, 0.0, 0.0, 2.0])
+
+# =================================================================
+#  INSTRUMENTATION
+# =================================================================
+
+# Latency histogram bucket bounds, in seconds
+STATS_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0,
+)
+
+class Histogram:
+    __slots__ = ("buckets", "sum", "count")
+
+    def __init__(self):
+        self.buckets = [0] * (len(STATS_BUCKETS) + 1)   # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.buckets[bisect.bisect_left(STATS_BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+def _labels(labels: Dict[str, Any]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _label_text(labels: Tuple[Tuple[str, str], ...], extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class Stats:
+    """
+    In-process latency histograms, counters and gauges, rendered in the
+    Prometheus text format by /internal/stats. Recording costs a dict
+    lookup, a bisect and a few adds under one lock, so it stays on in
+    production. Gauges are either set directly or computed at scrape time
+    by a registered function, returning a number, None (not exported) or
+    {((label, value), ...): number} for a labelled series.
+    """
+    def __init__(self, prefix: str = "unlearnai", enabled: bool = True):
+        self.prefix = prefix
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._help: Dict[str, str] = {}
+        self._histograms: Dict[str, Dict[Tuple, Histogram]] = {}
+        self._counters: Dict[str, Dict[Tuple, float]] = {}
+        self._gauges: Dict[str, Dict[Tuple, float]] = {}
+        self._gauge_fns: Dict[str, Callable[[], Any]] = {}
+
+    def describe(self, name: str, text: str):
+        self._help[name] = text
+
+    def observe(self, name: str, seconds: float, **labels):
+        if not self.enabled:
+            return
+        key = _labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = Histogram()
+            hist.observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Observe the wall time of the with-block into histogram name."""
+        if not self.enabled:
+            yield
+            return
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0, **labels)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        if not self.enabled:
+            return
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._gauges.setdefault(name, {})[_labels(labels)] = value
+
+    def gauge(self, name: str, fn: Callable[[], Any], help: str = ""):
+        self._gauge_fns[name] = fn
+        if help:
+            self.describe(name, help)
+
+    def render(self) -> str:
+        with self._lock:
+            histograms = {n: {k: (list(h.buckets), h.sum, h.count) for k, h in s.items()} for n, s in self._histograms.items()}
+            counters = {n: dict(s) for n, s in self._counters.items()}
+            gauges = {n: dict(s) for n, s in self._gauges.items()}
+        for name, fn in self._gauge_fns.items():
+            value = fn()
+            if value is None:
+                continue
+            if isinstance(value, dict):
+                gauges[name] = {_labels(dict(labels)): v for labels, v in value.items()}
+            else:
+                gauges[name] = {(): value}
+
+        lines: List[str] = []
+
+        def header(name: str, kind: str):
+            full = f"{self.prefix}_{name}"
+            if name in self._help:
+                lines.append(f"# HELP {full} {self._help[name]}")
+            lines.append(f"# TYPE {full} {kind}")
+            return full
+
+        for name in sorted(histograms):
+            full = header(name, "histogram")
+            for key, (buckets, total, count) in sorted(histograms[name].items()):
+                cumulative = 0
+                for bound, n in zip(STATS_BUCKETS + (float("inf"),), buckets):
+                    cumulative += n
+                    le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                    lines.append(f"{full}_bucket{_label_text(key, le)} {cumulative}")
+                lines.append(f"{full}_sum{_label_text(key)} {total!r}")
+                lines.append(f"{full}_count{_label_text(key)} {count}")
+        for name in sorted(counters):
+            full = header(name, "counter")
+            for key, value in sorted(counters[name].items()):
+                lines.append(f"{full}{_label_text(key)} {value!r}")
+        for name in sorted(gauges):
+            full = header(name, "gauge")
+            for key, value in sorted(gauges[name].items()):
+                lines.append(f"{full}{_label_text(key)} {float(value)!r}")
+        return "\n".join(lines) + "\n"
+
+STATS = Stats(enabled=STATS_ENABLED)
+STATS.describe("stage_seconds", "Wall time of pipeline stages (load, augment, normalize, metrics, ...)")
+STATS.describe("shard_train_seconds", "Wall time of one shard (re)training run")
+STATS.describe("shard_train_epochs_total", "Training epochs run, per shard")
+STATS.describe("shard_train_batches_total", "Optimizer steps run, per shard")
+STATS.describe("shard_train_loss", "Training loss of the last epoch of the last run, per shard")
+STATS.describe("predict_forward_seconds", "Wall time of one ensemble forward pass, by inference engine")
+STATS.describe("shard_predict_rows_total", "Rows scored, per shard")
+STATS.describe("json_render_seconds", "Wall time spent serializing JSON responses")
+STATS.describe("http_request_seconds", "Request latency, by route and method")
+
+# =================================================================
+#  PROFILING
+# =================================================================
+
+PROFILE_KINDS = ("cprofile", "torch")
+PROFILE_ROUTES = ("/predict", "/predict_batch", "/unlearn_trigger", "/unlearn_batch")
+
+# {"kind", "file"} for the request being served, set by ProfileSelector;
+# profiled() fills in "file"
+PROFILE_REQUEST: ContextVar[Optional[Dict[str, Any]]] = ContextVar("profile_request", default=None)
+
+# one profile at a time: the torch profiler cannot overlap itself, and
+# concurrent cProfile runs would each see the other's load
+_PROFILE_LOCK = threading.Lock()
+
+def _op(name: str):
+    """torch profiler label for a block, only while the torch profiler runs."""
+    return torch.profiler.record_function(name) if torch.autograd._profiler_enabled() else nullcontext()
+
+def _prune_profiles():
+    stems = sorted(
+        {os.path.splitext(f)[0] for f in os.listdir(PROFILE_DIR)},
+        reverse=True,   # names start with a timestamp
+    )
+    for stem in stems[PROFILE_KEEP:]:
+        for f in os.listdir(PROFILE_DIR):
+            if os.path.splitext(f)[0] == stem:
+                with suppress(OSError):
+                    os.remove(os.path.join(PROFILE_DIR, f))
+
+@contextmanager
+def profiled(kind: Optional[str], label: str):
+    """
+    Run the with-block under cProfile or the torch profiler (kind; None
+    runs it unprofiled) and save the result under PROFILE_DIR:
+      cprofile: <name>.prof (pstats) and <name>.txt (top functions)
+      torch:    <name>.json (chrome trace) and <name>.txt (per-op table,
+                including the fit.*/train.* labels of the training loop)
+    cProfile only sees the calling thread. If another profile is running
+    the block runs unprofiled. Yields a dict whose "file" is set to the
+    .txt summary's name once saved.
+    """
+    out: Dict[str, Any] = {"file": None}
+    if kind not in PROFILE_KINDS or not _PROFILE_LOCK.acquire(blocking=False):
+        yield out
+        return
+    try:
+        now = time.time()
+        # sorts by time; the random part keeps workers sharing PROFILE_DIR apart
+        name = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}-{int(now * 1000) % 1000:03d}{uuid.uuid4().hex[:3]}-{label}-{kind}"
+        path = os.path.join(PROFILE_DIR, name)
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        if kind == "cprofile":
+            prof = cProfile.Profile()
+            prof.enable()
+            try:
+                yield out
+            finally:
+                prof.disable()
+                prof.dump_stats(path + ".prof")
+                with open(path + ".txt", "w") as f:
+                    pstats.Stats(prof, stream=f).sort_stats("cumulative").print_stats(60)
+        else:
+            activities = [torch.profiler.ProfilerActivity.CPU]
+            if torch.cuda.is_available():
+                activities.append(torch.profiler.ProfilerActivity.CUDA)
+            with torch.profiler.profile(activities=activities) as prof:
+                yield out
+            prof.export_chrome_trace(path + ".json")
+            with open(path + ".txt", "w") as f:
+                f.write(prof.key_averages().table(sort_by="self_cpu_time_total", row_limit=60))
+        out["file"] = name + ".txt"
+        _prune_profiles()
+    finally:
+        _PROFILE_LOCK.release()
+
+def request_profile_kind() -> Optional[str]:
+    """Profiler kind requested for the current request, if any."""
+    request = PROFILE_REQUEST.get()
+    return request["kind"] if request else None
+
+def profilable(label: str):
+    """
+    Endpoint decorator: run the handler under the profiler its request
+    asked for (see ProfileSelector) and report the saved file back.
+    Meant for sync handlers, which run start to end in one threadpool
+    thread. Around an async handler cProfile is approximate at best: it
+    only sees the event-loop thread, misses work the handler awaits in
+    other threads, and charges it with whatever other coroutines run in
+    the meantime (which is why /predict profiles its forward itself, see
+    predict_customer).
+    """
+    def wrap(fn):
+        @contextmanager
+        def scope():
+            request = PROFILE_REQUEST.get()
+            with profiled(request and request["kind"], label) as out:
+                yield
+            if request is not None:
+                request["file"] = out["file"]
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def handler(*args, **kwargs):
+                with scope():
+                    return await fn(*args, **kwargs)
+        else:
+            @functools.wraps(fn)
+            def handler(*args, **kwargs):
+                with scope():
+                    return fn(*args, **kwargs)
+        return handler
+    return wrap
+
+def list_profiles() -> List[Dict[str, Any]]:
+    """Saved profiles, newest first."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    by_stem: Dict[str, List[str]] = {}
+    for f in os.listdir(PROFILE_DIR):
+        by_stem.setdefault(os.path.splitext(f)[0], []).append(f)
+    profiles = []
+    for stem in sorted(by_stem, reverse=True):
+        files = sorted(by_stem[stem])
+        paths = [os.path.join(PROFILE_DIR, f) for f in files]
+        # <yyyymmdd-hhmmss>-<6 hex>-<label>-<kind>
+        label, _, kind = stem[23:].rpartition("-")
+        try:
+            created = time.mktime(time.strptime(stem[:15], "%Y%m%d-%H%M%S"))
+        except ValueError:   # not one of ours
+            continue
+        profiles.append({
+            "name": stem,
+            "label": label,
+            "kind": kind,
+            "created": created,
+            "files": files,
+            "bytes": sum(os.path.getsize(p) for p in paths if os.path.exists(p)),
+        })
+    return profiles
 
 # =================================================================
 #  CUSTOMER RECORD
@@ -51,12 +497,232 @@ class CustomerRecord:
     segment: int
     nbo: int
     score: float
-    full_data: Dict[str, Any]
+    full_data: Optional[Dict[str, Any]]   # None when display rows are read lazily from disk
+
+# =================================================================
+#  COLUMNAR RECORD STORE (TRAINING ROWS)
+# =================================================================
+
+@dataclass
+class RecordStore:
+    """
+    Column-oriented training rows: one contiguous float32 feature matrix
+    plus label vectors and an int-coded customer column (~42 bytes/row).
+    customer_ids is the code table (code -> customer_id); it is shared,
+    not copied, by every subset taken from the store.
+
+    Rows are kept grouped by customer and indexed code -> (start, count),
+    so removing a customer only touches that customer's rows: they are
+    tombstoned in the alive mask, and the store compacts itself once more
+    than COMPACT_DEAD_FRACTION of its rows are dead.
+    """
+    features: np.ndarray      # (N, input_dim) float32
+    segment: np.ndarray       # (N,) int8
+    nbo: np.ndarray           # (N,) int8
+    score: np.ndarray         # (N,) float32
+    cust_idx: np.ndarray      # (N,) int32 codes into customer_ids
+    customer_ids: List[str]
+    code_of: Dict[str, int] = None          # customer_id -> code, shared like customer_ids
+    alive: Optional[np.ndarray] = None      # tombstone mask, None = every row alive
+    n_dead: int = 0
+    # customer index: sorted codes present, and each one's row range
+    _codes: Optional[np.ndarray] = field(default=None, repr=False)
+    _start: Optional[np.ndarray] = field(default=None, repr=False)
+    _count: Optional[np.ndarray] = field(default=None, repr=False)
+
+    COMPACT_DEAD_FRACTION = 0.5
+
+    def __post_init__(self):
+        if self.code_of is None:
+            self.code_of = {c: i for i, c in enumerate(self.customer_ids)}
+
+    @classmethod
+    def empty(cls, customer_ids: List[str], input_dim: int = 8) -> "RecordStore":
+        return cls(
+            features=np.empty((0, input_dim), dtype=np.float32),
+            segment=np.empty(0, dtype=np.int8),
+            nbo=np.empty(0, dtype=np.int8),
+            score=np.empty(0, dtype=np.float32),
+            cust_idx=np.empty(0, dtype=np.int32),
+            customer_ids=customer_ids,
+        )
+
+    def __len__(self) -> int:
+        """Number of live rows."""
+        return len(self.cust_idx) - self.n_dead
+
+    def _index(self):
+        """
+        Build the code -> row range index (once). Rows are expected to be
+        grouped by customer already; if they are not, regroup them first.
+        """
+        if self._codes is not None:
+            return
+        idx = self.cust_idx
+        if len(idx) and len(np.unique(idx)) != int(np.count_nonzero(np.diff(idx))) + 1:
+            self._permute(np.argsort(idx, kind="stable"))
+            idx = self.cust_idx
+        run_start = np.flatnonzero(np.r_[True, np.diff(idx) != 0]) if len(idx) else np.empty(0, dtype=np.int64)
+        run_count = np.diff(np.r_[run_start, len(idx)])
+        order = np.argsort(idx[run_start], kind="stable")
+        self._codes = idx[run_start][order]
+        self._start = run_start[order]
+        self._count = run_count[order]
+
+    def _permute(self, order: np.ndarray):
+        self.features = self.features[order]
+        self.segment = self.segment[order]
+        self.nbo = self.nbo[order]
+        self.score = self.score[order]
+        self.cust_idx = self.cust_idx[order]
+        if self.alive is not None:
+            self.alive = self.alive[order]
+        self._codes = self._start = self._count = None
+
+    def rows_of(self, cid: str) -> slice:
+        """Row range holding cid (empty slice if absent)."""
+        self._index()
+        code = self.code_of.get(cid, -1)
+        pos = np.searchsorted(self._codes, code)
+        if pos == len(self._codes) or self._codes[pos] != code:
+            return slice(0, 0)
+        start = int(self._start[pos])
+        return slice(start, start + int(self._count[pos]))
+
+    def remove(self, cids) -> int:
+        """
+        Tombstone every row of the given customers in O(rows removed).
+        Returns the number of rows removed.
+        """
+        removed = 0
+        for cid in cids:
+            rows = self.rows_of(cid)
+            if rows.stop == rows.start:
+                continue
+            if self.alive is None:
+                self.alive = np.ones(len(self.cust_idx), dtype=bool)
+            n = int(np.count_nonzero(self.alive[rows]))
+            self.alive[rows] = False
+            removed += n
+        self.n_dead += removed
+        if self.n_dead > self.COMPACT_DEAD_FRACTION * len(self.cust_idx):
+            self.compact()
+        return removed
+
+    def compact(self):
+        """Physically drop tombstoned rows (amortised over many removals)."""
+        if self.alive is None:
+            return
+        live = self.alive
+        self.alive = None
+        self.n_dead = 0
+        self._permute(np.flatnonzero(live))
+
+    def permuted(self, order: np.ndarray, out_dir: Optional[str] = None, block: int = 1_000_000) -> "RecordStore":
+        """
+        Rows reordered by order. With out_dir the columns are gathered
+        block by block into new memory-mapped files instead of RAM.
+        """
+        if out_dir is None:
+            return self.take(order)
+
+        os.makedirs(out_dir, exist_ok=True)
+        cols = {}
+        for name in ("features", "segment", "nbo", "score", "cust_idx"):
+            src = getattr(self, name)
+            path = os.path.join(out_dir, f"{name}.npy")
+            dst = np.lib.format.open_memmap(
+                path + ".tmp", mode="w+", dtype=src.dtype, shape=(len(order),) + src.shape[1:]
+            )
+            for i in range(0, len(order), block):
+                dst[i:i + block] = src[order[i:i + block]]
+            dst.flush()
+            del dst
+            # replace, never rewrite: stores built earlier may still map the old file
+            os.replace(path + ".tmp", path)
+            cols[name] = np.load(path, mmap_mode="r")
+
+        out = RecordStore(customer_ids=self.customer_ids, code_of=self.code_of, **cols)
+        if self.alive is not None:
+            out.alive = self.alive[order]
+            out.n_dead = self.n_dead
+        return out
+
+    def fork(self) -> "RecordStore":
+        """
+        Copy that shares the (read-only) columns but has its own tombstone
+        mask, so removals on the fork leave this store untouched.
+        """
+        return replace(self, alive=None if self.alive is None else self.alive.copy())
+
+    def take(self, rows) -> "RecordStore":
+        """
+        Subset by row positions, boolean mask or slice. A slice of a
+        memory-mapped store stays a view on the same files.
+        """
+        sub = RecordStore(
+            features=self.features[rows],
+            segment=self.segment[rows],
+            nbo=self.nbo[rows],
+            score=self.score[rows],
+            cust_idx=self.cust_idx[rows],
+            customer_ids=self.customer_ids,
+            code_of=self.code_of,
+        )
+        if self.alive is not None:
+            sub.alive = self.alive[rows]
+            sub.n_dead = int(len(sub.alive) - np.count_nonzero(sub.alive))
+        return sub
+
+    def live(self) -> "RecordStore":
+        """Compacted view of the live rows (self when nothing is dead)."""
+        if self.n_dead == 0:
+            return self
+        return self.take(self.alive)
+
+    def customers(self) -> List[str]:
+        """Distinct live customer_ids, in row order."""
+        self._index()
+        by_row = np.argsort(self._start)
+        starts, codes = self._start[by_row], self._codes[by_row]
+        if self.alive is not None:
+            keep = self.alive[starts]
+            starts, codes = starts[keep], codes[keep]
+        return [self.customer_ids[c] for c in codes]
+
+    @staticmethod
+    def concat(stores: List["RecordStore"]) -> "RecordStore":
+        stores = [s.live() for s in stores]
+        return RecordStore(
+            features=np.concatenate([s.features for s in stores]),
+            segment=np.concatenate([s.segment for s in stores]),
+            nbo=np.concatenate([s.nbo for s in stores]),
+            score=np.concatenate([s.score for s in stores]),
+            cust_idx=np.concatenate([s.cust_idx for s in stores]),
+            customer_ids=stores[0].customer_ids,
+            code_of=stores[0].code_of,
+        )
 
 # =================================================================
 #  CSV LOADER
 # =================================================================
 
+def read_customer_chunks(path: str, chunk_rows: int = INGEST_CHUNK_ROWS):
+    """
+    Yield the customer file as DataFrame chunks. CSV is read with pandas'
+    chunked reader, Parquet batch by batch via pyarrow (optional dependency,
+    only needed for .parquet files).
+    """
+    if path.endswith((".parquet", ".pq")):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError("Reading Parquet customer files requires pyarrow") from e
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_rows)
+
 def load_customers_from_csv(csv_path: str):
     """
     Load customers from CSV.
@@ -65,43 +731,41 @@ def load_customers_from_csv(csv_path: str):
     numeric IDs like 1001, 1002 work consistently with the API,
     which passes customer_id as a string.
     """
-    df = pd.read_csv(csv_path)
-
-    records: List[CustomerRecord] = []
-    name_to_id: Dict[str, str] = {}
-    id_to_record: Dict[str, CustomerRecord] = {}
-
-    for _, row in df.iterrows():
-        features = np.array(
-            [
-                row["age"],
-                row["income"],
-                row["tenure_months"],
-                row["travel_ratio"],
-                row["online_ratio"],
-                row["num_cards"],
-                row["late_12m"],
-                row["mobile_logins"],
-            ],
-            dtype=np.float32,
-        )
-
-        # 🔑 Ensure ID is always a string (e.g. "1001")
-        cid = str(row["customer_id"])
-
-        rec = CustomerRecord(
+    if csv_path.endswith((".parquet", ".pq")):
+        df = pd.concat(read_customer_chunks(csv_path), ignore_index=True)
+    else:
+        df = pd.read_csv(csv_path)
+
+    features = df[FEATURE_COLUMNS].to_numpy(dtype=np.float32)
+
+    # 🔑 Ensure ID is always a string (e.g. "1001")
+    ids = df["customer_id"].astype(str).tolist()
+    names = df["customer_name"].tolist()
+    segments = df["segment_label"].astype(int).tolist()
+    nbos = df["nbo_label"].astype(int).tolist()
+    scores = df["score_label"].astype(float).tolist()
+
+    # Display rows: column lists zipped into dicts (much faster than
+    # iterrows()/to_dict per row on large files)
+    columns = list(df.columns)
+    full_rows = [dict(zip(columns, vals)) for vals in zip(*(df[c].tolist() for c in columns))]
+
+    records: List[CustomerRecord] = [
+        CustomerRecord(
             customer_id=cid,
-            customer_name=row["customer_name"],
-            features=features,
-            segment=int(row["segment_label"]),
-            nbo=int(row["nbo_label"]),
-            score=float(row["score_label"]),
-            full_data=row.to_dict(),
+            customer_name=name,
+            features=feats,
+            segment=seg,
+            nbo=nbo,
+            score=score,
+            full_data=full,
         )
-
-        records.append(rec)
-        name_to_id[row["customer_name"]] = cid
-        id_to_record[cid] = rec
+        for cid, name, feats, seg, nbo, score, full in zip(
+            ids, names, features, segments, nbos, scores, full_rows
+        )
+    ]
+    name_to_id: Dict[str, str] = dict(zip(names, ids))
+    id_to_record: Dict[str, CustomerRecord] = dict(zip(ids, records))
 
     return records, name_to_id, id_to_record
 
@@ -109,72 +773,248 @@ def load_customers_from_csv(csv_path: str):
 #  DATA AUGMENTATION (PERSONA CLUSTERS)
 # =================================================================
 
-def augment_personas(records: List[CustomerRecord], factor: int = AUG_FACTOR) -> List[CustomerRecord]:
+def _augment_block(base: np.ndarray, factor: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Noisy copies of a block of persona rows, shape (len(base) * factor, dim).
+    Only the columns that actually get noise consume random numbers, in
+    the same per-sample order as the original scalar loop, so seed 1234
+    reproduces it exactly -- and feeding consecutive blocks through one
+    generator gives the same rows as a single whole-population draw.
+    """
+    noisy = np.flatnonzero(AUG_NOISE_SIGMA)
+    z = rng.standard_normal((len(base), factor, len(noisy)))
+    noise = np.zeros((len(base), factor, base.shape[1]), dtype=np.float32)
+    noise[..., noisy] = (z * AUG_NOISE_SIGMA[noisy]).astype(np.float32)
+    return (base[:, None, :] + noise).reshape(len(base) * factor, base.shape[1])
+
+def augment_personas(records: List[CustomerRecord], factor: int = AUG_FACTOR, seed: int = 1234) -> RecordStore:
     """
     For each customer persona, create a small cluster of synthetic
     variants (slight noise on continuous features). All share the same
     customer_id, labels and score, so removing that id removes the cluster.
     """
-    augmented: List[CustomerRecord] = []
+    n_cust = len(records)
+    base = (
+        np.stack([r.features for r in records]).astype(np.float32)
+        if records else np.empty((0, len(FEATURE_COLUMNS)), dtype=np.float32)
+    )
 
-    rng = np.random.default_rng(1234)
+    def per_row(values, dtype):
+        return np.repeat(np.asarray(values, dtype=dtype), factor)
 
-    for r in records:
-        for _ in range(factor):
-            # Small Gaussian noise on continuous features
-            age_noise = rng.normal(0.0, 0.5)
-            income_noise = rng.normal(0.0, 500.0)
-            tenure_noise = rng.normal(0.0, 1.0)
-            travel_noise = rng.normal(0.0, 0.02)
-            online_noise = rng.normal(0.0, 0.02)
-            cards_noise = 0.0
-            late_noise = 0.0
-            logins_noise = rng.normal(0.0, 2.0)
-
-            feats = r.features.copy()
-            feats[0] += age_noise
-            feats[1] += income_noise
-            feats[2] += tenure_noise
-            feats[3] += travel_noise
-            feats[4] += online_noise
-            feats[5] += cards_noise
-            feats[6] += late_noise
-            feats[7] += logins_noise
-
-            augmented.append(
-                CustomerRecord(
-                    customer_id=r.customer_id,
-                    customer_name=r.customer_name,
-                    features=feats.astype(np.float32),
-                    segment=r.segment,
-                    nbo=r.nbo,
-                    score=r.score,
-                    full_data=r.full_data,
-                )
-            )
+    store = RecordStore(
+        features=_augment_block(base, factor, np.random.default_rng(seed)),
+        segment=per_row([r.segment for r in records], np.int8),
+        nbo=per_row([r.nbo for r in records], np.int8),
+        score=per_row([r.score for r in records], np.float32),
+        cust_idx=per_row(np.arange(n_cust), np.int32),
+        customer_ids=[r.customer_id for r in records],
+    )
 
-    return augmented
+    return store
 
 # =================================================================
-#  DATASET + MODEL
+#  STREAMING INGEST (LARGER-THAN-MEMORY CUSTOMER FILES)
 # =================================================================
 
-class TabularDataset(Dataset):
-    def __init__(self, records: List[CustomerRecord]):
-        self.records = records
+class PersonaTable(Mapping):
+    """
+    Read-only customer_id -> CustomerRecord mapping over columnar persona
+    data (features memory-mapped). Records are built on access, and
+    full_data is left None: display rows are re-read from the source file.
+    """
+    def __init__(self, customer_ids, code_of, names, features, segment, nbo, score):
+        self.customer_ids = customer_ids
+        self.code_of = code_of
+        self.names = names
+        self.features = features
+        self.segment = segment
+        self.nbo = nbo
+        self.score = score
+
+    def __getitem__(self, cid: str) -> CustomerRecord:
+        code = self.code_of[cid]
+        return CustomerRecord(
+            customer_id=cid,
+            customer_name=self.names[code],
+            features=np.array(self.features[code]),
+            segment=int(self.segment[code]),
+            nbo=int(self.nbo[code]),
+            score=float(self.score[code]),
+            full_data=None,
+        )
+
+    def __contains__(self, cid) -> bool:
+        return cid in self.code_of
 
-    def __len__(self):
-        return len(self.records)
+    def __iter__(self):
+        return iter(self.customer_ids)
 
-    def __getitem__(self, idx):
-        rec = self.records[idx]
-        return (
-            torch.tensor(rec.features, dtype=torch.float32),
-            torch.tensor(rec.segment, dtype=torch.long),
-            torch.tensor(rec.nbo, dtype=torch.long),
-            torch.tensor(rec.score, dtype=torch.float32),
-            rec.customer_id,
-        )
+    def __len__(self) -> int:
+        return len(self.customer_ids)
+
+def _normalize_inplace(mm: np.ndarray, feature_min: np.ndarray, feature_range: np.ndarray, block: int = 1_000_000):
+    for i in range(0, len(mm), block):
+        mm[i:i + block] = (mm[i:i + block] - feature_min) / feature_range
+    mm.flush()
+
+def stream_customers(path: str, factor: int = AUG_FACTOR, out_dir: str = DATA_DIR, chunk_rows: int = INGEST_CHUNK_ROWS):
+    """
+    One pass over the customer file, chunk by chunk: augment each chunk,
+    append its columns to flat files under out_dir and fold it into the
+    running min/max. The feature files are then normalized in place and
+    reopened as read-only memory maps.
+
+    Like load_customers_from_csv, a customer_id that appears more than
+    once is one customer holding its last row: the rows of earlier
+    occurrences are dropped (and left out of the min/max), so every id
+    has a single code and unlearning it removes all of its data.
+
+    Returns (personas, records, feature_min, feature_max, feature_range),
+    the same normalization stats normalize_features() would produce.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(1234)
+    dim = len(FEATURE_COLUMNS)
+
+    feature_min = np.full(dim, np.inf, dtype=np.float32)
+    feature_max = np.full(dim, -np.inf, dtype=np.float32)
+    customer_ids: List[str] = []
+    names: List[str] = []
+    code_of: Dict[str, int] = {}
+    persona_row: List[int] = []   # code -> file row of the customer's last occurrence
+    superseded: List[int] = []    # file rows replaced by a later row of the same id
+    n_file = 0
+
+    def f(name):
+        return os.path.join(out_dir, name)
+
+    # written under .tmp names and swapped in at the end, so memory maps
+    # held by a previous ingest never see their file truncated
+    files = {n: open(f(n + ".bin.tmp"), "wb") for n in (
+        "aug_features", "aug_segment", "aug_nbo", "aug_score", "aug_cust_idx",
+        "persona_features", "persona_segment", "persona_nbo", "persona_score",
+    )}
+    try:
+        for chunk in read_customer_chunks(path, chunk_rows):
+            base = chunk[FEATURE_COLUMNS].to_numpy(dtype=np.float32)
+            seg = chunk["segment_label"].to_numpy(dtype=np.int8)
+            nbo = chunk["nbo_label"].to_numpy(dtype=np.int8)
+            score = chunk["score_label"].to_numpy(dtype=np.float32)
+            codes = np.empty(len(chunk), dtype=np.int32)
+            for i, (cid, name) in enumerate(zip(chunk["customer_id"].astype(str).tolist(), chunk["customer_name"].tolist())):
+                code = code_of.get(cid)
+                if code is None:
+                    code = code_of[cid] = len(customer_ids)
+                    customer_ids.append(cid)
+                    names.append(name)
+                    persona_row.append(n_file + i)
+                else:
+                    superseded.append(persona_row[code])
+                    names[code] = name
+                    persona_row[code] = n_file + i
+                codes[i] = code
+            n_file += len(chunk)
+
+            aug = _augment_block(base, factor, rng)
+            if len(aug):
+                np.minimum(feature_min, aug.min(axis=0), out=feature_min)
+                np.maximum(feature_max, aug.max(axis=0), out=feature_max)
+
+            files["aug_features"].write(aug.tobytes())
+            files["aug_segment"].write(np.repeat(seg, factor).tobytes())
+            files["aug_nbo"].write(np.repeat(nbo, factor).tobytes())
+            files["aug_score"].write(np.repeat(score, factor).tobytes())
+            files["aug_cust_idx"].write(np.repeat(codes, factor).tobytes())
+            files["persona_features"].write(base.tobytes())
+            files["persona_segment"].write(seg.tobytes())
+            files["persona_nbo"].write(nbo.tobytes())
+            files["persona_score"].write(score.tobytes())
+    finally:
+        for fh in files.values():
+            fh.close()
+    for n in files:
+        os.replace(f(n + ".bin.tmp"), f(n + ".bin"))
+
+    n_cust, n_rows = len(customer_ids), n_file * factor
+
+    def mm(name, dtype, shape, mode="r"):
+        if shape[0] == 0:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(f(name + ".bin"), dtype=dtype, mode=mode, shape=shape)
+
+    alive = None
+    if superseded:
+        # min/max over the rows that are kept, as the in-memory path sees them
+        alive = np.ones(n_rows, dtype=bool)
+        alive[(np.asarray(superseded)[:, None] * factor + np.arange(factor)).ravel()] = False
+        feature_min = np.full(dim, np.inf, dtype=np.float32)
+        feature_max = np.full(dim, -np.inf, dtype=np.float32)
+        aug_mm = mm("aug_features", np.float32, (n_rows, dim))
+        for i in range(0, n_rows, 1_000_000):
+            block = aug_mm[i:i + 1_000_000][alive[i:i + 1_000_000]]
+            if len(block):
+                np.minimum(feature_min, block.min(axis=0), out=feature_min)
+                np.maximum(feature_max, block.max(axis=0), out=feature_max)
+        del aug_mm
+    feature_range = np.where(feature_max - feature_min == 0, 1.0, feature_max - feature_min).astype(np.float32)
+
+    for name, rows in (("aug_features", n_rows), ("persona_features", n_file)):
+        if rows:
+            _normalize_inplace(mm(name, np.float32, (rows, dim), mode="r+"), feature_min, feature_range)
+
+    if superseded:
+        # persona columns: one row per code, the customer's last occurrence
+        order = np.asarray(persona_row, dtype=np.int64)
+        for name, dtype, shape in (
+            ("persona_features", np.float32, (dim,)), ("persona_segment", np.int8, ()),
+            ("persona_nbo", np.int8, ()), ("persona_score", np.float32, ()),
+        ):
+            src = mm(name, dtype, (n_file,) + shape)
+            dst = np.memmap(f(name + ".bin.tmp"), dtype=dtype, mode="w+", shape=(n_cust,) + shape)
+            for i in range(0, n_cust, 1_000_000):
+                dst[i:i + 1_000_000] = src[order[i:i + 1_000_000]]
+            dst.flush()
+            del src, dst
+            os.replace(f(name + ".bin.tmp"), f(name + ".bin"))
+
+    records = RecordStore(
+        features=mm("aug_features", np.float32, (n_rows, dim)),
+        segment=mm("aug_segment", np.int8, (n_rows,)),
+        nbo=mm("aug_nbo", np.int8, (n_rows,)),
+        score=mm("aug_score", np.float32, (n_rows,)),
+        cust_idx=mm("aug_cust_idx", np.int32, (n_rows,)),
+        customer_ids=customer_ids,
+        code_of=code_of,
+    )
+    if alive is not None:
+        records = records.permuted(np.flatnonzero(alive), f("dedup"))
+    personas = PersonaTable(
+        customer_ids=customer_ids,
+        code_of=code_of,
+        names=names,
+        features=mm("persona_features", np.float32, (n_cust, dim)),
+        segment=mm("persona_segment", np.int8, (n_cust,)),
+        nbo=mm("persona_nbo", np.int8, (n_cust,)),
+        score=mm("persona_score", np.float32, (n_cust,)),
+    )
+    return personas, records, feature_min, feature_max, feature_range
+
+def iter_customers_json(path: str, chunk_rows: int = INGEST_CHUNK_ROWS):
+    """Stream the customer file as one JSON array, a chunk at a time."""
+    yield "["
+    first = True
+    for chunk in read_customer_chunks(path, chunk_rows):
+        if chunk.empty:
+            continue
+        body = chunk.to_json(orient="records")[1:-1]
+        yield body if first else "," + body
+        first = False
+    yield "]"
+
+# =================================================================
+#  MODEL
+# =================================================================
 
 class MultiTaskNN(nn.Module):
     """
@@ -203,217 +1043,1244 @@ class MultiTaskNN(nn.Module):
     def encode(self, x):
         return self.backbone(x)
 
-# =================================================================
-#  SISA ENSEMBLE (DEMO MODE: NUM_SHARDS = 1)
-# =================================================================
+def _snapshot_state(model: nn.Module, opt: torch.optim.Optimizer) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Detached copy of model + optimizer state for a slice checkpoint."""
+    return copy.deepcopy(model.state_dict()), copy.deepcopy(opt.state_dict())
 
 @dataclass
 class SISAShard:
     shard_id: int
     model: MultiTaskNN
     customers: List[str]
+    # checkpoints[k] = (model_state, optimizer_state) *before* slice k is
+    # trained; checkpoints[-1] is the final model.
+    checkpoints: List[Tuple[Dict[str, Any], Dict[str, Any]]] = field(default_factory=list)
+    # how the model was trained: epochs used vs. budget, wall time, ...
+    report: Dict[str, Any] = field(default_factory=dict)
+
+def stable_shard_for(customer_id: str, num_shards: int) -> int:
+    """
+    Deterministic customer -> shard assignment. Uses CRC32 rather than
+    Python's hash() so the mapping is identical across processes/restarts.
+    """
+    return zlib.crc32(str(customer_id).encode("utf-8")) % num_shards
+
+def slice_epochs(epochs: int, num_slices: int) -> int:
+    """
+    Epochs per slice stage. Stage k trains on slices 0..k, so using
+    2e/(r+1) epochs per stage keeps the total number of gradient steps
+    roughly equal to e epochs over the whole shard (Bourtoule et al.).
+    """
+    return max(1, int(round(2 * epochs / (num_slices + 1))))
+
+# =================================================================
+#  SHARD TRAINING (IN-PROCESS OR ON A PROCESS POOL)
+# =================================================================
+
+# Retrain progress per shard (epochs done / epochs planned), in shared
+# memory so pool workers can report it back to the API process.
+TRAIN_EPOCHS_DONE = mp.get_context("spawn").Array("l", NUM_SHARDS, lock=False)
+TRAIN_EPOCHS_TOTAL = mp.get_context("spawn").Array("l", NUM_SHARDS, lock=False)
+
+def reset_train_progress(shard_ids):
+    for sid in shard_ids:
+        if sid < len(TRAIN_EPOCHS_DONE):
+            TRAIN_EPOCHS_DONE[sid] = TRAIN_EPOCHS_TOTAL[sid] = 0
+
+@dataclass(frozen=True)
+class RetrainPolicy:
+    """
+    How a shard is (re)trained. The budget is spread over the slice stages
+    (slice_epochs); each stage can stop early once the monitored loss has
+    not improved by more than min_delta for patience epochs. Shards larger
+    than batch_size * steps_per_epoch rows train with proportionally larger
+    batches, up to max_batch_size. warm_start resumes a retrain from the
+    checkpoint before the earliest changed slice instead of from scratch.
+    """
+    epochs: int = 100
+    patience: int = 0              # 0 = always run the full budget
+    min_delta: float = 1e-3
+    holdout: float = 0.0           # fraction of rows monitored; 0 = training loss
+    batch_size: int = 128
+    max_batch_size: int = 4096
+    steps_per_epoch: int = 256
+    lr: float = 1e-3
+    lr_schedule: str = "constant"  # "constant", or "cosine" down to lr_min over each slice stage
+    lr_min: float = 1e-5
+    warm_start: bool = True
+
+    def batch_size_for(self, n: int) -> int:
+        return int(min(max(self.batch_size, -(-n // self.steps_per_epoch)), max(self.max_batch_size, self.batch_size)))
+
+    def lr_at(self, epoch: int, total: int) -> float:
+        if self.lr_schedule == "cosine" and total > 1:
+            return self.lr_min + 0.5 * (self.lr - self.lr_min) * (1 + np.cos(np.pi * epoch / (total - 1)))
+        return self.lr
+
+RETRAIN_POLICY = RetrainPolicy(
+    epochs=TRAIN_EPOCHS,
+    patience=EARLY_STOP_PATIENCE,
+    holdout=EARLY_STOP_HOLDOUT,
+    max_batch_size=MAX_BATCH_SIZE,
+    lr_schedule=LR_SCHEDULE,
+    warm_start=WARM_START,
+)
+
+def _fit(
+    model: MultiTaskNN,
+    opt: torch.optim.Optimizer,
+    data: RecordStore,
+    epochs: int,
+    device: str,
+    policy: RetrainPolicy = RetrainPolicy(),
+    on_epoch: Optional[Callable[[], None]] = None,
+) -> Tuple[int, bool, int, Optional[float]]:
+    """
+    Minibatch training straight off the columnar store: the shard's columns
+    become tensors once, and each epoch draws shuffled index batches.
+    Returns (epochs run, stopped early, batches run, mean training loss of
+    the last epoch, or None if no epoch ran).
+    """
+    with _op("fit.to_tensor"):
+        X = torch.from_numpy(np.ascontiguousarray(data.features)).to(device)
+        seg = torch.from_numpy(data.segment).long().to(device)
+        nbo = torch.from_numpy(data.nbo).long().to(device)
+        score = torch.from_numpy(data.score).to(device)
+
+    held = None
+    if policy.patience and policy.holdout > 0 and len(data) >= 10:
+        rows = torch.randperm(len(data), device=device)
+        n_held = max(1, int(len(data) * policy.holdout))
+        held = tuple(t[rows[:n_held]] for t in (X, seg, nbo, score))
+        X, seg, nbo, score = (t[rows[n_held:]] for t in (X, seg, nbo, score))
+    n = len(X)
+    batch_size = policy.batch_size_for(n)
+
+    ce = nn.CrossEntropyLoss()
+    mse = nn.MSELoss()
+
+    def loss_of(x, s, b, y):
+        seg_logits, nbo_logits, score_pred = model(x)
+        return ce(seg_logits, s) + ce(nbo_logits, b) + 0.5 * mse(score_pred, y)
+
+    best, stale, batches = float("inf"), 0, 0
+    for epoch in range(epochs):
+        for group in opt.param_groups:
+            group["lr"] = policy.lr_at(epoch, epochs)
+        running = torch.zeros((), device=device)
+        perm = torch.randperm(n, device=device)
+        for start in range(0, n, batch_size):
+            idx = perm[start:start + batch_size]
+            with _op("fit.gather_batch"):
+                batch = X[idx], seg[idx], nbo[idx], score[idx]
+
+            with _op("fit.forward_backward"):
+                opt.zero_grad()
+                loss = loss_of(*batch)
+                loss.backward()
+            with _op("fit.optimizer_step"):
+                opt.step()
+            running += loss.detach() * len(idx)   # no host sync until the epoch is read
+            batches += 1
+        if on_epoch is not None:
+            on_epoch()
+
+        if policy.patience:
+            if held is not None:
+                with torch.no_grad():
+                    monitored = float(loss_of(*held))
+            else:
+                monitored = float(running) / max(n, 1)
+            if monitored < best - policy.min_delta:
+                best, stale = monitored, 0
+            else:
+                stale += 1
+                if stale >= policy.patience:
+                    return epoch + 1, True, batches, float(running) / max(n, 1)
+    return epochs, False, batches, (float(running) / max(n, 1) if epochs else None)
+
+def _train_slices(
+    shard_id: int,
+    slices: List[RecordStore],
+    policy: RetrainPolicy,
+    from_slice: int,
+    checkpoints: List[Tuple[Dict[str, Any], Dict[str, Any]]],
+    input_dim: int,
+    device: str,
+):
+    """
+    Train one shard slice by slice, resuming from checkpoints[from_slice]
+    when given (checkpoints must then hold from_slice + 1 entries).
+    Stage k trains on the union of slices 0..k, and a model/optimizer
+    checkpoint is appended after every stage.
+
+    Runs with its own RNG stream seeded by shard_id, so the result is the
+    same whether it runs in the API process or in a pool worker.
+    Returns (final_model_state, checkpoints, report) where report holds the
+    epochs actually used and the wall time.
+    """
+    t0 = time.perf_counter()
+    with torch.random.fork_rng(devices=[]):
+        torch.manual_seed(TRAIN_SEED + shard_id)
+
+        model = MultiTaskNN(input_dim).to(device)
+        opt = torch.optim.Adam(model.parameters(), lr=policy.lr)
+
+        if from_slice > 0:
+            checkpoints = list(checkpoints)
+            model_state, opt_state = checkpoints[from_slice]
+            model.load_state_dict(model_state)
+            opt.load_state_dict(opt_state)
+        else:
+            checkpoints = [_snapshot_state(model, opt)]
+
+        stage_epochs = slice_epochs(policy.epochs, len(slices))
+        budget = stage_epochs * (len(slices) - from_slice)
+        tracked = shard_id < len(TRAIN_EPOCHS_DONE)
+        if tracked:
+            TRAIN_EPOCHS_DONE[shard_id] = 0
+            TRAIN_EPOCHS_TOTAL[shard_id] = budget
+
+        used = 0
+        stopped_early = 0
+        batches = 0
+        loss = None
+
+        def on_epoch():
+            nonlocal used
+            used += 1
+            if tracked:
+                TRAIN_EPOCHS_DONE[shard_id] += 1
+
+        batch_size = policy.batch_size
+        for k in range(from_slice, len(slices)):
+            with _op("train.concat_slices"):
+                seen = RecordStore.concat(slices[:k + 1])
+            if len(seen):
+                _, early, stage_batches, loss = _fit(model, opt, seen, stage_epochs, device, policy, on_epoch)
+                stopped_early += early
+                batches += stage_batches
+                batch_size = policy.batch_size_for(len(seen))
+            elif tracked:
+                TRAIN_EPOCHS_DONE[shard_id] += stage_epochs
+            with _op("train.checkpoint"):
+                checkpoints.append(_snapshot_state(model, opt))
+
+    report = {
+        "from_slice": from_slice,
+        "epochs_used": used,
+        "epochs_budget": budget,
+        "stages_stopped_early": stopped_early,
+        "batch_size": batch_size,
+        "batches": batches,
+        "loss": round(loss, 6) if loss is not None else None,
+        "wall_s": round(time.perf_counter() - t0, 4),
+    }
+    return model.state_dict(), checkpoints, report
+
+def record_train_stats(shard_id: int, report: Dict[str, Any]):
+    """Feed a _train_slices report (possibly from a pool worker) into STATS."""
+    STATS.observe("shard_train_seconds", report["wall_s"], shard=shard_id)
+    STATS.inc("shard_train_epochs_total", report["epochs_used"], shard=shard_id)
+    STATS.inc("shard_train_batches_total", report["batches"], shard=shard_id)
+    if report["loss"] is not None:
+        STATS.set("shard_train_loss", report["loss"], shard=shard_id)
+
+def _approximate_unlearn(
+    model: MultiTaskNN,
+    forget: RecordStore,
+    retain: RecordStore,
+    device: str,
+    ascent_steps: int = 20,
+    finetune_steps: int = 200,
+    lr: float = 1e-3,
+    batch_size: int = 128,
+    seed: int = TRAIN_SEED,
+) -> Tuple[MultiTaskNN, Dict[str, Any]]:
+    """
+    Approximate unlearning on a copy of model: gradient ascent on the
+    forgotten rows (clipped), then a short fine-tune on sampled retained
+    rows to repair collateral damage. Cost is independent of how many
+    slices/epochs an exact retrain would need.
+    Returns (model, report) with the retained-data loss before and after.
+    """
+    t0 = time.perf_counter()
+    model = copy.deepcopy(model)
+    opt = torch.optim.Adam(model.parameters(), lr=lr)
+    ce = nn.CrossEntropyLoss()
+    mse = nn.MSELoss()
+
+    def tensors(store: RecordStore):
+        store = store.live()
+        return (
+            torch.from_numpy(np.ascontiguousarray(store.features)).to(device),
+            torch.from_numpy(np.asarray(store.segment)).long().to(device),
+            torch.from_numpy(np.asarray(store.nbo)).long().to(device),
+            torch.from_numpy(np.ascontiguousarray(store.score)).to(device),
+        )
+
+    def loss_of(x, s, b, y):
+        seg_logits, nbo_logits, score_pred = model(x)
+        return ce(seg_logits, s) + ce(nbo_logits, b) + 0.5 * mse(score_pred, y)
+
+    fx = tensors(forget)
+    rx = tensors(retain)
+    n_retain = len(rx[0])
+
+    with torch.random.fork_rng(devices=[]):
+        torch.manual_seed(seed)
+        probe = torch.randint(n_retain, (min(n_retain, 4096),), device=device) if n_retain else None
+        with torch.no_grad():
+            retain_before = float(loss_of(*(t[probe] for t in rx))) if n_retain else 0.0
+
+        for _ in range(ascent_steps if len(fx[0]) else 0):
+            opt.zero_grad()
+            (-loss_of(*fx)).backward()
+            nn.utils.clip_grad_norm_(model.parameters(), 1.0)
+            opt.step()
+
+        for _ in range(finetune_steps if n_retain else 0):
+            idx = torch.randint(n_retain, (min(batch_size, n_retain),), device=device)
+            opt.zero_grad()
+            loss_of(*(t[idx] for t in rx)).backward()
+            opt.step()
+
+        with torch.no_grad():
+            retain_after = float(loss_of(*(t[probe] for t in rx))) if n_retain else 0.0
+
+    return model, {
+        "ascent_steps": ascent_steps,
+        "finetune_steps": finetune_steps if n_retain else 0,
+        "retain_loss_before": retain_before,
+        "retain_loss_after": retain_after,
+        "wall_s": round(time.perf_counter() - t0, 4),
+    }
+
+def _init_train_worker(num_threads: int, epochs_done, epochs_total):
+    global TRAIN_EPOCHS_DONE, TRAIN_EPOCHS_TOTAL
+    # Each worker gets its share of the cores so N workers x intra-op
+    # threads does not oversubscribe the machine.
+    torch.set_num_threads(num_threads)
+    TRAIN_EPOCHS_DONE, TRAIN_EPOCHS_TOTAL = epochs_done, epochs_total
+
+def _train_slices_job(args):
+    return _train_slices(*args)
+
+_TRAIN_POOL = None
+
+def get_train_pool():
+    """
+    Lazily created process pool shared by startup, /reset and batch
+    unlearning. Returns None when parallel training is disabled.
+    """
+    global _TRAIN_POOL
+    if TRAIN_WORKERS <= 1:
+        return None
+    if _TRAIN_POOL is None:
+        # spawn rather than fork: the API process runs threads (uvicorn,
+        # torch) whose locks must not be inherited mid-flight.
+        ctx = mp.get_context("spawn")
+        threads = max(1, (os.cpu_count() or 1) // TRAIN_WORKERS)
+        _TRAIN_POOL = ProcessPoolExecutor(
+            max_workers=TRAIN_WORKERS,
+            mp_context=ctx,
+            initializer=_init_train_worker,
+            initargs=(threads, TRAIN_EPOCHS_DONE, TRAIN_EPOCHS_TOTAL),
+        )
+        atexit.register(_TRAIN_POOL.shutdown, wait=False, cancel_futures=True)
+    return _TRAIN_POOL
+
+# =================================================================
+#  INFERENCE ENGINES (STACKED SHARD FORWARD)
+# =================================================================
+# An engine runs every voting shard of a snapshot at once. outputs(X)
+# returns per-shard (seg_logits (S, n, 3), nbo_logits (S, n, 3),
+# scores (S, n)) as numpy; index selects a subset of the S shards.
+# predict(X) returns the ensemble vote (seg_probs, nbo_probs, scores).
+
+def _softmax(z: np.ndarray) -> np.ndarray:
+    e = np.exp(z - z.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+class TorchEngine:
+    """
+    All shards as one vmapped forward over weights stacked along a leading
+    shard axis (torch.func). The reference the other engines are checked
+    against.
+    """
+    name = "torch"
+
+    def __init__(self, models: List[MultiTaskNN], device: str):
+        self.models = models
+        self.device = device
+        params, self.buffers = stack_module_state(models)
+        self.params = {k: v.detach() for k, v in params.items()}
+        template = copy.deepcopy(models[0]).to("meta")
+        # functional_call swaps tensors into the module it is given, so
+        # each thread (threadpool, micro-batcher) needs its own skeleton
+        local = threading.local()
+
+        def run(p, b, x):
+            if not hasattr(local, "skeleton"):
+                local.skeleton = copy.deepcopy(template)
+            return functional_call(local.skeleton, (p, b), (x,))
+
+        self.forward = vmap(run, in_dims=(0, 0, None))
+
+    def _tensor(self, X: np.ndarray) -> torch.Tensor:
+        return torch.from_numpy(np.ascontiguousarray(X, dtype=np.float32)).to(self.device)
+
+    def outputs(self, X: np.ndarray, index: Optional[List[int]] = None):
+        x = self._tensor(X)
+        with torch.no_grad():
+            if index is None:
+                return tuple(o.cpu().numpy() for o in self.forward(self.params, self.buffers, x))
+            outs = [self.models[i](x) for i in index]
+            return tuple(torch.stack([o[k] for o in outs]).cpu().numpy() for k in range(3))
+
+    def predict(self, X: np.ndarray):
+        with torch.no_grad():
+            seg, nbo, score = self.forward(self.params, self.buffers, self._tensor(X))
+            return (
+                torch.softmax(seg.mean(0), dim=-1).cpu().numpy(),
+                torch.softmax(nbo.mean(0), dim=-1).cpu().numpy(),
+                score.mean(0).cpu().numpy(),
+            )
+
+def _fused_weights(models: List[MultiTaskNN]) -> Dict[str, np.ndarray]:
+    """
+    Stacked float32 weights of the shard models, transposed for x @ W, with
+    the three heads fused into one (hidden, 7) matrix: seg | nbo | score.
+    """
+    def stack(get):
+        return np.stack([get(m).detach().cpu().numpy() for m in models]).astype(np.float32)
+
+    bb = lambda m: m.backbone
+    return {
+        "w1": stack(lambda m: bb(m)[0].weight.T),          # (S, in, h)
+        "b1": stack(lambda m: bb(m)[0].bias)[:, None, :],  # (S, 1, h)
+        "ln_g": stack(lambda m: bb(m)[2].weight)[:, None, :],
+        "ln_b": stack(lambda m: bb(m)[2].bias)[:, None, :],
+        "w2": stack(lambda m: bb(m)[3].weight.T),
+        "b2": stack(lambda m: bb(m)[3].bias)[:, None, :],
+        "wh": stack(lambda m: torch.cat([m.segment_head.weight, m.nbo_head.weight, m.score_head.weight]).T),
+        "bh": stack(lambda m: torch.cat([m.segment_head.bias, m.nbo_head.bias, m.score_head.bias]))[:, None, :],
+    }
+
+def _quantize_int8(w: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-output-channel int8 quantization of (S, in, out) weights."""
+    scale = np.maximum(np.abs(w).max(axis=1, keepdims=True), 1e-12) / 127.0
+    return np.clip(np.round(w / scale), -127, 127).astype(np.int8), scale.astype(np.float32)
+
+class NumpyEngine:
+    """
+    The shard MLPs in plain NumPy: two batched matmuls with ReLU and
+    LayerNorm between them, then one fused matmul for the three heads. No
+    tensors, dispatch or device copies, which dominate single-row latency.
+    With quantize only int8 weight matrices with per-channel scales are
+    kept (a quarter of the float32 size) and dequantized on every call;
+    NumPy has no int8 GEMM, so this trades a bounded error and a little
+    latency for resident size, not speed.
+    """
+    def __init__(self, models: List[MultiTaskNN], quantize: bool = False):
+        self.name = "int8" if quantize else "numpy"
+        self.eps = float(models[0].backbone[2].eps)
+        w = _fused_weights(models)
+        # weight matrix -> (int8 values, float32 scales), when quantized
+        self.int8 = {k: _quantize_int8(w.pop(k)) for k in ("w1", "w2", "wh")} if quantize else {}
+        self.w = w
+
+    def _weights(self, index: Optional[List[int]] = None) -> Dict[str, np.ndarray]:
+        """float32 weights of all shards, or of those at index (int8 ones dequantized)."""
+        def pick(v):
+            return v if index is None else v[index]
+        w = {k: pick(v) for k, v in self.w.items()}
+        for k, (q, scale) in self.int8.items():
+            w[k] = pick(q).astype(np.float32) * pick(scale)
+        return w
+
+    def outputs(self, X: np.ndarray, index: Optional[List[int]] = None):
+        w = self._weights(index)
+        x = np.asarray(X, dtype=np.float32)
+        h = np.maximum(x @ w["w1"] + w["b1"], 0.0)                 # (S, n, h)
+        mu = h.mean(axis=-1, keepdims=True)
+        var = np.square(h - mu).mean(axis=-1, keepdims=True)
+        h = (h - mu) / np.sqrt(var + self.eps) * w["ln_g"] + w["ln_b"]
+        h = np.maximum(h @ w["w2"] + w["b2"], 0.0)
+        out = h @ w["wh"] + w["bh"]                                  # (S, n, 7)
+        score = 1.0 / (1.0 + np.exp(-out[..., 6]))
+        return out[..., 0:3], out[..., 3:6], score.astype(np.float32)
+
+    def predict(self, X: np.ndarray):
+        seg, nbo, score = self.outputs(X)
+        return (
+            _softmax(seg.mean(0)).astype(np.float32),
+            _softmax(nbo.mean(0)).astype(np.float32),
+            score.mean(0),
+        )
+
+class _StackedMLP(nn.Module):
+    """The fused NumPy forward as a torch module, for torch.jit.trace."""
+    def __init__(self, w: Dict[str, np.ndarray], eps: float):
+        super().__init__()
+        for k, v in w.items():
+            self.register_buffer(k, torch.from_numpy(v))
+        self.eps = eps
+
+    def forward(self, x):
+        h = torch.relu(torch.matmul(x, self.w1) + self.b1)
+        h = torch.nn.functional.layer_norm(h, h.shape[-1:], eps=self.eps) * self.ln_g + self.ln_b
+        h = torch.relu(torch.matmul(h, self.w2) + self.b2)
+        out = torch.matmul(h, self.wh) + self.bh
+        return out[..., 0:3], out[..., 3:6], torch.sigmoid(out[..., 6])
+
+class JitEngine(NumpyEngine):
+    """The fused stacked forward traced with torch.jit (one graph, no vmap)."""
+    def __init__(self, models: List[MultiTaskNN], device: str):
+        super().__init__(models)
+        self.name = "jit"
+        self.device = device
+        module = _StackedMLP(self.w, self.eps).to(device).eval()
+        example = torch.zeros(2, self.w["w1"].shape[1], device=device)
+        with torch.no_grad():
+            self.traced = torch.jit.freeze(torch.jit.trace(module, example))
+
+    def outputs(self, X: np.ndarray, index: Optional[List[int]] = None):
+        if index is not None:
+            return super().outputs(X, index)
+        x = torch.from_numpy(np.ascontiguousarray(X, dtype=np.float32)).to(self.device)
+        with torch.no_grad():
+            return tuple(o.cpu().numpy() for o in self.traced(x))
+
+# engine builds / fallbacks to torch and the worst probe error seen
+ENGINE_STATS: Dict[str, Any] = {"engine": INFERENCE_ENGINE, "builds": 0, "fallbacks": 0, "max_error": 0.0}
+
+def build_engine(models: List[MultiTaskNN], device: str, kind: str = INFERENCE_ENGINE, tolerance: float = INFERENCE_TOLERANCE):
+    """
+    Engine of the given kind for models. Non-torch engines are checked on
+    a fixed probe batch against TorchEngine (probabilities and scores);
+    if any output is off by more than tolerance, the torch engine is used.
+    """
+    reference = TorchEngine(models, device)
+    ENGINE_STATS["builds"] += 1
+    if kind == "torch":
+        return reference
+    engine = {
+        "numpy": lambda: NumpyEngine(models),
+        "int8": lambda: NumpyEngine(models, quantize=True),
+        "jit": lambda: JitEngine(models, device),
+    }[kind]()
+
+    probe = np.random.default_rng(0).random((256, models[0].backbone[0].in_features), dtype=np.float32)
+    error = max(
+        float(np.max(np.abs(np.asarray(a, dtype=np.float64) - b)))
+        for a, b in zip(engine.predict(probe), reference.predict(probe))
+    )
+    ENGINE_STATS["max_error"] = max(ENGINE_STATS["max_error"], error)
+    if error > tolerance:
+        ENGINE_STATS["fallbacks"] += 1
+        return reference
+    return engine
+
+# =================================================================
+#  SISA ENSEMBLE (CUSTOMER-LEVEL SHARDING)
+# =================================================================
+
+# Shard model versions are unique across ensembles (and /reset), so a
+# version never names two different models.
+_MODEL_VERSIONS = itertools.count(1)
+
+class EnsembleSnapshot:
+    """
+    Immutable, versioned view of the ensemble that predictions run against:
+    the shard models, their versions and the stacked forward built from
+    them. Retraining never touches a published snapshot; it builds the next
+    one and SISAEnsemble swaps the reference, so a reader holding a
+    snapshot never sees a half-installed or half-trained shard.
+    """
+    def __init__(self, shards: Dict[int, SISAShard], shard_versions: Dict[int, int], version: int, device: str):
+        self.shards = shards                  # never mutated once published
+        self.shard_versions = shard_versions
+        self.version = version
+        self.device = device
+        self._engine = None   # inference engine over the voting shards, see engine()
+
+    def voting_shards(self) -> List[int]:
+        """
+        Shard ids whose models are averaged into a prediction. Shards
+        emptied by unlearning hold an untrained model; they are left out
+        of the vote unless nothing else is left.
+        """
+        return [sid for sid, s in self.shards.items() if s.customers] or list(self.shards)
+
+    def engine(self):
+        """
+        Inference engine (INFERENCE_ENGINE) over the voting shards. Built
+        once per snapshot -- so a retrained shard is re-exported when its
+        snapshot is published -- lazily or by SISAEnsemble._publish (two
+        threads racing here both build the same thing).
+        Returns (engine, shard_ids).
+        """
+        if self._engine is None:
+            shard_ids = self.voting_shards()
+            self._engine = (build_engine([self.shards[sid].model for sid in shard_ids], self.device), shard_ids)
+        return self._engine
+
+    def predict_batch(self, X: np.ndarray, chunk_rows: int = 65536):
+        """
+        Ensemble predictions for a (n, input_dim) matrix in one batched pass
+        over all shards: shard logits are averaged, then softmaxed.
+        Returns (seg_probs (n, 3), nbo_probs (n, 3), scores (n,)).
+        """
+        engine, ids = self.engine()
+        X = np.asarray(X, dtype=np.float32)
+        seg_out, nbo_out, score_out = [], [], []
+
+        with STATS.timer("predict_forward_seconds", engine=engine.name):
+            for start in range(0, max(len(X), 1), chunk_rows):
+                seg, nbo, score = engine.predict(X[start:start + chunk_rows])
+                seg_out.append(seg)
+                nbo_out.append(nbo)
+                score_out.append(score)
+        self._count_rows(ids, len(X))
+
+        return np.concatenate(seg_out), np.concatenate(nbo_out), np.concatenate(score_out)
+
+    def shard_outputs(self, X: np.ndarray, shard_ids: Optional[List[int]] = None) -> Dict[int, Tuple]:
+        """
+        Raw per-shard outputs {shard_id: (seg_logits (n, 3), nbo_logits (n, 3),
+        scores (n,))} for the voting shards, or only for shard_ids.
+        """
+        engine, ids = self.engine()
+        self._count_rows(ids if shard_ids is None else shard_ids, len(X))
+        with STATS.timer("predict_forward_seconds", engine=engine.name):
+            if shard_ids is None or set(shard_ids) == set(ids):
+                outs = engine.outputs(X)
+                return {sid: tuple(o[i] for o in outs) for i, sid in enumerate(ids)}
+            if all(sid in ids for sid in shard_ids):
+                outs = engine.outputs(X, [ids.index(sid) for sid in shard_ids])
+                return {sid: tuple(o[i] for o in outs) for i, sid in enumerate(shard_ids)}
+            # non-voting shards are not in the engine
+            X = torch.from_numpy(np.ascontiguousarray(X, dtype=np.float32)).to(self.device)
+            with torch.no_grad():
+                return {
+                    sid: tuple(o.cpu().numpy() for o in self.shards[sid].model(X))
+                    for sid in shard_ids
+                }
+
+    @staticmethod
+    def _count_rows(shard_ids: List[int], rows: int):
+        for sid in shard_ids:
+            STATS.inc("shard_predict_rows_total", rows, shard=sid)
+
+    def shard_outputs_by_row(self, X: np.ndarray) -> List[Dict[int, Tuple]]:
+        """shard_outputs() split into one {shard_id: outputs} dict per row."""
+        outs = self.shard_outputs(X)
+        return [
+            {sid: (seg[i], nbo[i], float(score[i])) for sid, (seg, nbo, score) in outs.items()}
+            for i in range(len(X))
+        ]
 
 class SISAEnsemble:
-    def __init__(self, num_shards: int = NUM_SHARDS, input_dim: int = 8):
+    def __init__(
+        self,
+        num_shards: int = NUM_SHARDS,
+        input_dim: int = 8,
+        num_slices: int = NUM_SLICES,
+        spill_dir: Optional[str] = None,
+    ):
         self.num_shards = num_shards
+        self.num_slices = num_slices
+        # if set, shard slices are written here as memory-mapped views
+        # instead of being copied into RAM
+        self.spill_dir = spill_dir
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        self.shards: Dict[int, SISAShard] = {}
+        # shard_id -> ordered slices, each a list of records
+        self.shard_slices: Dict[int, List[RecordStore]] = {}
         self.customer_to_shard: Dict[str, int] = {}
+        self.customer_to_slice: Dict[str, int] = {}
         self.input_dim = input_dim
-
-    def shard_records(self, records: List[CustomerRecord]):
+        # what predictions read; replaced (never mutated) by _publish
+        self._snapshot = EnsembleSnapshot({}, {}, 0, self.device)
+        self._publish_lock = threading.Lock()
+        # retrains of the same shard are serialized
+        self._shard_locks: Dict[int, threading.Lock] = {i: threading.Lock() for i in range(num_shards)}
+        # guards tombstoning of the shared training records
+        self._records_lock = threading.Lock()
+        # called with the shard_id after a shard model is replaced
+        self.on_shard_replaced: List[Callable[[int], None]] = []
+        # customers removed by unlearning whose shards have been retrained
+        self.forgotten: set = set()
+        # shard_id -> customers forgotten only approximately; the next exact
+        # retrain of the shard resumes from before their slices as well
+        self.approximate: Dict[int, set] = {}
+        # shard_id -> id of the published weights; unlike shard versions
+        # these are saved with the state, so other processes can tell
+        # which shards changed
+        self.revisions: Dict[int, str] = {}
+
+    def shard_for(self, cid: str) -> int:
+        if cid not in self.customer_to_shard:
+            self.customer_to_shard[cid] = stable_shard_for(cid, self.num_shards)
+        return self.customer_to_shard[cid]
+
+    def shard_records(self, records: RecordStore, fixed_slices: Optional[Dict[str, int]] = None):
         """
-        Demo mode: usually NUM_SHARDS = 1. If >1, records are randomly
-        assigned to shards, and customer_to_shard tracks the mapping.
+        Customer-level sharding: every (augmented) row of a customer_id lands
+        in the same shard, chosen by a stable hash of the id, so forgetting a
+        customer only ever touches one shard. customer_to_shard holds the
+        complete mapping.
+
+        Within a shard, customers are split in arrival order into
+        num_slices contiguous slices (recent customers land in the last
+        slices). Customers in fixed_slices (customer -> slice, e.g. ones
+        added by add_customers) go to that slice instead and do not move
+        the split. Returns {shard_id: [slice_0_store, slice_1_store, ...]}.
+        """
+        fixed = fixed_slices or {}
+        present = records.customers()
+        code_shard = np.zeros(len(records.customer_ids), dtype=np.int64)
+        code_slice = np.zeros(len(records.customer_ids), dtype=np.int64)
+        code_of = records.code_of
+
+        by_shard: Dict[int, List[str]] = {i: [] for i in range(self.num_shards)}
+        for c in present:
+            if c not in fixed:
+                by_shard[self.shard_for(c)].append(c)
+
+        n_slices: Dict[int, int] = {}
+        for sid, cids in by_shard.items():
+            n_slices[sid] = max(1, min(self.num_slices, len(cids)))
+            for k, chunk in enumerate(np.array_split(np.arange(len(cids)), n_slices[sid])):
+                for i in chunk:
+                    self.customer_to_slice[cids[i]] = k
+                    code_shard[code_of[cids[i]]] = sid
+                    code_slice[code_of[cids[i]]] = k
+        for c, k in fixed.items():
+            if c in code_of:
+                sid = self.shard_for(c)
+                n_slices[sid] = max(n_slices[sid], k + 1)
+                self.customer_to_slice[c] = k
+                code_shard[code_of[c]] = sid
+                code_slice[code_of[c]] = k
+
+        # one stable sort groups rows by (shard, slice), keeping row order
+        key = code_shard[records.cust_idx] * self.num_slices + code_slice[records.cust_idx]
+        order = np.argsort(key, kind="stable")
+        bounds = np.searchsorted(key[order], np.arange(self.num_shards * self.num_slices + 1))
+
+        spill = os.path.join(self.spill_dir, "shards") if self.spill_dir else None
+        grouped = records.permuted(order, spill)
+
+        shard_map: Dict[int, List[RecordStore]] = {}
+        for sid in range(self.num_shards):
+            shard_map[sid] = [
+                grouped.take(slice(bounds[sid * self.num_slices + k], bounds[sid * self.num_slices + k + 1]))
+                for k in range(n_slices[sid])
+            ]
+
+        self.shard_slices = shard_map
+        return shard_map
+
+    def _train_shard(
+        self,
+        shard_id: int,
+        slices: List[RecordStore],
+        policy: Optional[RetrainPolicy] = None,
+        from_slice: int = 0,
+    ):
         """
-        rng = np.random.default_rng(123)
-        assignments = rng.integers(0, self.num_shards, size=len(records))
+        Train a shard model slice by slice. With from_slice > 0 training
+        resumes from the checkpoint taken before that slice, so only slices
+        from_slice.. are retrained.
 
-        shard_buckets: Dict[int, List[CustomerRecord]] = {i: [] for i in range(self.num_shards)}
-        for rec, sid in zip(records, assignments):
-            sid = int(sid)
-            shard_buckets[sid].append(rec)
-            # many records share the same customer_id; mapping will end up with
-            # the last shard seen for that id (fine for demo with num_shards=1)
-            self.customer_to_shard[rec.customer_id] = sid
+        If the shard holds no records, install a baseline (untrained) model
+        so the ensemble still has a valid shard.
+        """
+        self.train_shards({shard_id: (slices, from_slice)}, policy)
 
-        return shard_buckets
+    def _shard_job(self, shard_id: int, slices: List[RecordStore], policy: RetrainPolicy, from_slice: int):
+        old = self.shards.get(shard_id)
+        if policy.warm_start and from_slice > 0 and old is not None and len(old.checkpoints) > from_slice:
+            checkpoints = old.checkpoints[:from_slice + 1]
+        else:
+            from_slice, checkpoints = 0, []
+        return (shard_id, slices, policy, from_slice, checkpoints, self.input_dim, self.device)
 
-    def _train_shard(self, shard_id: int, recs: List[CustomerRecord], epochs: int = 100):
+    def train_shards(self, jobs: Dict[int, Tuple[List[RecordStore], int]], policy: Optional[RetrainPolicy] = None):
         """
-        Train a shard model. If recs is empty, install a baseline (untrained) model
-        so the ensemble still has a valid shard.
+        Train several shards, {shard_id: (slices, from_slice)}, under policy
+        (RETRAIN_POLICY by default). Shards with data are fanned out to the
+        training pool when there is more than one of them; trained
+        state_dicts come back and are installed here.
         """
-        if len(recs) == 0:
+        policy = policy or RETRAIN_POLICY
+        reset_train_progress(jobs)
+        trained: List[SISAShard] = []
+        work = []
+        for shard_id, (slices, from_slice) in jobs.items():
+            self.shard_slices[shard_id] = slices
+            if not any(len(sl) for sl in slices):
+                trained.append(SISAShard(
+                    shard_id=shard_id,
+                    model=MultiTaskNN(self.input_dim).to(self.device),
+                    customers=[],
+                ))
+                continue
+            work.append(self._shard_job(shard_id, slices, policy, from_slice))
+
+        pool = get_train_pool() if len(work) > 1 and self.device == "cpu" else None
+        if pool is not None:
+            results = list(pool.map(_train_slices_job, work))
+        else:
+            results = [_train_slices_job(args) for args in work]
+
+        for args, (model_state, checkpoints, report) in zip(work, results):
+            shard_id, slices = args[0], args[1]
+            record_train_stats(shard_id, report)
             model = MultiTaskNN(self.input_dim).to(self.device)
-            self.shards[shard_id] = SISAShard(
+            model.load_state_dict(model_state)
+            trained.append(SISAShard(
                 shard_id=shard_id,
                 model=model,
-                customers=[],
-            )
-            return
-
-        model = MultiTaskNN(self.input_dim).to(self.device)
-        ds = TabularDataset(recs)
-        dl = DataLoader(ds, batch_size=128, shuffle=True)
-
-        ce = nn.CrossEntropyLoss()
-        mse = nn.MSELoss()
-        opt = torch.optim.Adam(model.parameters(), lr=1e-3)
-
-        for _ in range(epochs):
-            for xb, seg_y, nbo_y, score_y, _ in dl:
-                xb = xb.to(self.device)
-                seg_y = seg_y.to(self.device)
-                nbo_y = nbo_y.to(self.device)
-                score_y = score_y.to(self.device)
-
-                opt.zero_grad()
-                seg_logits, nbo_logits, score_pred = model(xb)
-                loss = (
-                    ce(seg_logits, seg_y)
-                    + ce(nbo_logits, nbo_y)
-                    + 0.5 * mse(score_pred, score_y)
-                )
-                loss.backward()
-                opt.step()
+                customers=RecordStore.concat(slices).customers(),
+                checkpoints=checkpoints,
+                report=report,
+            ))
 
-        self.shards[shard_id] = SISAShard(
-            shard_id=shard_id,
-            model=model,
-            customers=[r.customer_id for r in recs],
-        )
+        self._publish(trained)
 
-    def train_all_shards(self, shard_map: Dict[int, List[CustomerRecord]], epochs: int = 100):
-        for shard_id, recs in shard_map.items():
-            self._train_shard(shard_id, recs, epochs)
+    def _publish(self, trained: List[SISAShard], revisions: Optional[Dict[int, str]] = None):
+        """
+        Build the next snapshot with the trained shards swapped in (new
+        versions, ensemble version + 1), publish it with one reference
+        assignment, then notify listeners. Shards get fresh revisions
+        unless revisions (e.g. from a saved state) are given.
+        """
+        with self._publish_lock:
+            self._snapshot = snapshot = self._next_snapshot(trained)
+            for shard in trained:
+                self.revisions[shard.shard_id] = (revisions or {}).get(shard.shard_id) or uuid.uuid4().hex
+        snapshot.engine()   # export the new weights now, not on the next request
+        for shard in trained:
+            for callback in self.on_shard_replaced:
+                callback(shard.shard_id)
+
+    def _next_snapshot(self, trained: List[SISAShard]) -> EnsembleSnapshot:
+        """The current snapshot with trained swapped in (not published)."""
+        current = self._snapshot
+        shards = dict(current.shards)
+        versions = dict(current.shard_versions)
+        for shard in trained:
+            shards[shard.shard_id] = shard
+            versions[shard.shard_id] = next(_MODEL_VERSIONS)
+        return EnsembleSnapshot(shards, versions, current.version + 1, self.device)
+
+    @contextmanager
+    def retraining(self, shard_ids):
+        """Hold the retrain locks of shard_ids (taken in id order)."""
+        with ExitStack() as stack:
+            for sid in sorted(set(shard_ids)):
+                stack.enter_context(self._shard_locks[sid])
+            yield
+
+    def train_all_shards(self, shard_map: Dict[int, List[RecordStore]], policy: Optional[RetrainPolicy] = None):
+        self.train_shards({sid: (slices, 0) for sid, slices in shard_map.items()}, policy)
+
+    def fork(self, shards: List[SISAShard], slices: Dict[int, List[RecordStore]]) -> "SISAEnsemble":
+        """
+        New ensemble with this one's settings and customer index, serving
+        the given shards over copy-on-write forks of the given slices
+        (columns shared, own tombstones). No training involved.
+        """
+        ensemble = SISAEnsemble(self.num_shards, self.input_dim, self.num_slices, self.spill_dir)
+        ensemble.customer_to_shard = dict(self.customer_to_shard)
+        ensemble.customer_to_slice = dict(self.customer_to_slice)
+        ensemble.shard_slices = {sid: [sl.fork() for sl in sls] for sid, sls in slices.items()}
+        ensemble._publish(shards)
+        return ensemble
+
+    def state(self) -> Dict[str, Any]:
+        """Shard weights, slice checkpoints and indices, for save_checkpoint."""
+        return {
+            "shards": {
+                sid: {
+                    "model": shard.model.state_dict(),
+                    "checkpoints": shard.checkpoints,
+                    "customers": shard.customers,
+                }
+                for sid, shard in self.snapshot().shards.items()
+            },
+            "customer_to_shard": dict(self.customer_to_shard),
+            "forgotten": sorted(self.forgotten),
+            "approximate": {sid: sorted(cids) for sid, cids in self.approximate.items() if cids},
+            "revisions": dict(self.revisions),
+        }
+
+    def shards_from_state(self, state: Dict[str, Any], shard_ids=None) -> List[SISAShard]:
+        """Shard objects for the "shards" of state() output (or those in shard_ids)."""
+        trained = []
+        for sid, shard in state["shards"].items():
+            if shard_ids is not None and sid not in shard_ids:
+                continue
+            model = MultiTaskNN(self.input_dim).to(self.device)
+            # assign=True keeps the (memory-mapped) tensors instead of copying
+            model.load_state_dict(shard["model"], assign=self.device == "cpu")
+            trained.append(SISAShard(
+                shard_id=sid,
+                model=model,
+                customers=list(shard["customers"]),
+                checkpoints=list(shard["checkpoints"]),
+            ))
+        return trained
 
-    def predict_raw(self, features: np.ndarray):
+    def restore(self, state: Dict[str, Any]):
+        """
+        Publish shards from state() output instead of training them. Call
+        after shard_records(); slices of forgotten customers are tombstoned
+        again so later retrains see the same data as before.
         """
-        Aggregate predictions across shards. Demo mode uses NUM_SHARDS = 1
-        so this typically just returns the single shard's prediction.
+        trained = self.shards_from_state(state)
+        forgotten = set(state["forgotten"])
+        for sid in range(self.num_shards):
+            self._remove(sid, {c for c in forgotten if self.shard_for(c) == sid})
+        self.forgotten = forgotten
+        self.approximate = {sid: set(cids) for sid, cids in state.get("approximate", {}).items()}
+        self._publish(trained, state.get("revisions"))
+
+    def sync(self, state: Dict[str, Any], current_records: RecordStore) -> set:
         """
-        x = torch.tensor(features, dtype=torch.float32).to(self.device).unsqueeze(0)
-        seg_list, nbo_list, score_list = [], [], []
+        Catch up with state() saved by another process: tombstone the
+        customers it has forgotten since (here and in current_records) and
+        republish only the shards whose revision differs.
+        Returns the newly forgotten customers.
+        """
+        forgotten = set(state["forgotten"])
+        newly = forgotten - self.forgotten
+        with self._records_lock:
+            current_records.remove(newly)
+        for sid in range(self.num_shards):
+            self._remove(sid, {c for c in newly if self.shard_for(c) == sid})
+        self.forgotten = forgotten
+        self.approximate = {sid: set(cids) for sid, cids in state.get("approximate", {}).items()}
+
+        revisions = state.get("revisions", {})
+        changed = {sid for sid, rev in revisions.items() if self.revisions.get(sid) != rev}
+        if changed:
+            self._publish(self.shards_from_state(state, changed), revisions)
+        return newly
+
+    # -------- PREDICTION (AGAINST THE PUBLISHED SNAPSHOT) --------
+
+    def snapshot(self) -> "EnsembleSnapshot":
+        """
+        The current published ensemble. Take it once per request and run
+        every prediction of that request against it.
+        """
+        return self._snapshot
 
-        for shard in self.shards.values():
-            with torch.no_grad():
-                seg, nbo, score = shard.model(x)
-            seg_list.append(seg.cpu().numpy()[0])
-            nbo_list.append(nbo.cpu().numpy()[0])
-            score_list.append(float(score.cpu().numpy()[0]))
+    @property
+    def shards(self) -> Dict[int, SISAShard]:
+        return self._snapshot.shards
 
-        def softmax(z):
-            ez = np.exp(z - np.max(z))
-            return ez / ez.sum()
+    @property
+    def shard_versions(self) -> Dict[int, int]:
+        return self._snapshot.shard_versions
 
-        seg_mean = softmax(np.mean(seg_list, axis=0))
-        nbo_mean = softmax(np.mean(nbo_list, axis=0))
-        score_mean = float(np.mean(score_list))
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
 
-        return seg_mean, nbo_mean, score_mean
+    def voting_shards(self) -> List[int]:
+        return self._snapshot.voting_shards()
 
-    # -------- DEMO UNLEARNING (NUM_SHARDS = 1) --------
+    def predict_batch(self, X: np.ndarray, chunk_rows: int = 65536):
+        return self._snapshot.predict_batch(X, chunk_rows)
 
-    def unlearn_customer(self, cid: str, current_records: List[CustomerRecord]) -> Tuple[int, List[CustomerRecord]]:
+    def shard_outputs(self, X: np.ndarray, shard_ids: Optional[List[int]] = None) -> Dict[int, Tuple]:
+        return self._snapshot.shard_outputs(X, shard_ids)
+
+    # -------- SISA UNLEARNING (RETRAIN OWNING SHARDS ONLY) --------
+
+    def _remove(self, shard_id: int, remove_set: set) -> Tuple[List[RecordStore], int]:
+        """
+        Tombstone remove_set in the shard's slices (O(rows removed)).
+        Returns (slices, from_slice) where from_slice is the earliest slice
+        that held one of them, i.e. the checkpoint retraining resumes from.
+        """
+        slices = self.shard_slices.get(shard_id, [])
+        touched = [self.customer_to_slice[c] for c in remove_set if c in self.customer_to_slice]
+        # approximately forgotten customers must leave the exact model too
+        redo = [self.customer_to_slice[c] for c in self.approximate.get(shard_id, ()) if c in self.customer_to_slice]
+        from_slice = min(touched + redo) if touched or redo else 0
+
+        for k in sorted(set(touched)):
+            if k < len(slices):
+                slices[k].remove([c for c in remove_set if self.customer_to_slice.get(c) == k])
+        return slices, from_slice
+
+    def unlearn_customer(self, cid: str, current_records: RecordStore) -> Tuple[int, RecordStore]:
         """
-        Demo-friendly unlearning: remove all records with customer_id == cid
-        from current_records, then retrain shard 0 on the remaining data.
-        Returns (shard_id, new_records).
+        Remove all records with customer_id == cid and retrain only the
+        shard that owns cid, resuming from the last checkpoint that never
+        saw cid. Rows are tombstoned in place, in O(rows of cid).
+        Returns (shard_id, current_records).
         """
-        new_recs = [r for r in current_records if r.customer_id != cid]
-        self._train_shard(0, new_recs)
-        return 0, new_recs
+        shard_id = self.shard_for(cid)
+        with self.retraining([shard_id]):
+            with self._records_lock:
+                current_records.remove([cid])
+            slices, from_slice = self._remove(shard_id, {cid})
+            self._train_shard(shard_id, slices, from_slice=from_slice)
+            self.forgotten.add(cid)
+            self.approximate.pop(shard_id, None)
+        return shard_id, current_records
 
     def unlearn_customers_batch(
         self,
         customer_ids: List[str],
-        current_records: List[CustomerRecord],
-    ) -> Tuple[List[int], List[CustomerRecord]]:
+        current_records: RecordStore,
+    ) -> Tuple[List[int], RecordStore]:
         """
         Batch unlearning: remove all records with customer_id in the list,
-        retrain shard 0 on the remaining data.
-        Returns (shards_retrained, new_records).
+        and retrain each affected shard once, from the checkpoint before the
+        earliest affected slice. Several affected shards are retrained in
+        parallel on the training pool. Returns (shards_retrained, current_records).
+        """
+        remove_set = set(customer_ids)
+        affected = sorted({self.shard_for(cid) for cid in remove_set})
+
+        with self.retraining(affected):
+            with self._records_lock:
+                current_records.remove(remove_set)
+            self.train_shards({
+                shard_id: self._remove(shard_id, {c for c in remove_set if self.shard_for(c) == shard_id})
+                for shard_id in affected
+            })
+            self.forgotten |= remove_set
+            for shard_id in affected:
+                self.approximate.pop(shard_id, None)
+        return affected, current_records
+
+    def unlearn_customers_approx(
+        self,
+        customer_ids: List[str],
+        current_records: RecordStore,
+        certify: Callable[[int, EnsembleSnapshot], bool],
+        ascent_steps: int = 20,
+        finetune_steps: int = 200,
+        max_retain_loss_increase: float = 0.05,
+    ) -> Tuple[Dict[int, Dict[str, Any]], RecordStore]:
+        """
+        Approximate unlearning, shard by shard: the customers' rows are
+        tombstoned as for an exact erasure, then the current shard model is
+        updated by _approximate_unlearn instead of retrained. The update is
+        published only if the retained loss stayed within
+        max_retain_loss_increase and certify(shard_id, candidate_snapshot)
+        accepts it; otherwise the shard is retrained exactly right away.
+        So is a shard with nothing to update: no rows of the customers left,
+        or no retained rows (e.g. a shard emptied by earlier erasures).
+        Returns ({shard_id: report incl. "mode"}, current_records), mode
+        being "approximate" or "exact_fallback".
         """
         remove_set = set(customer_ids)
-        new_recs = [r for r in current_records if r.customer_id not in remove_set]
-        self._train_shard(0, new_recs)
-        return [0], new_recs
+        by_shard: Dict[int, set] = {}
+        for cid in remove_set:
+            by_shard.setdefault(self.shard_for(cid), set()).add(cid)
+
+        reports: Dict[int, Dict[str, Any]] = {}
+        for shard_id, cids in sorted(by_shard.items()):
+            with self.retraining([shard_id]):
+                slices = self.shard_slices.get(shard_id, [])
+                shard = self.shards[shard_id]
+                forget = [sl.take(sl.rows_of(c)) for sl in slices for c in cids]
+                with self._records_lock:
+                    current_records.remove(cids)
+                slices, from_slice = self._remove(shard_id, cids)
+                forget = RecordStore.concat(forget) if forget else None
+                retain = RecordStore.concat(slices) if slices else None
+                if not forget or not retain:
+                    self.train_shards({shard_id: (slices or [RecordStore.empty(current_records.customer_ids, self.input_dim)], from_slice)})
+                    self.approximate.pop(shard_id, None)
+                    reports[shard_id] = {"mode": "exact_fallback", **self.shards[shard_id].report}
+                    self.forgotten |= cids
+                    continue
+
+                model, report = _approximate_unlearn(
+                    shard.model, forget, retain, self.device,
+                    ascent_steps=ascent_steps, finetune_steps=finetune_steps,
+                    seed=TRAIN_SEED + shard_id,
+                )
+                candidate = replace(shard, model=model, customers=retain.customers(), report=report)
+                ok = report["retain_loss_after"] - report["retain_loss_before"] <= max_retain_loss_increase
+                ok = ok and certify(shard_id, self._next_snapshot([candidate]))
+
+                if ok:
+                    self._publish([candidate])
+                    self.approximate.setdefault(shard_id, set()).update(cids)
+                    reports[shard_id] = {"mode": "approximate", **report}
+                else:
+                    self.train_shards({shard_id: (slices, from_slice)})
+                    self.approximate.pop(shard_id, None)
+                    reports[shard_id] = {"mode": "exact_fallback", "approximate": report, **self.shards[shard_id].report}
+                self.forgotten |= cids
+        return reports, current_records
+
+    def add_customers(self, new_records: RecordStore, current_records: RecordStore) -> Tuple[List[int], RecordStore]:
+        """
+        Online ingestion without a full retrain: each new customer goes to
+        its hashed shard, appended to that shard's last slice, and each
+        affected shard retrains from the checkpoint before its last slice
+        (earlier if approximate unlearning left slices to redo). new_records
+        must share current_records' customer code table.
+        Returns (shards_updated, current_records).
+        """
+        cids = new_records.customers()
+        by_shard: Dict[int, List[str]] = {}
+        for c in cids:
+            by_shard.setdefault(self.shard_for(c), []).append(c)
+        affected = sorted(by_shard)
+
+        with self.retraining(affected):
+            jobs = {}
+            for sid in affected:
+                rows = np.concatenate([np.arange(len(new_records))[new_records.rows_of(c)] for c in by_shard[sid]])
+                slices = list(self.shard_slices.get(sid) or [new_records.take(slice(0, 0))])
+                last = len(slices) - 1
+                slices[last] = RecordStore.concat([slices[last], new_records.take(rows)])
+                for c in by_shard[sid]:
+                    self.customer_to_slice[c] = last
+                redo = [self.customer_to_slice[c] for c in self.approximate.get(sid, ()) if c in self.customer_to_slice]
+                jobs[sid] = (slices, min([last] + redo))
+            self.train_shards(jobs)
+            for sid in affected:
+                self.approximate.pop(sid, None)
+            with self._records_lock:
+                current_records = RecordStore.concat([current_records, new_records])
+        return affected, current_records
 
 # =================================================================
 #  METRICS
 # =================================================================
 
-def entropy(p: np.ndarray) -> float:
-    p = np.clip(p, 1e-12, 1.0)
-    return float(-np.sum(p * np.log(p)))
+def entropy_rows(P: np.ndarray) -> np.ndarray:
+    """Entropy of every row of an (n, k) probability matrix."""
+    P = np.clip(P, 1e-12, 1.0)
+    return -np.sum(P * np.log(P), axis=-1)
 
-def cross_entropy(p: np.ndarray, true_idx: int) -> float:
-    p_true = np.clip(p[true_idx], 1e-12, 1.0)
-    return float(-np.log(p_true))
+def cross_entropy_rows(P: np.ndarray, true_idx: np.ndarray) -> np.ndarray:
+    """Cross-entropy of every row of P against its own true class."""
+    p_true = np.clip(P[np.arange(len(P)), np.asarray(true_idx, dtype=np.int64)], 1e-12, 1.0)
+    return -np.log(p_true)
 
-def kl(p: np.ndarray, q: np.ndarray) -> float:
-    p = np.clip(p, 1e-12, 1.0)
-    q = np.clip(q, 1e-12, 1.0)
-    return float(np.sum(p * np.log(p / q)))
+def kl_rows(P: np.ndarray, Q: np.ndarray) -> np.ndarray:
+    """KL(P || Q) row by row; Q may also be a single distribution (broadcast)."""
+    P = np.clip(P, 1e-12, 1.0)
+    Q = np.clip(Q, 1e-12, 1.0)
+    return np.sum(P * np.log(P / Q), axis=-1)
 
-def compute_metrics(ensemble: SISAEnsemble, rec: CustomerRecord) -> Dict[str, Any]:
+def persona_columns(customer_ids: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
     """
-    Core raw metrics for one customer (used internally for pre/post).
-    We keep probs internally but won't expose them directly in the API.
+    (features, segment, nbo, score) of the given customers as arrays,
+    gathered straight from the columns in streaming mode.
     """
-    seg_probs, nbo_probs, score_pred = ensemble.predict_raw(rec.features)
-
-    nbo_conf = float(np.max(nbo_probs))
-    nbo_ent = entropy(nbo_probs)
-    nbo_ce = cross_entropy(nbo_probs, rec.nbo)
-    seg_ce = cross_entropy(seg_probs, rec.segment)
-    score_mse = float((score_pred - rec.score) ** 2)
+    if isinstance(ID_TO_RECORD, PersonaTable):
+        codes = np.fromiter((ID_TO_RECORD.code_of[c] for c in customer_ids), dtype=np.int64, count=len(customer_ids))
+        t = ID_TO_RECORD
+        return np.asarray(t.features[codes], dtype=np.float32), t.segment[codes], t.nbo[codes], t.score[codes]
+    recs = [ID_TO_RECORD[c] for c in customer_ids]
+    return (
+        np.stack([r.features for r in recs]).astype(np.float32) if recs else np.empty((0, len(FEATURE_COLUMNS)), dtype=np.float32),
+        np.array([r.segment for r in recs], dtype=np.int64),
+        np.array([r.nbo for r in recs], dtype=np.int64),
+        np.array([r.score for r in recs], dtype=np.float64),
+    )
 
+def compute_metrics_batch(ensemble: SISAEnsemble, customer_ids: List[str]) -> Dict[str, np.ndarray]:
+    """
+    Core raw metrics (used internally for pre/post) for many customers
+    with a single forward pass, each key holding one row/value per
+    customer. Probabilities are kept internally but never exposed.
+    """
+    X, segment, nbo, score = persona_columns(customer_ids)
+    seg_probs, nbo_probs, score_pred = ensemble.predict_batch(X)
+    score_pred = np.asarray(score_pred, dtype=np.float64)
     return {
-        "nbo_probs": nbo_probs,       # keep as np.ndarray for internal use
+        "nbo_probs": nbo_probs,
         "seg_probs": seg_probs,
-        "score_pred": float(score_pred),
-        "nbo_conf": nbo_conf,
-        "nbo_entropy": nbo_ent,
-        "nbo_ce": nbo_ce,
-        "seg_ce": seg_ce,
-        "score_mse": score_mse,
+        "score_pred": score_pred,
+        "nbo_conf": np.max(nbo_probs, axis=-1),
+        "nbo_entropy": entropy_rows(nbo_probs),
+        "nbo_ce": cross_entropy_rows(nbo_probs, nbo).astype(np.float64),
+        "seg_ce": cross_entropy_rows(seg_probs, segment).astype(np.float64),
+        "score_mse": (score_pred - score) ** 2,
+    }
+
+def build_metrics_entries(
+    customer_ids: List[str], pre: Dict[str, np.ndarray], post: Dict[str, np.ndarray]
+) -> Dict[str, Dict[str, Any]]:
+    """
+    The regulator-friendly /metrics entry (see _metrics_entry) for every
+    customer of compute_metrics_batch results, with the KL/L2/CE columns
+    computed for all of them at once.
+    """
+    pre_seg_idx = np.argmax(pre["seg_probs"], axis=-1)
+    pre_nbo_idx = np.argmax(pre["nbo_probs"], axis=-1)
+    nbo_gap_pre = kl_rows(pre["nbo_probs"], BASELINE_NBO)
+    raw_kl = kl_rows(pre["nbo_probs"], post["nbo_probs"])
+    l2_nbo = np.linalg.norm(pre["nbo_probs"] - post["nbo_probs"], axis=-1)
+    nbo_ce_change = post["nbo_ce"] - pre["nbo_ce"]
+    seg_ce_change = post["seg_ce"] - pre["seg_ce"]
+    score_mse_change = post["score_mse"] - pre["score_mse"]
+
+    return {
+        cid: _metrics_entry(
+            cid,
+            int(pre_seg_idx[i]),
+            int(pre_nbo_idx[i]),
+            float(pre["score_pred"][i]),
+            float(nbo_gap_pre[i]),
+            {
+                "raw_nbo_pre_post_kl": float(raw_kl[i]),
+                "raw_nbo_l2_distance": float(l2_nbo[i]),
+                "nbo_ce_change": float(nbo_ce_change[i]),
+                "seg_ce_change": float(seg_ce_change[i]),
+                "score_mse_change": float(score_mse_change[i]),
+            },
+        )
+        for i, cid in enumerate(customer_ids)
     }
 
-def build_metrics_entry(customer_id: str, pre: Dict[str, Any], post: Dict[str, Any]) -> Dict[str, Any]:
+def _metrics_entry(
+    customer_id: str,
+    pre_seg_idx: int,
+    pre_nbo_idx: int,
+    pre_score: float,
+    nbo_gap_pre: float,
+    raw_change: Dict[str, float],
+) -> Dict[str, Any]:
     """
     Build a regulator-friendly metrics summary for one customer.
 
     We expose:
     - Pre/Post EFFECTIVE behavior (segment/NBO/score)
     - Personalization gaps vs baseline (KL + score)
-    - A small set of raw drift metrics
+    - A small set of raw drift metrics (raw_change)
     - Textual interpretation
 
     We intentionally do NOT expose raw nbo_probs / seg_probs directly,
     to avoid confusion.
     """
-
-    # ---------- 1. Raw arrays (internal only) ----------
-    pre_nbo = np.array(pre["nbo_probs"])
-    post_nbo = np.array(post["nbo_probs"])
-    pre_seg = np.array(pre["seg_probs"])
-    post_seg = np.array(post["seg_probs"])
-
     # For display: what did the model predict PRE-unlearning?
-    pre_seg_idx = int(np.argmax(pre_seg))
-    pre_nbo_idx = int(np.argmax(pre_nbo))
-
     pre_seg_name = SEGMENT_NAMES.get(pre_seg_idx, "Unknown")
     pre_nbo_name = CARD_NAMES.get(pre_nbo_idx, "Unknown")
 
-    # ---------- 2. Effective (business) behavior ----------
+    # ---------- 1. Effective (business) behavior ----------
     # Before unlearning: user sees the personalized decision
     pre_effective = {
         "segment": pre_seg_name,
         "nbo": pre_nbo_name,
-        "score": float(pre["score_pred"]),
+        "score": pre_score,
         "baseline_segment": "Unprofiled / Default",
         "baseline_nbo": "Silver (Baseline)",
         "baseline_score": BASELINE_SCORE,
@@ -426,13 +2293,12 @@ def build_metrics_entry(customer_id: str, pre: Dict[str, Any], post: Dict[str, A
         "score": BASELINE_SCORE,
     }
 
-    # ---------- 3. Personalization gaps (the main proof) ----------
-    # KL between personalized NBO and baseline NBO (before unlearning)
-    nbo_gap_pre = kl(pre_nbo, BASELINE_NBO)
+    # ---------- 2. Personalization gaps (the main proof) ----------
+    # nbo_gap_pre: KL between personalized NBO and baseline NBO (before unlearning)
     nbo_gap_post = 0.0  # by design, we use baseline after unlearning
 
     # Absolute score gap vs baseline
-    score_gap_pre = abs(pre["score_pred"] - BASELINE_SCORE)
+    score_gap_pre = abs(pre_score - BASELINE_SCORE)
     score_gap_post = 0.0
 
     personalization_gaps = {
@@ -442,27 +2308,14 @@ def build_metrics_entry(customer_id: str, pre: Dict[str, Any], post: Dict[str, A
         "score_gap_post_abs": score_gap_post,
     }
 
-    # ---------- 4. Raw drift metrics (small, technical set) ----------
-    # These describe how the underlying model changed for this customer.
-    raw_nbo_pre_post_kl = kl(pre_nbo, post_nbo)
-    l2_nbo = float(np.linalg.norm(pre_nbo - post_nbo))
-    nbo_ce_change = post["nbo_ce"] - pre["nbo_ce"]
-    seg_ce_change = post["seg_ce"] - pre["seg_ce"]
-    score_mse_change = post["score_mse"] - pre["score_mse"]
-
-    raw_change = {
-        "raw_nbo_pre_post_kl": raw_nbo_pre_post_kl,
-        "raw_nbo_l2_distance": l2_nbo,
-        "nbo_ce_change": nbo_ce_change,
-        "seg_ce_change": seg_ce_change,
-        "score_mse_change": score_mse_change,
-    }
+    raw_nbo_pre_post_kl = raw_change["raw_nbo_pre_post_kl"]
+    score_mse_change = raw_change["score_mse_change"]
 
-    # ---------- 5. Interpretation bullets ----------
+    # ---------- 3. Interpretation bullets ----------
     bullets = [
         (
             f"Before unlearning, this customer was receiving a highly personalized "
-            f"offer ({pre_nbo_name}) with a score of {pre['score_pred']:.2f}, which "
+            f"offer ({pre_nbo_name}) with a score of {pre_score:.2f}, which "
             f"was far from the generic baseline (KL to baseline = {nbo_gap_pre:.3f}, "
             f"score gap = {score_gap_pre:.3f})."
         ),
@@ -508,49 +2361,1291 @@ def build_metrics_entry(customer_id: str, pre: Dict[str, Any], post: Dict[str, A
     }
 
 # =================================================================
-#  GLOBAL INIT
+#  PREDICTION MICRO-BATCHING (OPT-IN)
 # =================================================================
 
-torch.manual_seed(42)
-np.random.seed(42)
-
-def normalize_features(records: List[CustomerRecord]):
+class MicroBatcher:
     """
-    Min-max normalize all features across the given records.
-    Returns (normalized_records, feature_min, feature_max, feature_range).
+    Coalesces concurrent single-row predictions into one batched ensemble
+    pass. predict_fn maps an (n, d) matrix to a sequence of n per-row
+    results. The first queued request opens a window of window_ms; the batch
+    is dispatched when the window closes or max_batch rows are waiting,
+    so batching adds at most window_ms to a request's latency (plus the
+    time the previous batch is still running). The forward pass runs in a
+    worker thread, and requests keep queuing up for the next batch
+    meanwhile.
     """
-    all_features = np.array([r.features for r in records])
-    feature_min = all_features.min(axis=0)
-    feature_max = all_features.max(axis=0)
-    feature_range = np.where(feature_max - feature_min == 0, 1.0, feature_max - feature_min)
-
-    for r in records:
-        r.features = (r.features - feature_min) / feature_range
+    def __init__(self, predict_fn, max_batch: int = 64, window_ms: float = 2.0, history: int = 10000):
+        self.predict_fn = predict_fn
+        self.max_batch = max_batch
+        self.window_ms = window_ms
+        self.queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.requests = 0
+        self.batches = 0
+        self.batch_size_hist: Dict[int, int] = {}      # power-of-two bucket -> batches
+        self.queue_wait_ms = deque(maxlen=history)      # enqueue -> dispatch
+        self.forward_ms = deque(maxlen=history)
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def submit(self, features: np.ndarray):
+        """Queue one feature row; resolves to predict_fn's result for it."""
+        fut = asyncio.get_running_loop().create_future()
+        await self.queue.put((features, fut, time.perf_counter()))
+        return await fut
+
+    async def _collect(self):
+        batch = [await self.queue.get()]
+        deadline = batch[0][2] + self.window_ms / 1000.0
+        while len(batch) < self.max_batch:
+            while not self.queue.empty() and len(batch) < self.max_batch:
+                batch.append(self.queue.get_nowait())
+            remaining = deadline - time.perf_counter()
+            if len(batch) >= self.max_batch or remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            dispatched = time.perf_counter()
+            X = np.stack([b[0] for b in batch]).astype(np.float32)
+            try:
+                results = await loop.run_in_executor(None, self.predict_fn, X)
+            except Exception as e:   # fail the waiting requests, keep serving
+                for _, fut, _ in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            done = time.perf_counter()
+
+            for i, (_, fut, _) in enumerate(batch):
+                if not fut.done():
+                    fut.set_result(results[i])
+
+            self.requests += len(batch)
+            self.batches += 1
+            bucket = 1 << (len(batch) - 1).bit_length()
+            self.batch_size_hist[bucket] = self.batch_size_hist.get(bucket, 0) + 1
+            self.queue_wait_ms.extend((dispatched - t0) * 1000.0 for _, _, t0 in batch)
+            self.forward_ms.append((done - dispatched) * 1000.0)
+
+    def stats(self) -> Dict[str, Any]:
+        def pct(values, q):
+            return float(np.percentile(values, q)) if values else 0.0
+
+        return {
+            "enabled": True,
+            "max_batch": self.max_batch,
+            "window_ms": self.window_ms,
+            "requests": self.requests,
+            "batches": self.batches,
+            "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+            "batch_size_histogram": {f"<={k}": v for k, v in sorted(self.batch_size_hist.items())},
+            "queue_wait_ms_p50": pct(self.queue_wait_ms, 50),
+            "queue_wait_ms_p99": pct(self.queue_wait_ms, 99),
+            "forward_ms_p50": pct(self.forward_ms, 50),
+            "forward_ms_p99": pct(self.forward_ms, 99),
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+        }
 
-    return records, feature_min, feature_max, feature_range
+# =================================================================
+#  PREDICTION CACHE
+# =================================================================
+
+def aggregate_shard_outputs(outputs: Dict[int, Tuple]):
+    """
+    Ensemble vote over {shard_id: (seg_logits, nbo_logits, score)} for one
+    row, as in predict_batch: logits averaged, then softmaxed.
+    Returns (seg_probs, nbo_probs, score).
+    """
+    def softmax(z):
+        e = np.exp(z - z.max())
+        return (e / e.sum()).astype(np.float32)
+
+    seg = np.mean([o[0] for o in outputs.values()], axis=0)
+    nbo = np.mean([o[1] for o in outputs.values()], axis=0)
+    score = float(np.mean([o[2] for o in outputs.values()]))
+    return softmax(seg), softmax(nbo), score
+
+class PredictionCache:
+    """
+    Bounded LRU/TTL cache of per-shard model outputs for /predict, keyed by
+    (customer_id, shard_id) and tagged with the shard model version that
+    produced them. The ensemble answer averages every voting shard, so it
+    is assembled from the cached shard outputs on read: retraining a shard
+    invalidates only that shard's entries, and the next request for a
+    customer recomputes just the missing shard.
+    """
+    def __init__(self, max_entries: int, ttl_s: float = 0.0):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        # (customer_id, shard_id) -> (version, inserted_at, outputs)
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[int, float, Tuple]]" = OrderedDict()
+        self._by_shard: Dict[int, set] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0          # served without touching torch
+        self.partial_hits = 0  # some shards recomputed
+        self.misses = 0
+        self.evictions = 0     # LRU, over max_entries
+        self.expirations = 0   # older than ttl_s
+        self.invalidations = 0
+
+    def _drop(self, key):
+        del self._entries[key]
+        self._by_shard[key[1]].discard(key[0])
+
+    def get(self, cid: str, versions: Dict[int, int]) -> Tuple[Dict[int, Tuple], List[int]]:
+        """
+        Look up cid's outputs for the voting shards {shard_id: version}.
+        Returns (found {shard_id: outputs}, missing shard ids).
+        """
+        now = time.monotonic()
+        found, missing = {}, []
+        with self._lock:
+            for sid, version in versions.items():
+                key = (cid, sid)
+                entry = self._entries.get(key)
+                if entry is not None and self.ttl_s and now - entry[1] > self.ttl_s:
+                    self._drop(key)
+                    self.expirations += 1
+                    entry = None
+                if entry is not None and entry[0] == version:
+                    self._entries.move_to_end(key)
+                    found[sid] = entry[2]
+                else:
+                    missing.append(sid)
+
+            if not missing:
+                self.hits += 1
+            elif found:
+                self.partial_hits += 1
+            else:
+                self.misses += 1
+        return found, missing
+
+    def put(self, cid: str, versions: Dict[int, int], outputs: Dict[int, Tuple]):
+        """Store per-shard outputs computed with the given shard versions."""
+        now = time.monotonic()
+        with self._lock:
+            for sid, out in outputs.items():
+                if sid not in versions:
+                    continue
+                key = (cid, sid)
+                self._entries[key] = (versions[sid], now, out)
+                self._entries.move_to_end(key)
+                self._by_shard.setdefault(sid, set()).add(cid)
+            while len(self._entries) > self.max_entries:
+                key, _ = self._entries.popitem(last=False)
+                self._by_shard[key[1]].discard(key[0])
+                self.evictions += 1
+
+    def invalidate_shard(self, shard_id: int):
+        """Drop every entry of a shard whose model was replaced."""
+        with self._lock:
+            cids = self._by_shard.pop(shard_id, set())
+            for cid in cids:
+                self._entries.pop((cid, shard_id), None)
+            self.invalidations += len(cids)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_shard.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.partial_hits + self.misses
+        return {
+            "enabled": True,
+            "max_entries": self.max_entries,
+            "ttl_s": self.ttl_s,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "partial_hits": self.partial_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+# =================================================================
+#  EMBEDDING INDEX (SIMILARITY SEARCH)
+# =================================================================
+
+def encode_rows(model: MultiTaskNN, X: np.ndarray, chunk_rows: int = 65536) -> np.ndarray:
+    """L2-normalized MultiTaskNN.encode of (n, input_dim) rows, (n, hidden) float32."""
+    out = np.empty((len(X), model.segment_head.in_features), dtype=np.float32)
+    with torch.no_grad():
+        for start in range(0, len(X), chunk_rows):
+            x = torch.from_numpy(np.ascontiguousarray(X[start:start + chunk_rows], dtype=np.float32))
+            out[start:start + chunk_rows] = model.encode(x).numpy()
+    out /= np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-12)
+    return out
+
+def top_k(emb: np.ndarray, Q: np.ndarray, k: int, chunk_rows: int = 65536) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Exact cosine top-k of the (q, d) queries against the (n, d) rows of
+    emb (both L2-normalized), one matmul per block of rows so memory stays
+    O(q * (chunk_rows + k)). Returns (rows (q, k'), similarities (q, k')),
+    best first, k' = min(k, n).
+    """
+    k = min(k, len(emb))
+    best_sim = np.full((len(Q), k), -np.inf, dtype=np.float32)
+    best_row = np.zeros((len(Q), k), dtype=np.int64)
+    for start in range(0, len(emb), chunk_rows):
+        block = emb[start:start + chunk_rows]
+        sims = np.concatenate([best_sim, Q @ block.T], axis=1)
+        rows = np.concatenate([best_row, np.broadcast_to(np.arange(start, start + len(block)), (len(Q), len(block)))], axis=1)
+        keep = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        best_sim = np.take_along_axis(sims, keep, axis=1)
+        best_row = np.take_along_axis(rows, keep, axis=1)
+    order = np.argsort(-best_sim, axis=1)
+    return np.take_along_axis(best_row, order, axis=1), np.take_along_axis(best_sim, order, axis=1)
+
+class EmbeddingIndex:
+    """
+    Customer embeddings for similarity lookup: every shard's model encodes
+    the customers it was trained on into one contiguous L2-normalized
+    float32 matrix (hidden_dim * 4 bytes per customer). Shards embed into
+    their own spaces, so a query is encoded by each shard's model and
+    searched in that shard's block, and hits are ranked per shard only:
+    similarities from different shard models are not comparable.
+
+    A block belongs to one shard model: it is dropped as soon as the shard
+    is replaced (invalidate_shard, on retrain, unlearning or ingestion) --
+    a forgotten customer's embedding does not outlive the retrain that
+    forgets them -- and rebuilt from the served snapshot on the next query.
+    """
+    def __init__(self, chunk_rows: int = 65536):
+        self.chunk_rows = chunk_rows
+        # shard_id -> (shard model it was built from, customer ids, embeddings)
+        self._blocks: Dict[int, Tuple[SISAShard, np.ndarray, np.ndarray]] = {}
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.invalidations = 0
+
+    def blocks(self, snapshot: EnsembleSnapshot) -> Dict[int, Tuple[SISAShard, np.ndarray, np.ndarray]]:
+        """Blocks of snapshot's shards, (re)encoding those not built yet."""
+        with self._lock:
+            for sid, shard in snapshot.shards.items():
+                block = self._blocks.get(sid)
+                if block is None or block[0] is not shard:
+                    with STATS.timer("stage_seconds", stage="embedding_index"):
+                        cids = list(shard.customers)
+                        X = persona_columns(cids)[0]
+                        self._blocks[sid] = (shard, np.array(cids, dtype=object), encode_rows(shard.model, X, self.chunk_rows))
+                    self.builds += 1
+            return {sid: self._blocks[sid] for sid in snapshot.shards}
+
+    def search(self, snapshot: EnsembleSnapshot, X: np.ndarray, k: int, shard_ids: Optional[List[int]] = None):
+        """
+        Per shard (all, or only shard_ids), the k customers whose
+        embeddings are most similar to each normalized feature row of X.
+        Returns one {shard_id: [(customer_id, similarity), ...]} per row,
+        best first within each shard.
+        """
+        hits: List[Dict[int, List[Tuple[str, float]]]] = [{} for _ in range(len(X))]
+        for sid, (shard, cids, emb) in sorted(self.blocks(snapshot).items()):
+            if (shard_ids is not None and sid not in shard_ids) or not len(cids):
+                continue
+            rows, sims = top_k(emb, encode_rows(shard.model, X), k, self.chunk_rows)
+            for i in range(len(X)):
+                hits[i][sid] = list(zip(cids[rows[i]].tolist(), sims[i].tolist()))
+        return hits
+
+    def contains(self, cid: str) -> bool:
+        with self._lock:
+            return any(bool((cids == cid).any()) for _, cids, _ in self._blocks.values())
+
+    def invalidate_shard(self, shard_id: int):
+        """Drop the block of a shard whose model was replaced."""
+        with self._lock:
+            if self._blocks.pop(shard_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._blocks.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            blocks = dict(self._blocks)
+        return {
+            "shards_built": sorted(blocks),
+            "customers": sum(len(cids) for _, cids, _ in blocks.values()),
+            "bytes": sum(emb.nbytes for _, _, emb in blocks.values()),
+            "builds": self.builds,
+            "invalidations": self.invalidations,
+        }
+
+# =================================================================
+#  BACKGROUND UNLEARNING JOBS
+# =================================================================
+
+@dataclass
+class UnlearnJob:
+    job_id: str
+    customer_ids: List[str]
+    customers_not_found: List[str]
+    shards: List[int]
+    mode: str = "exact"         # "exact" | "approximate"
+    status: str = "queued"      # queued -> training -> done | failed | cancelled
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    batch_id: Optional[int] = None   # jobs merged into one retrain share it
+    error: Optional[str] = None
+    result: Any = None               # what run_fn returned
+    profile: Optional[str] = None        # profiler kind requested for the retrain
+    profile_file: Optional[str] = None   # the saved profile, once done
+    done: threading.Event = field(default_factory=threading.Event, repr=False)
+
+class UnlearnQueue:
+    """
+    Runs erasures as background jobs on one worker thread. The first job
+    queued opens a window of window_ms; every job that arrives before it
+    closes (or while the previous retrain is still running) is merged into
+    a single run_fn(customer_ids, mode) call per unlearning mode, which
+    updates each affected shard once. Jobs are kept for lookup until
+    history newer ones push them out. on_status(jobs), if given, is called
+    whenever jobs enter a new status (queued, training, done, failed,
+    cancelled), before anyone waiting on them is woken. A batch with a
+    job submitted with profile=<kind> runs under profile(kind, label),
+    a context manager yielding {"file": ...} (see profiled()).
+    """
+    def __init__(self, run_fn, shard_of, window_ms: float = 500.0, history: int = 10000, on_status=None, profile=None):
+        self.run_fn = run_fn
+        self.shard_of = shard_of
+        self.on_status = on_status
+        self.profile = profile
+        self.window_ms = window_ms
+        self.history = history
+        self.jobs: "OrderedDict[str, UnlearnJob]" = OrderedDict()
+        self._pending: List[UnlearnJob] = []
+        self._taken: List[UnlearnJob] = []     # batch taken, not yet started
+        self._cond = threading.Condition()
+        # held while a batch retrains; /reset takes it to wait for the batch
+        self.run_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._batch_ids = itertools.count(1)
+
+        self.submitted = 0
+        self.retrains = 0
+
+    def start(self):
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="unlearn-jobs", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def submit(
+        self, customer_ids: List[str], not_found: List[str], mode: str = "exact", profile: Optional[str] = None,
+    ) -> UnlearnJob:
+        job = UnlearnJob(
+            job_id=uuid.uuid4().hex,
+            customer_ids=list(customer_ids),
+            customers_not_found=list(not_found),
+            shards=sorted({self.shard_of(c) for c in customer_ids}),
+            mode=mode,
+            profile=profile,
+        )
+        if not job.customer_ids:
+            job.status, job.finished_at = "done", time.time()
+        if self.on_status is not None:
+            self.on_status([job])
+        with self._cond:
+            self.jobs[job.job_id] = job
+            while len(self.jobs) > self.history:
+                self.jobs.popitem(last=False)
+            self.submitted += 1
+            if job.customer_ids:
+                self._pending.append(job)
+                self._cond.notify()
+            else:
+                job.done.set()
+        return job
+
+    def get(self, job_id: str) -> Optional[UnlearnJob]:
+        return self.jobs.get(job_id)
+
+    def cancel_pending(self):
+        """Drop jobs that have not started (e.g. on /reset); hold run_lock."""
+        with self._cond:
+            cancelled = [job for job in self._pending + self._taken if job.status == "queued"]
+            for job in cancelled:
+                job.status, job.finished_at = "cancelled", time.time()
+            self._pending = []
+        if cancelled and self.on_status is not None:
+            self.on_status(cancelled)
+        for job in cancelled:
+            job.done.set()
+
+    def _take_batch(self) -> Optional[List[UnlearnJob]]:
+        with self._cond:
+            while True:
+                if self._stopping:
+                    return None
+                if self._pending:
+                    remaining = self._pending[0].created_at + self.window_ms / 1000.0 - time.time()
+                    if remaining <= 0:
+                        self._taken, self._pending = self._pending, []
+                        return self._taken
+                    self._cond.wait(remaining)
+                else:
+                    self._cond.wait()
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            with self.run_lock:
+                batch = [job for job in batch if job.status == "queued"]
+                self._taken = []
+                if not batch:
+                    continue
+                by_mode: Dict[str, List[UnlearnJob]] = {}
+                for job in batch:
+                    by_mode.setdefault(job.mode, []).append(job)
+                for mode, jobs in by_mode.items():
+                    self._run_batch(jobs, mode)
+
+    def _run_batch(self, batch: List[UnlearnJob], mode: str):
+        batch_id = next(self._batch_ids)
+        customer_ids = list(dict.fromkeys(c for job in batch for c in job.customer_ids))
+        for job in batch:
+            job.status, job.batch_id, job.started_at = "training", batch_id, time.time()
+        if self.on_status is not None:
+            self.on_status(batch)
+        kind = next((job.profile for job in batch if job.profile), None)
+        saved = {"file": None}
+        profile = self.profile(kind, f"unlearn{batch_id}") if kind and self.profile else nullcontext(saved)
+        try:
+            with profile as saved:
+                result = self.run_fn(customer_ids, mode)
+            status, error = "done", None
+        except Exception as e:   # fail this batch, keep serving
+            result, status, error = None, "failed", repr(e)
+        self.retrains += 1
+        for job in batch:
+            job.status, job.error, job.finished_at = status, error, time.time()
+            job.result = result
+            job.profile_file = saved["file"]
+        if self.on_status is not None:
+            self.on_status(batch)
+        for job in batch:
+            job.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window_ms": self.window_ms,
+            "jobs_submitted": self.submitted,
+            "retrains": self.retrains,
+            "pending_jobs": len(self._pending),
+        }
+
+# =================================================================
+#  CHECKPOINT STORE
+# =================================================================
+
+CHECKPOINT_FORMAT = 1
+
+# (data file path, size, mtime, settings) -> hash, so an unchanged file is not re-read
+_FINGERPRINTS: Dict[Tuple[str, int, int, str], str] = {}
+
+def pristine_path(path: str) -> str:
+    """Where the freshly trained ensemble is kept next to a checkpoint."""
+    return os.path.splitext(path)[0] + ".pristine.pt"
+
+def data_fingerprint(path: str) -> str:
+    """
+    sha256 of the data file and of the settings that shape training: the
+    shard layout, augmentation, seed, training policy, checkpoint format
+    and model architecture. A checkpoint (or pristine copy) is only
+    restored when its fingerprint matches.
+    """
+    settings = "/".join(map(str, (
+        NUM_SHARDS, NUM_SLICES, AUG_FACTOR, TRAIN_SEED,
+        TRAIN_EPOCHS, LR_SCHEDULE, EARLY_STOP_PATIENCE, EARLY_STOP_HOLDOUT, MAX_BATCH_SIZE, WARM_START,
+        CHECKPOINT_FORMAT, len(FEATURE_COLUMNS), *MultiTaskNN.__init__.__defaults__,   # input_dim, hidden_dim
+    )))
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns, settings)
+    if key not in _FINGERPRINTS:
+        h = hashlib.sha256(settings.encode())
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        _FINGERPRINTS[key] = h.hexdigest()
+    return _FINGERPRINTS[key]
+
+_CHECKPOINT_LOCK = threading.Lock()
+
+def save_checkpoint(
+    path: str,
+    fingerprint: str,
+    ensemble: SISAEnsemble,
+    feature_stats: Tuple[np.ndarray, np.ndarray, np.ndarray],
+    unlearn_pending: List[str],
+    ingested: Optional[List[Dict[str, Any]]] = None,
+):
+    """
+    Write the ensemble, normalization stats and unlearning state to path
+    (via a temp file + rename, so a crash never leaves half a checkpoint).
+    unlearn_pending are customers forgotten in the business view whose
+    retrain has not run yet; startup queues them again. ingested are the
+    /ingest batches, replayed on top of the data file at startup. Metrics
+    live in the audit store.
+    """
+    state = {
+        "format": CHECKPOINT_FORMAT,
+        "fingerprint": fingerprint,
+        "feature_stats": [torch.from_numpy(np.asarray(a, dtype=np.float32)) for a in feature_stats],
+        "unlearn_pending": list(unlearn_pending),
+        "ingested": json.dumps(ingested or []),
+        **ensemble.state(),
+    }
+    with _CHECKPOINT_LOCK:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        torch.save(state, path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+def load_checkpoint(path: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+    """
+    Checkpoint saved by save_checkpoint, or None if there is none or it was
+    made from other data/settings. Tensors stay memory-mapped from the file.
+    """
+    if not os.path.exists(path):
+        return None
+    state = torch.load(path, mmap=True, weights_only=True, map_location="cpu")
+    if state.get("format") != CHECKPOINT_FORMAT or state.get("fingerprint") != fingerprint:
+        return None
+    state["feature_stats"] = [t.numpy() for t in state["feature_stats"]]
+    state["ingested"] = json.loads(state["ingested"]) if "ingested" in state else []
+    return state
+
+def checkpoint_system(notify: bool = True):
+    """
+    Save the current global state to CHECKPOINT_PATH (if enabled). In
+    shared mode the state version is bumped so other workers reload it,
+    unless notify is off (a new generation is announced instead).
+    """
+    if not CHECKPOINT_PATH:
+        return
+    ensemble = ENSEMBLE
+    save_checkpoint(
+        CHECKPOINT_PATH,
+        DATA_FINGERPRINT,
+        ensemble,
+        (FEATURE_MIN, FEATURE_MAX, FEATURE_RANGE),
+        sorted(UNLEARNED_CUSTOMERS - ensemble.forgotten),
+        INGESTED,
+    )
+    if SHARED is not None and notify:
+        SHARED.version = AUDIT.bump("state_version")
+
+# =================================================================
+#  AUDIT STORE (UNLEARNING EVENTS + METRICS)
+# =================================================================
+
+class AuditStore:
+    """
+    Append-only log of unlearning events plus the per-customer metrics
+    entries, in a SQLite file that survives restarts and is shared by all
+    workers. Every row carries the model generation it belongs to: a fresh
+    training run or /reset starts a new one, so /metrics only answers for
+    the models being served while the full history stays queryable.
+    Listings are keyset-paginated on id (after_id), so an audit can page
+    through any number of rows without OFFSET scans or loading them.
+    """
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+    INSERT OR IGNORE INTO meta VALUES ('generation', 0);
+    INSERT OR IGNORE INTO meta VALUES ('state_version', 0);
+    INSERT OR IGNORE INTO meta VALUES ('ingest_version', 0);
+
+    CREATE TABLE IF NOT EXISTS events (
+        id          INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts          REAL NOT NULL,
+        generation  INTEGER NOT NULL,
+        event       TEXT NOT NULL,      -- queued | training | done | failed | cancelled | generation | ingested
+        customer_id TEXT,
+        shard       INTEGER,
+        mode        TEXT,
+        job_id      TEXT,
+        batch_id    INTEGER,
+        detail      TEXT                -- JSON
+    );
+    CREATE INDEX IF NOT EXISTS events_customer ON events (customer_id, id);
+    CREATE INDEX IF NOT EXISTS events_shard ON events (shard, id);
+    CREATE INDEX IF NOT EXISTS events_ts ON events (ts);
+    CREATE INDEX IF NOT EXISTS events_event ON events (event, generation, id);
+
+    CREATE TABLE IF NOT EXISTS metrics (
+        id          INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts          REAL NOT NULL,
+        generation  INTEGER NOT NULL,
+        customer_id TEXT NOT NULL,
+        shard       INTEGER,
+        mode        TEXT,
+        entry       TEXT NOT NULL       -- JSON, the /metrics result
+    );
+    CREATE INDEX IF NOT EXISTS metrics_customer ON metrics (customer_id, generation, id);
+    CREATE INDEX IF NOT EXISTS metrics_shard ON metrics (shard, id);
+    CREATE INDEX IF NOT EXISTS metrics_ts ON metrics (ts);
+    """
+    GENERATION = "(SELECT value FROM meta WHERE key = 'generation')"
+    # filterable columns per table (query parameters map onto these only)
+    FILTERS = {
+        "events": ("customer_id", "shard", "event", "mode", "job_id", "generation"),
+        "metrics": ("customer_id", "shard", "mode", "generation"),
+    }
+
+    def __init__(self, path: str = ":memory:"):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30.0, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(self.SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @property
+    def generation(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT {self.GENERATION}").fetchone()[0]
+
+    def counter(self, key: str) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0]
+
+    def bump(self, key: str) -> int:
+        """Increment a meta counter (e.g. state_version); returns the new value."""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE meta SET value = value + 1 WHERE key = ?", (key,))
+            return self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0]
+
+    def queued_after(self, after_id: int) -> Tuple[set, int]:
+        """
+        Customers queued for unlearning in the current generation with an
+        event id above after_id. Returns (customer_ids, last id seen).
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, customer_id FROM events "
+                f"WHERE event = 'queued' AND generation = {self.GENERATION} AND id > ? ORDER BY id",
+                (after_id,),
+            ).fetchall()
+        return {r["customer_id"] for r in rows}, rows[-1]["id"] if rows else after_id
+
+    def new_generation(self, reason: str) -> int:
+        """Start a new model generation (fresh training or /reset)."""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+            self._conn.execute(
+                f"INSERT INTO events (ts, generation, event, detail) VALUES (?, {self.GENERATION}, 'generation', ?)",
+                (time.time(), json.dumps({"reason": reason})),
+            )
+            return self._conn.execute(f"SELECT {self.GENERATION}").fetchone()[0]
+
+    def log_events(
+        self,
+        event: str,
+        rows: List[Tuple[str, int, Optional[str]]],
+        job_id: Optional[str] = None,
+        batch_id: Optional[int] = None,
+        detail: Optional[Dict[str, Any]] = None,
+    ):
+        """Append one event per (customer_id, shard, mode) row, in one transaction."""
+        ts = time.time()
+        detail_json = json.dumps(detail) if detail else None
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT INTO events (ts, generation, event, customer_id, shard, mode, job_id, batch_id, detail) "
+                f"VALUES (?, {self.GENERATION}, ?, ?, ?, ?, ?, ?, ?)",
+                ((ts, event, cid, shard, mode, job_id, batch_id, detail_json) for cid, shard, mode in rows),
+            )
+
+    def put_metrics(self, entries: Dict[str, Dict[str, Any]], shard_of: Callable[[str], int]):
+        """Store /metrics entries (customer_id -> entry) in one transaction."""
+        ts = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT INTO metrics (ts, generation, customer_id, shard, mode, entry) "
+                f"VALUES (?, {self.GENERATION}, ?, ?, ?, ?)",
+                (
+                    (ts, cid, shard_of(cid), entry.get("unlearning_mode"), json.dumps(entry))
+                    for cid, entry in entries.items()
+                ),
+            )
+
+    def metrics_of(self, customer_ids: List[str], chunk: int = 500) -> Dict[str, Dict[str, Any]]:
+        """Latest metrics entry of each customer in the current generation."""
+        out: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            for i in range(0, len(customer_ids), chunk):
+                ids = customer_ids[i:i + chunk]
+                rows = self._conn.execute(
+                    f"SELECT customer_id, entry FROM metrics "
+                    f"WHERE customer_id IN ({','.join('?' * len(ids))}) AND generation = {self.GENERATION} "
+                    f"ORDER BY id",
+                    ids,
+                )
+                out.update((r["customer_id"], json.loads(r["entry"])) for r in rows)
+        return out
+
+    def query(
+        self,
+        table: str,
+        filters: Dict[str, Any],
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        after_id: int = 0,
+        limit: int = 100,
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        One page of table rows matching filters (column -> value, None
+        ignored) and the [since, until) time range, oldest first, starting
+        after after_id. Returns (rows, next_after_id or None on the last page).
+        """
+        where, args = ["id > ?"], [after_id]
+        for col in self.FILTERS[table]:
+            if filters.get(col) is not None:
+                where.append(f"{col} = ?")
+                args.append(filters[col])
+        if since is not None:
+            where.append("ts >= ?")
+            args.append(since)
+        if until is not None:
+            where.append("ts < ?")
+            args.append(until)
+        sql = f"SELECT * FROM {table} WHERE {' AND '.join(where)} ORDER BY id LIMIT ?"
+        with self._lock:
+            rows = [dict(r) for r in self._conn.execute(sql, args + [limit + 1])]
+        more = len(rows) > limit
+        rows = rows[:limit]
+        for r in rows:
+            for key in ("detail", "entry"):
+                if r.get(key) is not None:
+                    r[key] = json.loads(r[key])
+        return rows, rows[-1]["id"] if more else None
 
-# Load base personas (e.g., 7 customers: 1001–1007)
-BASE_PERSONAS, NAME_TO_ID, ID_TO_RECORD = load_customers_from_csv("customers.csv")
+# =================================================================
+#  SHARED STATE (MULTI-WORKER)
+# =================================================================
 
-# Build augmented training set from persona clusters
-ALL_RECORDS = augment_personas(list(ID_TO_RECORD.values()), factor=AUG_FACTOR)
+class SharedState:
+    """
+    Coordination between worker processes serving the same checkpoint.
+    exclusive() holds an flock on lock_path (re-entrant per process): only
+    its holder trains, unlearns or resets, then saves the checkpoint and
+    bumps the state version in the audit database. A poller thread calls
+    sync_fn every interval_s so each worker picks up what others changed.
+    """
+    def __init__(self, lock_path: str, interval_s: float = 1.0):
+        if fcntl is None:
+            raise RuntimeError("UNLEARNAI_SHARED_STATE needs POSIX file locks (fcntl)")
+        self.lock_path = lock_path
+        self.interval_s = interval_s
+        self._local = threading.RLock()
+        self._fd: Optional[int] = None
+        self._depth = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # what this worker has loaded
+        self.generation = 0
+        self.version = 0
+        self.ingest_version = 0
+        self.events_seen = 0
+        self.reloads = 0
+        self.sync_errors = 0
+
+    @contextmanager
+    def exclusive(self):
+        with self._local:
+            if self._depth == 0:
+                os.makedirs(os.path.dirname(self.lock_path) or ".", exist_ok=True)
+                self._fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+                    os.close(self._fd)
+                    self._fd = None
+
+    def start(self, sync_fn: Callable[[], None]):
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(self.interval_s):
+                try:
+                    sync_fn()
+                except Exception:   # keep serving the state we have; retry next tick
+                    self.sync_errors += 1
+
+        self._thread = threading.Thread(target=run, name="shared-state-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "generation": self.generation,
+            "state_version": self.version,
+            "ingest_version": self.ingest_version,
+            "reloads": self.reloads,
+            "sync_errors": self.sync_errors,
+        }
+
+def model_write_lock():
+    """Cross-worker lock for changing the models (no-op unless shared)."""
+    return SHARED.exclusive() if SHARED is not None else nullcontext()
+
+# =================================================================
+#  GLOBAL INIT
+# =================================================================
 
-# Normalize training features and record normalization stats
-ALL_RECORDS, FEATURE_MIN, FEATURE_MAX, FEATURE_RANGE = normalize_features(ALL_RECORDS)
+torch.manual_seed(42)
+np.random.seed(42)
 
-# Apply the same normalization to canonical persona records
-for rec in ID_TO_RECORD.values():
-    rec.features = (rec.features - FEATURE_MIN) / FEATURE_RANGE
+def normalize_features(records: RecordStore, stats: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None):
+    """
+    Min-max normalize all features across the given records (in place),
+    or with given (min, max, range) stats, e.g. restored from a checkpoint.
+    Returns (normalized_records, feature_min, feature_max, feature_range).
+    """
+    all_features = records.features
+    if stats is not None:
+        feature_min, feature_max, feature_range = stats
+    else:
+        feature_min = all_features.min(axis=0)
+        feature_max = all_features.max(axis=0)
+        feature_range = np.where(feature_max - feature_min == 0, 1.0, feature_max - feature_min)
 
-# Global training records (will shrink as we unlearn customers)
-TRAIN_RECORDS: List[CustomerRecord] = ALL_RECORDS.copy()
+    all_features -= feature_min
+    all_features /= feature_range
 
-ENSEMBLE = SISAEnsemble(num_shards=NUM_SHARDS)
-SHARD_MAP = ENSEMBLE.shard_records(TRAIN_RECORDS)
-ENSEMBLE.train_all_shards(SHARD_MAP, epochs=100)
+    return records, feature_min, feature_max, feature_range
 
+class RunningFeatureStats:
+    """
+    Per-column count, mean, variance, min and max of raw training
+    features, merged block by block (Chan et al.). Online ingestion keeps
+    it up to date while the models' min/max transform stays frozen, so
+    rows already trained on are never rescaled; it shows how far new
+    customers drift from the range the models were fitted on.
+    """
+    def __init__(self, dim: int = len(FEATURE_COLUMNS)):
+        self.count = 0
+        self.mean = np.zeros(dim)
+        self.m2 = np.zeros(dim)
+        self.min = np.full(dim, np.inf)
+        self.max = np.full(dim, -np.inf)
+
+    def update(self, X: np.ndarray, block: int = 1_000_000):
+        for start in range(0, len(X), block):
+            B = np.asarray(X[start:start + block], dtype=np.float64)
+            n, mean = len(B), B.mean(axis=0)
+            total = self.count + n
+            delta = mean - self.mean
+            self.m2 += ((B - mean) ** 2).sum(axis=0) + delta ** 2 * self.count * n / total
+            self.mean += delta * n / total
+            self.count = total
+            self.min = np.minimum(self.min, B.min(axis=0))
+            self.max = np.maximum(self.max, B.max(axis=0))
+
+    def copy(self) -> "RunningFeatureStats":
+        return copy.deepcopy(self)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        std = np.sqrt(self.m2 / max(self.count, 1))
+        return {
+            col: {"mean": float(self.mean[i]), "std": float(std[i]), "min": float(self.min[i]), "max": float(self.max[i])}
+            for i, col in enumerate(FEATURE_COLUMNS)
+        }
+
+# Global state, built by init_system() at startup and on /reset.
+BASE_PERSONAS: List[CustomerRecord] = []
+NAME_TO_ID: Dict[str, str] = {}
+ID_TO_RECORD: Mapping = {}   # dict, or PersonaTable in streaming mode
+ALL_RECORDS: RecordStore = RecordStore.empty([])
+TRAIN_RECORDS: RecordStore = RecordStore.empty([])   # will shrink as we unlearn customers
+FEATURE_MIN = FEATURE_MAX = FEATURE_RANGE = None
+# raw-feature stats of the data file, and including customers added online
+BASE_FEATURE_STATS: Optional[RunningFeatureStats] = None
+FEATURE_STATS: Optional[RunningFeatureStats] = None
+# /ingest batches since the data file was loaded: {"seed", "customers": [CSV rows], "slices"}
+INGESTED: List[Dict[str, Any]] = []
+ENSEMBLE: SISAEnsemble = None
+SHARD_MAP: Dict[int, List[RecordStore]] = {}
 UNLEARNED_CUSTOMERS = set()   # which customers are logically “forgotten”
-METRICS_DB: Dict[str, Dict[str, Any]] = {}  # per-customer metrics
+AUDIT: Optional[AuditStore] = None          # event log + per-customer metrics, opened at startup
+SHARED: Optional[SharedState] = None        # set at startup when SHARED_STATE is on
+BATCHER: Optional[MicroBatcher] = None      # set at startup when MICROBATCH is on
+DATA_FINGERPRINT = ""
+# freshly trained state /reset returns to: shard models and untouched slices
+PRISTINE_SHARDS: List[SISAShard] = []
+PRISTINE_SNAPSHOT: Optional[EnsembleSnapshot] = None   # PRISTINE_SHARDS for /drift_report, engine built once
+PRISTINE_SLICES: Dict[int, List[RecordStore]] = {}
+RESUME_UNLEARNING: List[str] = []   # queued erasures restored from a checkpoint
+UNLEARN_QUEUE: Optional[UnlearnQueue] = None  # started with the app
+PREDICTION_CACHE: Optional[PredictionCache] = (
+    PredictionCache(PREDICT_CACHE_SIZE, PREDICT_CACHE_TTL_S) if PREDICT_CACHE_SIZE > 0 else None
+)
+EMBEDDING_INDEX = EmbeddingIndex()   # built lazily by the first /similar
+
+def init_system(restore: bool = True):
+    """
+    Build (or rebuild) all global state. The ensemble is restored from
+    CHECKPOINT_PATH when a checkpoint of the same data exists (and restore
+    is set), otherwise trained and checkpointed. Runs from the app lifespan
+    rather than at import time, so training-pool workers can import this
+    module cheaply. In shared mode it runs under the cross-worker lock, so
+    of several workers starting together only the first trains.
+    """
+    global AUDIT, SHARED
+
+    if AUDIT is None:
+        AUDIT = AuditStore(AUDIT_DB_PATH or ":memory:")
+    if SHARED_STATE and SHARED is None:
+        if not CHECKPOINT_PATH or not AUDIT_DB_PATH:
+            raise RuntimeError("UNLEARNAI_SHARED_STATE needs UNLEARNAI_CHECKPOINT and UNLEARNAI_AUDIT_DB")
+        SHARED = SharedState(CHECKPOINT_PATH + ".lock", SYNC_INTERVAL_S)
+    with model_write_lock():
+        _build_system(restore)
+
+def _build_system(restore: bool):
+    global BASE_PERSONAS, NAME_TO_ID, ID_TO_RECORD
+    global ALL_RECORDS, TRAIN_RECORDS, FEATURE_MIN, FEATURE_MAX, FEATURE_RANGE
+    global ENSEMBLE, SHARD_MAP, UNLEARNED_CUSTOMERS
+    global DATA_FINGERPRINT, RESUME_UNLEARNING, PRISTINE_SHARDS, PRISTINE_SLICES, PRISTINE_SNAPSHOT
+    global BASE_FEATURE_STATS, FEATURE_STATS, INGESTED
+
+    DATA_FINGERPRINT = data_fingerprint(DATA_PATH)
+    state = None
+    if restore and CHECKPOINT_PATH:
+        state = load_checkpoint(CHECKPOINT_PATH, DATA_FINGERPRINT)
+
+    if INGEST_MODE == "stream":
+        # 1️⃣-4️⃣ One chunked pass: augment, min/max, memory-mapped columns
+        with STATS.timer("stage_seconds", stage="stream_ingest"):
+            ID_TO_RECORD, ALL_RECORDS, FEATURE_MIN, FEATURE_MAX, FEATURE_RANGE = stream_customers(DATA_PATH)
+        BASE_PERSONAS, NAME_TO_ID = [], {}
+        BASE_FEATURE_STATS = FEATURE_STATS = None
+    else:
+        # 1️⃣ Load base personas (e.g., 7 customers: 1001–1007)
+        with STATS.timer("stage_seconds", stage="load"):
+            BASE_PERSONAS, NAME_TO_ID, ID_TO_RECORD = load_customers_from_csv(DATA_PATH)
+
+        # 2️⃣ Build augmented training set from persona clusters
+        with STATS.timer("stage_seconds", stage="augment"):
+            ALL_RECORDS = augment_personas(list(ID_TO_RECORD.values()), factor=AUG_FACTOR)
+
+        # 3️⃣ Normalize training features and record normalization stats
+        # (plus the running raw-feature stats online ingestion extends)
+        with STATS.timer("stage_seconds", stage="normalize"):
+            BASE_FEATURE_STATS = RunningFeatureStats()
+            BASE_FEATURE_STATS.update(ALL_RECORDS.features)
+            FEATURE_STATS = BASE_FEATURE_STATS.copy()
+            ALL_RECORDS, FEATURE_MIN, FEATURE_MAX, FEATURE_RANGE = normalize_features(
+                ALL_RECORDS, state["feature_stats"] if state else None
+            )
+
+        # 4️⃣ Apply the same normalization to canonical persona records
+        personas = list(ID_TO_RECORD.values())
+        if personas:
+            persona_features = (np.stack([r.features for r in personas]) - FEATURE_MIN) / FEATURE_RANGE
+            for rec, feats in zip(personas, persona_features):
+                rec.features = feats
+
+    # 5️⃣ Global training records (full augmented dataset), plus the
+    # customers added online since, in their original slices
+    TRAIN_RECORDS = ALL_RECORDS.fork()
+    INGESTED = list(state["ingested"]) if state and INGEST_MODE != "stream" else []
+    ingested_slices: Dict[str, int] = {}
+    if INGESTED:
+        stores = []
+        for batch in INGESTED:
+            records, store, raw = _ingest_records(batch["customers"], batch["seed"])
+            _register_ingested(records, raw)
+            stores.append(store)
+            ingested_slices.update(batch["slices"])
+        TRAIN_RECORDS = RecordStore.concat([TRAIN_RECORDS, *stores])
+
+    # 6️⃣ Build SISA ensemble (restored, or shards trained on the training
+    # pool). It is published only once ready: /predict keeps using the old
+    # one meanwhile
+    ensemble = SISAEnsemble(
+        num_shards=NUM_SHARDS,
+        spill_dir=DATA_DIR if INGEST_MODE == "stream" else None,
+    )
+    if state:
+        ensemble.customer_to_shard.update(state["customer_to_shard"])
+    SHARD_MAP = ensemble.shard_records(TRAIN_RECORDS, ingested_slices)
+    PRISTINE_SLICES = {sid: [sl.fork() for sl in slices] for sid, slices in SHARD_MAP.items()}
+    for cid, k in ingested_slices.items():   # the pristine models never saw them
+        PRISTINE_SLICES[ensemble.shard_for(cid)][k].remove([cid])
+    if state:
+        ensemble.restore(state)
+        TRAIN_RECORDS.remove(ensemble.forgotten)
+        changed = ensemble.forgotten or INGESTED
+        pristine = load_checkpoint(pristine_path(CHECKPOINT_PATH), DATA_FINGERPRINT) if changed else state
+        PRISTINE_SHARDS = ensemble.shards_from_state(pristine) if pristine else []
+    else:
+        ensemble.train_all_shards(SHARD_MAP)
+        PRISTINE_SHARDS = list(ensemble.shards.values())
+    PRISTINE_SNAPSHOT = EnsembleSnapshot(
+        {shard.shard_id: shard for shard in PRISTINE_SHARDS},
+        {shard.shard_id: 0 for shard in PRISTINE_SHARDS},
+        0,
+        ensemble.device,
+    ) if PRISTINE_SHARDS else None
+    if PREDICTION_CACHE is not None:
+        PREDICTION_CACHE.clear()
+        ensemble.on_shard_replaced.append(PREDICTION_CACHE.invalidate_shard)
+    EMBEDDING_INDEX.clear()
+    ensemble.on_shard_replaced.append(EMBEDDING_INDEX.invalidate_shard)
+    ENSEMBLE = ensemble
+
+    # 7️⃣ Unlearning state: restored, or cleared (metrics live in the audit store)
+    if state:
+        RESUME_UNLEARNING = list(state["unlearn_pending"])
+        UNLEARNED_CUSTOMERS = ensemble.forgotten | set(RESUME_UNLEARNING)
+    else:
+        RESUME_UNLEARNING = []
+        UNLEARNED_CUSTOMERS = set()
+        checkpoint_system(notify=False)
+        if CHECKPOINT_PATH:
+            save_checkpoint(
+                pristine_path(CHECKPOINT_PATH), DATA_FINGERPRINT, ensemble,
+                (FEATURE_MIN, FEATURE_MAX, FEATURE_RANGE), [],
+            )
+        # announced once the checkpoint is on disk: other workers reload it
+        AUDIT.new_generation("trained")
+
+    if SHARED is not None:
+        # erasures other workers have queued but not run yet
+        queued, SHARED.events_seen = AUDIT.queued_after(0)
+        UNLEARNED_CUSTOMERS |= queued
+        SHARED.generation = AUDIT.generation
+        SHARED.version = AUDIT.counter("state_version")
+        SHARED.ingest_version = AUDIT.counter("ingest_version")
+
+def reset_from_pristine() -> bool:
+    """
+    Return to the freshly trained state without retraining: pristine shard
+    models are republished over copy-on-write forks of the records and
+    slices. Returns False (nothing done) when there is no pristine state
+    or the data file changed since it was built.
+    """
+    global TRAIN_RECORDS, ENSEMBLE, SHARD_MAP, UNLEARNED_CUSTOMERS, RESUME_UNLEARNING
+    global BASE_PERSONAS, INGESTED, FEATURE_STATS
+
+    if not PRISTINE_SHARDS or data_fingerprint(DATA_PATH) != DATA_FINGERPRINT:
+        return False
+
+    # customers added online are dropped: back to the data file
+    ingested = {row["customer_id"] for batch in INGESTED for row in batch["customers"]}
+    if ingested:
+        for cid in ingested:
+            name = ID_TO_RECORD.pop(cid).customer_name
+            if NAME_TO_ID.get(name) == cid:
+                del NAME_TO_ID[name]
+        BASE_PERSONAS = [rec for rec in BASE_PERSONAS if rec.customer_id not in ingested]
+        FEATURE_STATS = BASE_FEATURE_STATS.copy()
+    INGESTED = []
+
+    TRAIN_RECORDS = ALL_RECORDS.fork()
+    ensemble = ENSEMBLE.fork(PRISTINE_SHARDS, PRISTINE_SLICES)
+    if PREDICTION_CACHE is not None:
+        PREDICTION_CACHE.clear()
+        ensemble.on_shard_replaced.append(PREDICTION_CACHE.invalidate_shard)
+    EMBEDDING_INDEX.clear()
+    ensemble.on_shard_replaced.append(EMBEDDING_INDEX.invalidate_shard)
+    SHARD_MAP = ensemble.shard_slices
+    ENSEMBLE = ensemble
+
+    RESUME_UNLEARNING = []
+    UNLEARNED_CUSTOMERS = set()
+    checkpoint_system(notify=False)
+    generation = AUDIT.new_generation("reset")
+    if SHARED is not None:
+        SHARED.generation = generation
+    return True
+
+def sync_shared_state():
+    """
+    Catch up with what other workers published (shared mode). A new
+    generation (reset or full retrain) or newly ingested customers rebuild
+    from the checkpoint; a new state version tombstones newly forgotten
+    customers and republishes the changed shards; erasures queued
+    elsewhere join UNLEARNED_CUSTOMERS. Call with the unlearning run_lock
+    held.
+    """
+    if AUDIT.generation != SHARED.generation or AUDIT.counter("ingest_version") != SHARED.ingest_version:
+        init_system()
+        SHARED.reloads += 1
+        return
+    version = AUDIT.counter("state_version")
+    if version != SHARED.version:
+        state = load_checkpoint(CHECKPOINT_PATH, DATA_FINGERPRINT)
+        if state is not None:
+            UNLEARNED_CUSTOMERS.update(ENSEMBLE.sync(state, TRAIN_RECORDS))
+            SHARED.reloads += 1
+        SHARED.version = version
+    queued, SHARED.events_seen = AUDIT.queued_after(SHARED.events_seen)
+    UNLEARNED_CUSTOMERS.update(queued)
+
+# =================================================================
+#  ONLINE INGESTION (NEW CUSTOMERS WITHOUT A FULL RETRAIN)
+# =================================================================
+
+def _ingest_records(rows: List[Dict[str, Any]], seed: int) -> Tuple[List[CustomerRecord], RecordStore, np.ndarray]:
+    """
+    Customer records and augmented training rows for rows in the data
+    file's columns. Rows are normalized with the frozen FEATURE_MIN /
+    FEATURE_RANGE and coded into the training records' customer table.
+    Returns (records, store, raw augmented features).
+    """
+    records = [
+        CustomerRecord(
+            customer_id=str(r["customer_id"]),
+            customer_name=r["customer_name"],
+            features=np.array([r[c] for c in FEATURE_COLUMNS], dtype=np.float32),
+            segment=int(r["segment_label"]),
+            nbo=int(r["nbo_label"]),
+            score=float(r["score_label"]),
+            full_data=dict(r),
+        )
+        for r in rows
+    ]
+    store = augment_personas(records, factor=AUG_FACTOR, seed=seed)
+    raw = store.features.copy()
+    store, *_ = normalize_features(store, (FEATURE_MIN, FEATURE_MAX, FEATURE_RANGE))
+    for rec in records:
+        rec.features = (rec.features - FEATURE_MIN) / FEATURE_RANGE
+
+    table, code_of = TRAIN_RECORDS.customer_ids, TRAIN_RECORDS.code_of
+    codes = np.empty(len(records), dtype=np.int32)
+    for i, rec in enumerate(records):
+        if rec.customer_id not in code_of:
+            code_of[rec.customer_id] = len(table)
+            table.append(rec.customer_id)
+        codes[i] = code_of[rec.customer_id]
+    store = replace(
+        store, cust_idx=codes[store.cust_idx], customer_ids=table, code_of=code_of,
+        _codes=None, _start=None, _count=None,
+    )
+    return records, store, raw
+
+def _register_ingested(records: List[CustomerRecord], raw: np.ndarray):
+    """Make ingested customers known to the lookups and running stats."""
+    for rec in records:
+        ID_TO_RECORD[rec.customer_id] = rec
+        NAME_TO_ID[rec.customer_name] = rec.customer_id
+        BASE_PERSONAS.append(rec)
+    FEATURE_STATS.update(raw)
+
+def ingest_customers(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Add new customers to the served models. Each one lands in its hashed
+    shard, appended to the last slice, and only those shards retrain from
+    their last slice checkpoint. Rows whose id is already known or whose
+    labels are out of range are rejected. The batch is saved with the
+    checkpoint and replayed at startup; /reset drops it again.
+    Returns {"ingested", "rejected", "shards_updated", "train_report",
+    "outside_train_range"}. Call with the unlearning run_lock held.
+    """
+    global TRAIN_RECORDS
+
+    with model_write_lock():
+        if SHARED is not None:
+            sync_shared_state()
+
+        accepted, rejected, seen = [], [], set()
+        for r in rows:
+            cid = str(r["customer_id"])
+            if cid in ID_TO_RECORD or cid in seen:
+                rejected.append({"customer_id": cid, "reason": "customer already exists"})
+            elif r["segment_label"] not in SEGMENT_NAMES or r["nbo_label"] not in CARD_NAMES:
+                rejected.append({"customer_id": cid, "reason": "unknown segment or nbo label"})
+            elif not 0.0 <= r["score_label"] <= 1.0:
+                rejected.append({"customer_id": cid, "reason": "score_label outside [0, 1]"})
+            else:
+                accepted.append({**r, "customer_id": cid})
+                seen.add(cid)
+        if not accepted:
+            return {"ingested": [], "rejected": rejected, "shards_updated": [], "train_report": {}, "outside_train_range": 0.0}
+
+        # seeded by the ids, so replaying the batch rebuilds the same rows
+        seed = zlib.crc32(",".join(r["customer_id"] for r in accepted).encode())
+        records, store, raw = _ingest_records(accepted, seed)
+        reset_train_progress({ENSEMBLE.shard_for(rec.customer_id) for rec in records})
+        with STATS.timer("stage_seconds", stage="ingest_retrain"):
+            affected, TRAIN_RECORDS = ENSEMBLE.add_customers(store, TRAIN_RECORDS)
+        _register_ingested(records, raw)
+
+        outside = (raw < FEATURE_MIN) | (raw > FEATURE_MAX)
+        INGESTED.append({
+            "seed": seed,
+            "customers": accepted,
+            "slices": {rec.customer_id: ENSEMBLE.customer_to_slice[rec.customer_id] for rec in records},
+        })
+        with STATS.timer("stage_seconds", stage="checkpoint"):
+            checkpoint_system(notify=False)
+        version = AUDIT.bump("ingest_version")
+        if SHARED is not None:
+            SHARED.ingest_version = version
+        AUDIT.log_events("ingested", [(rec.customer_id, ENSEMBLE.shard_for(rec.customer_id), None) for rec in records])
+
+    snapshot = ENSEMBLE.snapshot()
+    return {
+        "ingested": [rec.customer_id for rec in records],
+        "rejected": rejected,
+        "shards_updated": affected,
+        "train_report": {sid: snapshot.shards[sid].report for sid in affected},
+        "outside_train_range": float(outside.any(axis=1).mean()),
+    }
 
 # =================================================================
 #  FASTAPI SCHEMAS
@@ -570,30 +3665,233 @@ class PredictResponse(BaseModel):
     raw_nbo_probs: List[float]
     raw_score_pred: float
 
+# one raw feature row, in FEATURE_COLUMNS order (other lengths are a 422)
+FeatureRow = conlist(float, min_length=len(FEATURE_COLUMNS), max_length=len(FEATURE_COLUMNS))
+
+class PredictBatchRequest(BaseModel):
+    customer_ids: List[str] = []            # known customers to score, and/or
+    features: List[FeatureRow] = []         # raw feature rows
+
+class PredictBatchResponse(BaseModel):
+    # column-oriented: one entry per customer_id, then one per feature row
+    customer_ids: List[Optional[str]]
+    customer_names: List[Optional[str]]
+    segment: List[str]
+    nbo: List[str]
+    score: List[float]
+    baseline: List[bool]
+    raw_segment_probs: List[List[float]]
+    raw_nbo_probs: List[List[float]]
+    raw_score_pred: List[float]
+
 class UnlearnRequest(BaseModel):
     customer_id: str
+    wait: bool = False   # block until the retrain is done
+    mode: Optional[str] = None   # "exact" | "approximate", default UNLEARN_MODE
 
 class UnlearnResponse(BaseModel):
     message: str
     retrained_shard: int
+    job_id: Optional[str] = None
+    status: str = "done"
+    mode: Optional[str] = None   # requested mode, or the one used once done
 
 class UnlearnBatchRequest(BaseModel):
     customer_ids: List[str]
+    wait: bool = False
+    mode: Optional[str] = None
 
 class UnlearnBatchResponse(BaseModel):
     message: str
     customers_unlearned: List[str]
     customers_not_found: List[str]
     shards_retrained: List[int]
+    job_id: Optional[str] = None
+    status: str = "done"
+    modes: Dict[str, str] = {}   # shard -> "exact" | "approximate" | "exact_fallback", once done
+
+class UnlearnJobResponse(BaseModel):
+    job_id: str
+    status: str
+    customer_ids: List[str] = []
+    customers_not_found: List[str] = []
+    shards: List[int] = []
+    mode: str = "exact"                   # requested unlearning mode
+    modes: Dict[str, str] = {}            # shard -> mode actually used, once done
+    batch_id: Optional[int] = None        # shared by jobs merged into one retrain
+    progress: Dict[str, Dict[str, int]] = {}   # shard -> {"epoch", "epochs"} while training
+    queued_s: Optional[float] = None
+    training_s: Optional[float] = None
+    error: Optional[str] = None
+    metrics: Dict[str, Dict[str, Any]] = {}   # customer -> /metrics entry, once done
+    train_report: Dict[str, Dict[str, Any]] = {}   # shard -> epochs used, wall time, ...
+    profile: Optional[str] = None         # profile of the retrain, see /internal/profiles
 
 class MetricsResponse(BaseModel):
     result: Dict[str, Any]
 
+class AuditPage(BaseModel):
+    items: List[Dict[str, Any]]
+    next_after_id: Optional[int] = None   # pass as after_id for the next page; None = last page
+
+class IngestCustomer(BaseModel):
+    # one row in the data file's columns, raw (unnormalized) features
+    customer_id: str
+    customer_name: str
+    age: int
+    income: float
+    tenure_months: int
+    travel_ratio: float
+    online_ratio: float
+    num_cards: int
+    late_12m: int
+    mobile_logins: int
+    segment_label: int
+    nbo_label: int
+    score_label: float
+
+class IngestRequest(BaseModel):
+    customers: List[IngestCustomer]
+
+class IngestResponse(BaseModel):
+    message: str
+    ingested: List[str]
+    rejected: List[Dict[str, str]] = []       # {"customer_id", "reason"}
+    shards_updated: List[int] = []
+    train_report: Dict[str, Dict[str, Any]] = {}   # shard -> epochs used, wall time, ...
+    outside_train_range: float = 0.0          # share of new rows outside the frozen min/max
+
+class SimilarRequest(BaseModel):
+    customer_id: Optional[str] = None       # a known customer, or
+    features: Optional[FeatureRow] = None   # one raw feature row
+    k: int = 10
+    all_shards: bool = False                # for a customer: every shard, not just their own
+
+class SimilarResponse(BaseModel):
+    message: str
+    customer_id: Optional[str] = None
+    shard: Optional[int] = None             # the customer's shard
+    # shard -> [{"customer_id", "customer_name", "similarity"}], best first;
+    # similarities are only comparable within one shard
+    neighbours: Dict[str, List[Dict[str, Any]]] = {}
+
 # =================================================================
 #  FASTAPI APP
 # =================================================================
 
-app = FastAPI(title="UnlearnAI – CSV + SISA Backend (Regulator Grade)")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global BATCHER, UNLEARN_QUEUE, AUDIT
+    init_system(restore=not FORCE_TRAIN)
+    # reads ENSEMBLE at call time, so /reset is picked up
+    UNLEARN_QUEUE = UnlearnQueue(
+        run_unlearning, lambda cid: ENSEMBLE.shard_for(cid), window_ms=UNLEARN_WINDOW_MS, on_status=audit_jobs,
+        profile=profiled,
+    )
+    UNLEARN_QUEUE.start()
+    if RESUME_UNLEARNING:
+        UNLEARN_QUEUE.submit(RESUME_UNLEARNING, [], UNLEARN_MODE)
+    if SHARED is not None:
+        def sync():
+            with UNLEARN_QUEUE.run_lock:
+                sync_shared_state()
+        SHARED.start(sync)
+    if MICROBATCH:
+        # reads ENSEMBLE at call time, so /reset is picked up
+        BATCHER = MicroBatcher(
+            snapshot_outputs_by_row,
+            max_batch=MICROBATCH_MAX_BATCH,
+            window_ms=MICROBATCH_WINDOW_MS,
+        )
+        await BATCHER.start()
+    yield
+    if BATCHER is not None:
+        await BATCHER.stop()
+        BATCHER = None
+    if SHARED is not None:
+        SHARED.stop()
+    UNLEARN_QUEUE.stop()
+    UNLEARN_QUEUE = None
+    AUDIT.close()
+    AUDIT = None
+
+class TimedJSONResponse(JSONResponse):
+    """JSONResponse that records its serialization time in STATS."""
+    def render(self, content: Any) -> bytes:
+        with STATS.timer("json_render_seconds"):
+            return super().render(content)
+
+class RequestTimer:
+    """
+    Plain ASGI middleware (no per-request task or body buffering) timing
+    every HTTP request by matched route template and method.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not STATS.enabled:
+            return await self.app(scope, receive, send)
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            STATS.observe("http_request_seconds", time.perf_counter() - t0, route=route, method=scope["method"])
+
+class ProfileSelector:
+    """
+    ASGI middleware picking the requests to profile (PROFILE_ENABLED
+    only): PROFILE_ROUTES calls sent with header X-UnlearnAI-Profile or
+    ?profile= set to cprofile|torch (1 = cprofile), plus one in
+    PROFILE_SAMPLE_N of them. The choice is left in PROFILE_REQUEST for
+    the handler; the saved file is named in the X-UnlearnAI-Profile
+    response header.
+    """
+    def __init__(self, app):
+        self.app = app
+        self._calls = itertools.count(1)
+
+    def _requested(self, scope) -> Optional[str]:
+        value = dict(scope["headers"]).get(b"x-unlearnai-profile", b"").decode()
+        if not value:
+            for part in scope.get("query_string", b"").decode().split("&"):
+                key, _, v = part.partition("=")
+                if key == "profile":
+                    value = v
+        if value in ("1", "true"):
+            value = "cprofile"
+        if value in PROFILE_KINDS:
+            return value
+        if PROFILE_SAMPLE_N > 0 and next(self._calls) % PROFILE_SAMPLE_N == 0:
+            return PROFILE_SAMPLE_KIND
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if not PROFILE_ENABLED or scope["type"] != "http" or scope["path"] not in PROFILE_ROUTES:
+            return await self.app(scope, receive, send)
+        kind = self._requested(scope)
+        if kind is None:
+            return await self.app(scope, receive, send)
+        request = {"kind": kind, "file": None}
+
+        async def send_with_header(message):
+            if message["type"] == "http.response.start" and request["file"]:
+                message = {**message, "headers": [*message.get("headers", []),
+                                                  (b"x-unlearnai-profile", request["file"].encode())]}
+            await send(message)
+
+        token = PROFILE_REQUEST.set(request)
+        try:
+            await self.app(scope, receive, send_with_header)
+        finally:
+            PROFILE_REQUEST.reset(token)
+
+app = FastAPI(
+    title="UnlearnAI – CSV + SISA Backend (Regulator Grade)",
+    lifespan=lifespan,
+    default_response_class=TimedJSONResponse,
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -602,16 +3900,67 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(RequestTimer)
+app.add_middleware(ProfileSelector)
+
+def snapshot_outputs_by_row(X: np.ndarray) -> List[Tuple[EnsembleSnapshot, Dict[int, Tuple]]]:
+    """Micro-batcher forward: per-row shard outputs, with the snapshot used."""
+    snapshot = ENSEMBLE.snapshot()
+    return [(snapshot, row) for row in snapshot.shard_outputs_by_row(X)]
+
+def profiled_shard_outputs(snapshot: EnsembleSnapshot, X: np.ndarray, shard_ids: List[int], request: Dict[str, Any]):
+    """
+    snapshot.shard_outputs under the profiler request asked for, started
+    in the calling thread, so the profile holds exactly this forward pass.
+    The saved file is reported back in request["file"].
+    """
+    with profiled(request["kind"], "predict") as out:
+        outs = snapshot.shard_outputs(X, shard_ids)
+    request["file"] = out["file"]
+    return outs
+
+async def predict_customer(cid: str, features: np.ndarray):
+    """
+    Ensemble prediction for one customer: shard outputs come from
+    PREDICTION_CACHE where current, the rest from the micro-batcher or a
+    threadpool forward. A request picked for profiling skips cache and
+    batcher: its whole forward runs in one threadpool thread under the
+    profiler (see profiled_shard_outputs). Returns (seg_probs, nbo_probs,
+    score).
+    """
+    snapshot = ENSEMBLE.snapshot()
+    versions = {sid: snapshot.shard_versions[sid] for sid in snapshot.voting_shards()}
+    request = PROFILE_REQUEST.get()
+    if request is not None:
+        outs = await run_in_threadpool(profiled_shard_outputs, snapshot, features[None, :], list(versions), request)
+        return aggregate_shard_outputs({sid: (seg[0], nbo[0], float(score[0])) for sid, (seg, nbo, score) in outs.items()})
+
+    found, missing = PREDICTION_CACHE.get(cid, versions) if PREDICTION_CACHE is not None else ({}, list(versions))
+
+    if missing:
+        if BATCHER is not None and not found:
+            # the batch may run on a newer snapshot; cache under its versions
+            snapshot, fresh = await BATCHER.submit(features)
+        else:
+            outs = await run_in_threadpool(snapshot.shard_outputs, features[None, :], missing)
+            fresh = {sid: (seg[0], nbo[0], float(score[0])) for sid, (seg, nbo, score) in outs.items()}
+        if PREDICTION_CACHE is not None:
+            PREDICTION_CACHE.put(cid, snapshot.shard_versions, fresh)
+        found.update(fresh)
+
+    return aggregate_shard_outputs(found)
 
 @app.get("/health")
 def health():
+    if SHARED is not None:
+        return {"status": "ok", "shared_state": SHARED.stats()}
     return {"status": "ok"}
 
 # ------------------------------------------------------------
 # 1️⃣ SMART PREDICT (AUTO PRE/POST)
 # ------------------------------------------------------------
 @app.post("/predict", response_model=PredictResponse)
-def predict(req: PredictRequest):
+async def predict(req: PredictRequest):
     cid = req.customer_id
 
     if cid not in ID_TO_RECORD:
@@ -628,7 +3977,7 @@ def predict(req: PredictRequest):
         )
 
     rec = ID_TO_RECORD[cid]
-    seg_probs, nbo_probs, score_pred = ENSEMBLE.predict_raw(rec.features)
+    seg_probs, nbo_probs, score_pred = await predict_customer(cid, rec.features)
 
     # If customer has been unlearned → force baseline in business view
     if cid in UNLEARNED_CUSTOMERS:
@@ -660,13 +4009,201 @@ def predict(req: PredictRequest):
         raw_score_pred=float(score_pred),
     )
 
+@app.get("/predict/batcher_stats")
+def predict_batcher_stats():
+    """
+    Micro-batcher configuration and live statistics (batch-size histogram,
+    queue-wait and forward-pass latency percentiles).
+    """
+    if BATCHER is None:
+        return {"enabled": False}
+    return BATCHER.stats()
+
+@app.get("/predict/engine_stats")
+def predict_engine_stats():
+    """
+    Inference engine in use, how many times it was built (once per
+    published snapshot), fallbacks to torch and the worst probe error.
+    """
+    return {**ENGINE_STATS, "tolerance": INFERENCE_TOLERANCE, "active": ENSEMBLE.snapshot().engine()[0].name}
+
+@app.get("/predict/cache_stats")
+def predict_cache_stats():
+    """
+    Prediction cache counters (hits, misses, evictions, invalidations) and
+    the current ensemble version.
+    """
+    if PREDICTION_CACHE is None:
+        return {"enabled": False, "ensemble_version": ENSEMBLE.version}
+    return {**PREDICTION_CACHE.stats(), "ensemble_version": ENSEMBLE.version}
+
+# ------------------------------------------------------------
+# 1️⃣b BATCH PREDICT (ONE ENSEMBLE PASS FOR MANY ROWS)
+# ------------------------------------------------------------
+def lookup_persona_features(cids: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Normalized persona features for a list of ids as one matrix.
+    Returns (X, known); rows of unknown ids are left zero.
+    """
+    X = np.zeros((len(cids), len(FEATURE_COLUMNS)), dtype=np.float32)
+    if isinstance(ID_TO_RECORD, PersonaTable):
+        codes = np.array([ID_TO_RECORD.code_of.get(c, -1) for c in cids], dtype=np.int64)
+        known = codes >= 0
+        X[known] = ID_TO_RECORD.features[codes[known]]
+        return X, known
+
+    known = np.zeros(len(cids), dtype=bool)
+    for i, c in enumerate(cids):
+        rec = ID_TO_RECORD.get(c)
+        if rec is not None:
+            X[i] = rec.features
+            known[i] = True
+    return X, known
+
+@app.post("/predict_batch", response_model=PredictBatchResponse)
+@profilable("predict_batch")
+def predict_batch(req: PredictBatchRequest):
+    """
+    Score many customers (and/or raw feature rows) with a single batched
+    ensemble pass. Same rules as /predict: unknown ids get the baseline
+    outright, unlearned customers get the baseline in the business view.
+    """
+    ids = list(req.customer_ids)
+    X_ids, known = lookup_persona_features(ids)
+    X_raw = np.asarray(req.features, dtype=np.float32).reshape(-1, len(FEATURE_COLUMNS))
+    X = np.concatenate([X_ids, (X_raw - FEATURE_MIN) / FEATURE_RANGE]).astype(np.float32)
+    n = len(X)
+
+    evaluate = np.concatenate([known, np.ones(len(X_raw), dtype=bool)])
+    seg_probs = np.tile(np.float32(0.33), (n, 3))
+    nbo_probs = np.tile(BASELINE_NBO, (n, 1))
+    raw_score = np.full(n, BASELINE_SCORE, dtype=np.float32)
+    if evaluate.any():
+        seg_probs[evaluate], nbo_probs[evaluate], raw_score[evaluate] = ENSEMBLE.predict_batch(X[evaluate])
+
+    forgotten = np.array([c in UNLEARNED_CUSTOMERS for c in ids] + [False] * len(X_raw), dtype=bool)
+    baseline = ~evaluate | forgotten
+
+    seg_names = np.array([SEGMENT_NAMES[i] for i in range(3)], dtype=object)
+    card_names = np.array([CARD_NAMES[i] for i in range(3)], dtype=object)
+    segment = np.where(baseline, "Unprofiled / Default", seg_names[seg_probs.argmax(axis=1)])
+    nbo = np.where(baseline, "Silver (Baseline)", card_names[nbo_probs.argmax(axis=1)])
+    score = np.where(baseline, BASELINE_SCORE, raw_score)
+
+    names = [ID_TO_RECORD[c].customer_name if k else "Unknown" for c, k in zip(ids, known)]
+
+    return PredictBatchResponse(
+        customer_ids=ids + [None] * len(X_raw),
+        customer_names=names + [None] * len(X_raw),
+        segment=segment.tolist(),
+        nbo=nbo.tolist(),
+        score=score.tolist(),
+        baseline=baseline.tolist(),
+        raw_segment_probs=seg_probs.tolist(),
+        raw_nbo_probs=nbo_probs.tolist(),
+        raw_score_pred=raw_score.tolist(),
+    )
+
 # ------------------------------------------------------------
 # 2️⃣ SINGLE-CUSTOMER UNLEARNING
 # ------------------------------------------------------------
-@app.post("/unlearn_trigger", response_model=UnlearnResponse)
-def unlearn_trigger(req: UnlearnRequest):
+def certify_unlearning(customer_ids: List[str], pre: Dict[str, np.ndarray], snapshot: EnsembleSnapshot) -> Dict[str, Any]:
+    """
+    Drift check for an approximate update: on snapshot, every customer's
+    NBO cross-entropy must have risen by APPROX_MIN_CE_CHANGE, and their KL
+    to BASELINE_NBO must not exceed APPROX_MAX_BASELINE_KL_RATIO times the
+    pre-unlearning one. pre holds compute_metrics_batch rows of customer_ids.
+    Returns {"passed", "min_nbo_ce_change", "max_baseline_kl_ratio"}.
+    """
+    post = compute_metrics_batch(snapshot, customer_ids)
+    gap_pre = np.maximum(kl_rows(pre["nbo_probs"], BASELINE_NBO), 1e-12)
+    result = {
+        "min_nbo_ce_change": float(np.min(post["nbo_ce"] - pre["nbo_ce"])),
+        "max_baseline_kl_ratio": float(np.max(kl_rows(post["nbo_probs"], BASELINE_NBO) / gap_pre)),
+    }
+    result["passed"] = (
+        result["min_nbo_ce_change"] >= APPROX_MIN_CE_CHANGE
+        and result["max_baseline_kl_ratio"] <= APPROX_MAX_BASELINE_KL_RATIO
+    )
+    return result
+
+def run_unlearning(customer_ids: List[str], mode: str = "exact") -> Dict[str, Any]:
+    """
+    Forget customer_ids and record pre/post metrics for each. Runs on the
+    unlearning job thread. mode "exact" retrains each affected shard;
+    "approximate" tries unlearn_customers_approx first and falls back to
+    the exact retrain per shard when certify_unlearning rejects it.
+    Returns {"shards_retrained", "train_report": {shard: report},
+    "modes": {shard: "exact" | "approximate" | "exact_fallback"}}.
+    In shared mode this worker first catches up with the others, under
+    the cross-worker lock, and skips customers already forgotten.
+    """
+    with model_write_lock():
+        if SHARED is not None:
+            sync_shared_state()
+            customer_ids = [cid for cid in customer_ids if cid not in ENSEMBLE.forgotten]
+            if not customer_ids:
+                return {"shards_retrained": [], "train_report": {}, "modes": {}}
+        return _forget(customer_ids, mode)
+
+def _forget(customer_ids: List[str], mode: str) -> Dict[str, Any]:
     global TRAIN_RECORDS
+    reset_train_progress({ENSEMBLE.shard_for(cid) for cid in customer_ids})
+
+    # Pre-metrics for all customers (raw model view), one forward pass
+    with STATS.timer("stage_seconds", stage="metrics_pre"):
+        pre_metrics = compute_metrics_batch(ENSEMBLE, customer_ids)
+
+    if mode == "approximate":
+        certification: Dict[int, Dict[str, Any]] = {}
+
+        def certify(shard_id: int, candidate: EnsembleSnapshot) -> bool:
+            rows = [i for i, cid in enumerate(customer_ids) if ENSEMBLE.shard_for(cid) == shard_id]
+            certification[shard_id] = certify_unlearning(
+                [customer_ids[i] for i in rows],
+                {k: v[rows] for k, v in pre_metrics.items()},
+                candidate,
+            )
+            return certification[shard_id]["passed"]
+
+        with STATS.timer("stage_seconds", stage="retrain_approximate"):
+            reports, TRAIN_RECORDS = ENSEMBLE.unlearn_customers_approx(
+                customer_ids,
+                TRAIN_RECORDS,
+                certify,
+                ascent_steps=APPROX_ASCENT_STEPS,
+                finetune_steps=APPROX_FINETUNE_STEPS,
+                max_retain_loss_increase=APPROX_MAX_RETAIN_LOSS_INCREASE,
+            )
+        for sid, report in reports.items():
+            report["certification"] = certification.get(sid)
+        shards_retrained = sorted(reports)
+        modes = {sid: r["mode"] for sid, r in reports.items()}
+    else:
+        with STATS.timer("stage_seconds", stage="retrain_exact"):
+            shards_retrained, TRAIN_RECORDS = ENSEMBLE.unlearn_customers_batch(customer_ids, TRAIN_RECORDS)
+        snapshot = ENSEMBLE.snapshot()
+        reports = {sid: snapshot.shards[sid].report for sid in shards_retrained}
+        modes = {sid: "exact" for sid in shards_retrained}
+
+    # Post-metrics + store entries
+    with STATS.timer("stage_seconds", stage="metrics_post"):
+        post_metrics = compute_metrics_batch(ENSEMBLE, customer_ids)
+        entries = build_metrics_entries(customer_ids, pre_metrics, post_metrics)
+    for cid, entry in entries.items():
+        entry["unlearning_mode"] = modes.get(ENSEMBLE.shard_for(cid), mode)
+    AUDIT.put_metrics(entries, ENSEMBLE.shard_for)
+
+    with STATS.timer("stage_seconds", stage="checkpoint"):
+        checkpoint_system()
+    return {
+        "shards_retrained": shards_retrained,
+        "train_report": reports,
+        "modes": modes,
+    }
 
+@app.post("/unlearn_trigger", response_model=UnlearnResponse)
+async def unlearn_trigger(req: UnlearnRequest):
     cid = req.customer_id
 
     if cid not in ID_TO_RECORD:
@@ -675,30 +4212,34 @@ def unlearn_trigger(req: UnlearnRequest):
             retrained_shard=-1,
         )
 
-    # Pre-metrics for this customer (raw model view)
-    pre = compute_metrics(ENSEMBLE, ID_TO_RECORD[cid])
+    mode = req.mode or UNLEARN_MODE
+    if mode not in UNLEARN_MODES:
+        return UnlearnResponse(
+            message=f"Unknown unlearning mode {mode!r}, use one of {list(UNLEARN_MODES)}",
+            retrained_shard=-1,
+        )
 
-    # Demo SISA unlearning
-    shard_id, TRAIN_RECORDS = ENSEMBLE.unlearn_customer(cid, TRAIN_RECORDS)
+    # Forgotten in the business view right away; the retrain runs as a job
     UNLEARNED_CUSTOMERS.add(cid)
-
-    # Post-metrics (raw)
-    post = compute_metrics(ENSEMBLE, ID_TO_RECORD[cid])
-
-    METRICS_DB[cid] = build_metrics_entry(cid, pre, post)
+    # submit logs to the audit DB (a SQLite write that may wait on other
+    # workers): keep it off the event loop
+    job = await run_in_threadpool(UNLEARN_QUEUE.submit, [cid], [], mode, profile=request_profile_kind())
+    if req.wait:
+        await run_in_threadpool(job.done.wait)
 
     return UnlearnResponse(
-        message=f"Unlearning completed for {cid}",
-        retrained_shard=shard_id,
+        message=f"Unlearning {'completed' if job.status == 'done' else job.status} for {cid}",
+        retrained_shard=job.shards[0],
+        job_id=job.job_id,
+        status=job.status,
+        mode=job_modes(job).get(str(job.shards[0]), mode),
     )
 
 # ------------------------------------------------------------
 # 3️⃣ MULTI-CUSTOMER (BATCH) UNLEARNING
 # ------------------------------------------------------------
 @app.post("/unlearn_batch", response_model=UnlearnBatchResponse)
-def unlearn_batch(req: UnlearnBatchRequest):
-    global TRAIN_RECORDS
-
+async def unlearn_batch(req: UnlearnBatchRequest):
     valid_ids: List[str] = []
     not_found: List[str] = []
 
@@ -709,6 +4250,15 @@ def unlearn_batch(req: UnlearnBatchRequest):
         else:
             not_found.append(cid)
 
+    mode = req.mode or UNLEARN_MODE
+    if mode not in UNLEARN_MODES:
+        return UnlearnBatchResponse(
+            message=f"Unknown unlearning mode {mode!r}, use one of {list(UNLEARN_MODES)}",
+            customers_unlearned=[],
+            customers_not_found=not_found,
+            shards_retrained=[],
+        )
+
     if not valid_ids:
         return UnlearnBatchResponse(
             message="No valid customer IDs provided.",
@@ -717,24 +4267,17 @@ def unlearn_batch(req: UnlearnBatchRequest):
             shards_retrained=[],
         )
 
-    # Pre-metrics for all valid customers
-    pre_metrics: Dict[str, Dict[str, Any]] = {
-        cid: compute_metrics(ENSEMBLE, ID_TO_RECORD[cid]) for cid in valid_ids
-    }
-
-    # Batch unlearning via demo SISA (one shard)
-    shards_retrained, TRAIN_RECORDS = ENSEMBLE.unlearn_customers_batch(valid_ids, TRAIN_RECORDS)
-
-    # Mark as unlearned
+    # Mark as unlearned, then queue one job for the whole list
     for cid in valid_ids:
         UNLEARNED_CUSTOMERS.add(cid)
-
-    # Post-metrics + store entries
-    for cid in valid_ids:
-        post = compute_metrics(ENSEMBLE, ID_TO_RECORD[cid])
-        METRICS_DB[cid] = build_metrics_entry(cid, pre_metrics[cid], post)
-
-    msg = f"Successfully unlearned {len(valid_ids)} customers."
+    job = await run_in_threadpool(UNLEARN_QUEUE.submit, valid_ids, not_found, mode, profile=request_profile_kind())
+    if req.wait:
+        await run_in_threadpool(job.done.wait)
+
+    if job.status == "done":
+        msg = f"Successfully unlearned {len(valid_ids)} customers."
+    else:
+        msg = f"Unlearning {job.status} for {len(valid_ids)} customers."
     if not_found:
         msg += f" {len(not_found)} customers not found."
 
@@ -742,14 +4285,82 @@ def unlearn_batch(req: UnlearnBatchRequest):
         message=msg,
         customers_unlearned=valid_ids,
         customers_not_found=not_found,
-        shards_retrained=shards_retrained,
+        shards_retrained=job.shards,
+        job_id=job.job_id,
+        status=job.status,
+        modes=job_modes(job),
+    )
+
+# ------------------------------------------------------------
+# 3️⃣b UNLEARNING JOB STATUS
+# ------------------------------------------------------------
+def audit_jobs(jobs: List[UnlearnJob]):
+    """Log each customer's status change (queued / training / done / ...) to the audit store."""
+    for job in jobs:
+        modes = job_modes(job)
+        rows = []
+        for cid in job.customer_ids:
+            shard = ENSEMBLE.shard_for(cid)
+            rows.append((cid, shard, modes.get(str(shard), job.mode)))
+        AUDIT.log_events(
+            job.status, rows, job_id=job.job_id, batch_id=job.batch_id,
+            detail={"error": job.error} if job.error else None,
+        )
+
+def job_modes(job: UnlearnJob) -> Dict[str, str]:
+    """Shard -> unlearning mode used for this job's shards (once done)."""
+    modes = (job.result or {}).get("modes", {})
+    return {str(sid): modes[sid] for sid in job.shards if sid in modes}
+
+@app.get("/unlearn_jobs/{job_id}", response_model=UnlearnJobResponse)
+def unlearn_job_status(job_id: str):
+    """
+    Status of an unlearning job: queued / training (with epoch progress
+    per shard) / done (with the resulting metrics) / failed / cancelled.
+    """
+    job = UNLEARN_QUEUE.get(job_id) if UNLEARN_QUEUE is not None else None
+    if job is None:
+        return UnlearnJobResponse(job_id=job_id, status="not_found")
+
+    now = time.time()
+    resp = UnlearnJobResponse(
+        job_id=job.job_id,
+        status=job.status,
+        customer_ids=job.customer_ids,
+        customers_not_found=job.customers_not_found,
+        shards=job.shards,
+        mode=job.mode,
+        modes=job_modes(job),
+        batch_id=job.batch_id,
+        queued_s=(job.started_at or job.finished_at or now) - job.created_at,
+        training_s=(job.finished_at or now) - job.started_at if job.started_at else None,
+        error=job.error,
+        profile=job.profile_file,
     )
+    if job.status == "training":
+        resp.progress = {
+            str(sid): {"epoch": TRAIN_EPOCHS_DONE[sid], "epochs": TRAIN_EPOCHS_TOTAL[sid]}
+            for sid in job.shards if sid < len(TRAIN_EPOCHS_DONE)
+        }
+    elif job.status == "done":
+        resp.metrics = AUDIT.metrics_of(job.customer_ids)
+        resp.train_report = {str(sid): r for sid, r in (job.result or {}).get("train_report", {}).items()}
+    return resp
+
+@app.get("/unlearn_jobs")
+def unlearn_jobs_stats():
+    """Job queue counters: jobs submitted vs. retrains actually run."""
+    return UNLEARN_QUEUE.stats()
 
 @app.get("/customers")
 def get_customers():
     """
-    Expose customers.csv as JSON.
+    Expose customers.csv as JSON. In streaming mode the rows are read
+    back from the source file chunk by chunk instead of kept in memory.
     """
+    if INGEST_MODE == "stream":
+        return StreamingResponse(iter_customers_json(DATA_PATH), media_type="application/json")
+
     customers = []
     for rec in BASE_PERSONAS:
         customers.append(rec.full_data)
@@ -764,7 +4375,16 @@ def metrics(customer_id: str):
     Get regulator-grade metrics + interpretation for a specific customer.
     Example: GET /metrics?customer_id=1002
     """
-    if customer_id not in METRICS_DB:
+    entry = AUDIT.metrics_of([customer_id]).get(customer_id)
+    if entry is None and customer_id in UNLEARNED_CUSTOMERS:
+        return MetricsResponse(
+            result={
+                "error": f"Unlearning of customer_id={customer_id} is still running. "
+                         "Query metrics again once its job is done."
+            }
+        )
+
+    if entry is None:
         return MetricsResponse(
             result={
                 "error": f"No metrics found for customer_id={customer_id}. "
@@ -772,45 +4392,372 @@ def metrics(customer_id: str):
             }
         )
 
-    return MetricsResponse(result=METRICS_DB[customer_id])
+    return MetricsResponse(result=entry)
+
+# ------------------------------------------------------------
+# 4️⃣b POPULATION DRIFT REPORT (PRISTINE VS CURRENT)
+# ------------------------------------------------------------
+def _drift_summary(values: np.ndarray) -> Dict[str, float]:
+    if not len(values):
+        return {"mean": 0.0, "p50": 0.0, "p99": 0.0, "max": 0.0}
+    p50, p99 = np.percentile(values, [50, 99])
+    return {"mean": float(np.mean(values)), "p50": float(p50), "p99": float(p99), "max": float(np.max(values))}
+
+@app.get("/drift_report")
+def drift_report(top: int = 10, chunk: int = 65536):
+    """
+    Compare every customer's raw predictions under the pristine (freshly
+    trained) ensemble with the current one, in chunks of chunk customers.
+    Retained customers should be unchanged; customers the models have
+    forgotten should have moved. Customers added via /ingest were never
+    seen by the pristine models and are reported on their own. top lists
+    the most drifted retained ones.
+    """
+    pristine = PRISTINE_SNAPSHOT
+    if pristine is None:
+        return {"error": "No pristine ensemble to compare against."}
+    current = ENSEMBLE.snapshot()
+    forgotten = ENSEMBLE.forgotten
+    ingested = {row["customer_id"] for batch in INGESTED for row in batch["customers"]}
+    customer_ids = list(ID_TO_RECORD)
+
+    # group per customer: 0 retained, 1 forgotten, 2 ingested after training
+    cols: Dict[int, Dict[str, List[np.ndarray]]] = {
+        g: {"kl": [], "l2": [], "nbo_changed": [], "seg_changed": [], "score": [], "ce": []} for g in (0, 1, 2)
+    }
+    top_kl, top_ids = np.empty(0), []
+    for i in range(0, len(customer_ids), chunk):
+        ids = customer_ids[i:i + chunk]
+        before = compute_metrics_batch(pristine, ids)
+        after = compute_metrics_batch(current, ids)
+        groups = np.fromiter(
+            (2 if c in ingested else 1 if c in forgotten else 0 for c in ids), dtype=np.int8, count=len(ids)
+        )
+        kl_ = kl_rows(before["nbo_probs"], after["nbo_probs"])
+        columns = {
+            "kl": kl_,
+            "l2": np.linalg.norm(before["nbo_probs"] - after["nbo_probs"], axis=-1),
+            "nbo_changed": np.argmax(before["nbo_probs"], -1) != np.argmax(after["nbo_probs"], -1),
+            "seg_changed": np.argmax(before["seg_probs"], -1) != np.argmax(after["seg_probs"], -1),
+            "score": np.abs(before["score_pred"] - after["score_pred"]),
+            "ce": after["nbo_ce"] - before["nbo_ce"],
+        }
+        for g in cols:
+            mask = groups == g
+            for k, v in columns.items():
+                cols[g][k].append(v[mask])
+
+        # running top-k of retained customers by KL
+        kept = np.flatnonzero(groups == 0)
+        top_kl = np.concatenate([top_kl, kl_[kept]])
+        top_ids += [ids[j] for j in kept]
+        if len(top_kl) > top:
+            keep = np.argsort(-top_kl, kind="stable")[:top]
+            top_kl, top_ids = top_kl[keep], [top_ids[j] for j in keep]
+
+    def group(g: int) -> Dict[str, Any]:
+        c = {k: np.concatenate(v) if v else np.empty(0) for k, v in cols[g].items()}
+        return {
+            "customers": int(len(c["kl"])),
+            "nbo_kl_pristine_to_current": _drift_summary(c["kl"]),
+            "nbo_l2_max": float(np.max(c["l2"])) if len(c["l2"]) else 0.0,
+            "nbo_changed": int(np.count_nonzero(c["nbo_changed"])),
+            "segment_changed": int(np.count_nonzero(c["seg_changed"])),
+            "score_abs_change": _drift_summary(c["score"]),
+            "nbo_ce_change_mean": float(np.mean(c["ce"])) if len(c["ce"]) else 0.0,
+        }
+
+    order = np.argsort(-top_kl, kind="stable")
+    retained, unlearned = group(0), group(1)
+    return {
+        "ensemble_version": current.version,
+        "customers": len(customer_ids),
+        "retained": retained,
+        "unlearned": unlearned,
+        "ingested": group(2),
+        "most_changed_retained": [
+            {"customer_id": top_ids[j], "nbo_kl": float(top_kl[j])} for j in order
+        ],
+        "interpretation": (
+            f"{retained['nbo_changed']} of {retained['customers']} retained customers "
+            f"changed NBO since training (max KL {retained['nbo_kl_pristine_to_current']['max']:.4f}); "
+            f"{unlearned['nbo_changed']} of {unlearned['customers']} forgotten customers changed NBO "
+            f"(mean NBO cross-entropy change {unlearned['nbo_ce_change_mean']:+.3f})."
+        ),
+    }
+
+# ------------------------------------------------------------
+# 4️⃣c AUDIT LOG (EVENTS + METRICS HISTORY)
+# ------------------------------------------------------------
+AUDIT_PAGE_MAX = 1000
+
+@app.get("/audit/events", response_model=AuditPage)
+def audit_events(
+    customer_id: Optional[str] = None,
+    shard: Optional[int] = None,
+    event: Optional[str] = None,
+    mode: Optional[str] = None,
+    job_id: Optional[str] = None,
+    generation: Optional[int] = None,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    after_id: int = 0,
+    limit: int = 100,
+):
+    """
+    Unlearning event log, oldest first, filtered by any of the parameters
+    (since/until are unix timestamps). Page with next_after_id.
+    """
+    items, next_after_id = AUDIT.query(
+        "events",
+        {"customer_id": customer_id, "shard": shard, "event": event, "mode": mode,
+         "job_id": job_id, "generation": generation},
+        since, until, after_id, max(1, min(limit, AUDIT_PAGE_MAX)),
+    )
+    return AuditPage(items=items, next_after_id=next_after_id)
+
+@app.get("/audit/metrics", response_model=AuditPage)
+def audit_metrics(
+    customer_id: Optional[str] = None,
+    shard: Optional[int] = None,
+    mode: Optional[str] = None,
+    generation: Optional[int] = None,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    after_id: int = 0,
+    limit: int = 100,
+):
+    """
+    Every stored /metrics entry (all generations unless one is given),
+    oldest first. Page with next_after_id.
+    """
+    items, next_after_id = AUDIT.query(
+        "metrics",
+        {"customer_id": customer_id, "shard": shard, "mode": mode, "generation": generation},
+        since, until, after_id, max(1, min(limit, AUDIT_PAGE_MAX)),
+    )
+    return AuditPage(items=items, next_after_id=next_after_id)
 
 # ------------------------------------------------------------
 # 5️⃣ RESET – FULL SYSTEM RESET
 # ------------------------------------------------------------
 @app.post("/reset")
-def reset_system():
-    global BASE_PERSONAS, NAME_TO_ID, ID_TO_RECORD
-    global ALL_RECORDS, TRAIN_RECORDS, FEATURE_MIN, FEATURE_MAX, FEATURE_RANGE
-    global ENSEMBLE, SHARD_MAP, UNLEARNED_CUSTOMERS, METRICS_DB
+def reset_system(force: bool = False):
+    """
+    Back to the freshly trained state. Restores the pristine snapshot in
+    milliseconds; retrains from scratch only when the data file changed or
+    force=true.
+    """
+    # wait for an in-flight retrain; queued erasures are moot after a reset
+    with UNLEARN_QUEUE.run_lock, model_write_lock():
+        UNLEARN_QUEUE.cancel_pending()
+        retrained = force or not reset_from_pristine()
+        if retrained:
+            init_system(restore=False)
+
+    return {
+        "message": (
+            "Full system reset complete. All models retrained, personas rebuilt, and unlearning cleared."
+            if retrained else
+            "Full system reset complete. Pristine models restored and unlearning cleared."
+        ),
+        "retrained": retrained,
+        "total_customers": len(ID_TO_RECORD),
+        "augmented_records": len(TRAIN_RECORDS),
+        "shards": ENSEMBLE.num_shards
+    }
+
+# ------------------------------------------------------------
+# 6️⃣ INTERNAL STATS (PROMETHEUS TEXT FORMAT)
+# ------------------------------------------------------------
+def _shard_records() -> Optional[Dict[Any, int]]:
+    if ENSEMBLE is None:
+        return None
+    return {
+        (("shard", sid),): sum(len(sl) for sl in slices)
+        for sid, slices in list(ENSEMBLE.shard_slices.items())
+    }
 
-    # 1️⃣ Reload base customers (e.g., 1001–1007)
-    BASE_PERSONAS, NAME_TO_ID, ID_TO_RECORD = load_customers_from_csv("customers.csv")
+STATS.gauge("customers", lambda: len(ID_TO_RECORD), "Customers loaded from the data file")
+STATS.gauge("training_records", lambda: len(TRAIN_RECORDS), "Live (not unlearned) augmented training rows")
+STATS.gauge("shard_records", _shard_records, "Live training rows per shard")
+STATS.gauge("unlearned_customers", lambda: len(UNLEARNED_CUSTOMERS), "Customers currently forgotten")
+STATS.gauge("ensemble_version", lambda: ENSEMBLE.version if ENSEMBLE is not None else None,
+            "Version of the published ensemble snapshot")
+STATS.gauge("unlearn_pending_jobs", lambda: UNLEARN_QUEUE.stats()["pending_jobs"] if UNLEARN_QUEUE else None,
+            "Erasure jobs waiting for a retrain")
+STATS.gauge("predict_cache_entries", lambda: PREDICTION_CACHE.stats()["entries"] if PREDICTION_CACHE else None,
+            "Customer x shard entries in the /predict cache")
+
+@app.get("/internal/stats", response_class=PlainTextResponse)
+def internal_stats():
+    """
+    Stage latency histograms, training counters and state gauges in the
+    Prometheus text exposition format, for scraping.
+    """
+    return PlainTextResponse(STATS.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
-    # 2️⃣ Rebuild augmented training set
-    ALL_RECORDS = augment_personas(list(ID_TO_RECORD.values()), factor=AUG_FACTOR)
+# ------------------------------------------------------------
+# 6️⃣b PROFILES (ON-DEMAND / SAMPLED PROFILING)
+# ------------------------------------------------------------
+@app.get("/internal/profiles")
+def internal_profiles():
+    """Saved profiles, newest first (see UNLEARNAI_PROFILE)."""
+    return {
+        "enabled": PROFILE_ENABLED,
+        "dir": PROFILE_DIR,
+        "sample_n": PROFILE_SAMPLE_N,
+        "profiles": list_profiles(),
+    }
 
-    # 3️⃣ Normalize ALL_RECORDS (returns 4 vals)
-    ALL_RECORDS, FEATURE_MIN, FEATURE_MAX, FEATURE_RANGE = normalize_features(ALL_RECORDS)
+@app.get("/internal/profiles/{file_name}")
+def internal_profile_file(file_name: str):
+    """Download one profile file (.txt summary, .prof pstats or .json chrome trace)."""
+    path = os.path.join(PROFILE_DIR, os.path.basename(file_name))
+    if not os.path.isfile(path):
+        return JSONResponse({"detail": f"Profile {file_name} not found"}, status_code=404)
+    return FileResponse(path)
 
-    # 4️⃣ Apply SAME normalization to canonical personas
-    for rec in ID_TO_RECORD.values():
-        rec.features = (rec.features - FEATURE_MIN) / FEATURE_RANGE
+# ------------------------------------------------------------
+# 7️⃣ ONLINE INGEST (NEW CUSTOMERS, SHARD-LOCAL RETRAIN)
+# ------------------------------------------------------------
+@app.post("/ingest", response_model=IngestResponse)
+def ingest(req: IngestRequest):
+    """
+    Add new customers without a full retrain: only the shards they hash to
+    retrain, from their last slice. Features are scaled with the frozen
+    training min/max; see /ingest/stats for how far new data drifts.
+    """
+    if INGEST_MODE == "stream":
+        return JSONResponse({"detail": "Online ingestion is not supported with UNLEARNAI_INGEST=stream"}, status_code=400)
+    if len(req.customers) > INGEST_MAX_BATCH:
+        return JSONResponse(
+            {"detail": f"At most {INGEST_MAX_BATCH} customers per request (UNLEARNAI_INGEST_MAX_BATCH)"},
+            status_code=413,
+        )
 
-    # 5️⃣ Reset TRAIN_RECORDS (full augmented dataset)
-    TRAIN_RECORDS = ALL_RECORDS.copy()
+    # one model writer at a time: waits for an in-flight unlearning retrain
+    with UNLEARN_QUEUE.run_lock:
+        result = ingest_customers([c.model_dump() for c in req.customers])
 
-    # 6️⃣ Rebuild SISA ensemble
-    ENSEMBLE = SISAEnsemble(num_shards=NUM_SHARDS)
-    SHARD_MAP = ENSEMBLE.shard_records(TRAIN_RECORDS)
-    ENSEMBLE.train_all_shards(SHARD_MAP, epochs=100)
+    msg = f"Ingested {len(result['ingested'])} customers."
+    if result["rejected"]:
+        msg += f" {len(result['rejected'])} rejected."
+    return IngestResponse(
+        message=msg,
+        ingested=result["ingested"],
+        rejected=result["rejected"],
+        shards_updated=result["shards_updated"],
+        train_report={str(sid): report for sid, report in result["train_report"].items()},
+        outside_train_range=result["outside_train_range"],
+    )
 
-    # 7️⃣ Clear unlearning + metrics
-    UNLEARNED_CUSTOMERS = set()
-    METRICS_DB = {}
+@app.get("/ingest/stats")
+def ingest_stats():
+    """
+    Running raw-feature stats over the training data including ingested
+    customers, next to the frozen min/max the models were fitted with.
+    """
+    if FEATURE_STATS is None:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "ingested_customers": sum(len(batch["customers"]) for batch in INGESTED),
+        "ingest_batches": len(INGESTED),
+        "rows": FEATURE_STATS.count,
+        "features": FEATURE_STATS.summary(),
+        "train_min": dict(zip(FEATURE_COLUMNS, map(float, FEATURE_MIN))),
+        "train_max": dict(zip(FEATURE_COLUMNS, map(float, FEATURE_MAX))),
+    }
+
+# ------------------------------------------------------------
+# 8️⃣ SIMILAR CUSTOMERS (EMBEDDING INDEX) + FORGETTING CHECK
+# ------------------------------------------------------------
+@app.post("/similar", response_model=SimilarResponse)
+def similar(req: SimilarRequest):
+    """
+    The k retained customers whose embeddings (MultiTaskNN.encode of a
+    shard model) are closest, by cosine similarity, to a known customer
+    or a raw feature row. Each shard model embeds into its own space, so
+    hits are ranked per shard and never merged: a customer is searched in
+    their own shard (every shard with all_shards), a feature row in every
+    shard, k hits each. Unlearned customers are never returned.
+    """
+    if not 1 <= req.k <= SIMILAR_MAX_K:
+        return JSONResponse({"detail": f"k must be between 1 and {SIMILAR_MAX_K}"}, status_code=400)
+    if (req.customer_id is None) == (req.features is None):
+        return JSONResponse({"detail": "Pass either customer_id or features"}, status_code=400)
+
+    cid, sid, shard_ids = req.customer_id, None, None
+    if cid is not None:
+        if cid not in ID_TO_RECORD:
+            return SimilarResponse(message=f"Customer {cid} not found", customer_id=cid)
+        if cid in UNLEARNED_CUSTOMERS:
+            return SimilarResponse(message=f"Customer {cid} has been unlearned", customer_id=cid)
+        X = lookup_persona_features([cid])[0]
+        sid = ENSEMBLE.shard_for(cid)
+        shard_ids = None if req.all_shards else [sid]
+    else:
+        X = ((np.asarray(req.features, dtype=np.float32).reshape(1, len(FEATURE_COLUMNS)) - FEATURE_MIN) / FEATURE_RANGE).astype(np.float32)
+
+    # erasures queued but not retrained yet are still indexed: ask for enough to skip them
+    pending = UNLEARNED_CUSTOMERS - ENSEMBLE.forgotten
+    hits = EMBEDDING_INDEX.search(ENSEMBLE.snapshot(), X, req.k + 1 + len(pending), shard_ids)[0]
+    neighbours = {
+        str(s): [
+            {"customer_id": c, "customer_name": ID_TO_RECORD[c].customer_name, "similarity": sim}
+            for c, sim in shard_hits
+            if c != cid and c not in UNLEARNED_CUSTOMERS
+        ][:req.k]
+        for s, shard_hits in hits.items()
+    }
+    return SimilarResponse(
+        message=f"Similar customers in {len(neighbours)} shard(s)", customer_id=cid, shard=sid, neighbours=neighbours,
+    )
+
+@app.get("/similar/forgetting_check")
+def forgetting_check(customer_id: str, k: int = 5):
+    """
+    Embedding-space evidence that a customer was forgotten: they are no
+    longer in their shard's index, and how close their features now sit
+    to the retained customers' clusters -- their nearest retained
+    neighbours in the retrained shard model, next to how close a sample of
+    retained customers sits to its own nearest neighbour (nn_percentile:
+    share of that sample with a less similar nearest neighbour).
+    """
+    cid = customer_id
+    if cid not in ID_TO_RECORD:
+        return JSONResponse({"detail": f"Customer {cid} not found"}, status_code=404)
+    if cid not in ENSEMBLE.forgotten:
+        status = "pending" if cid in UNLEARNED_CUSTOMERS else "not unlearned"
+        return JSONResponse({"detail": f"Customer {cid} is {status}"}, status_code=409)
+
+    snapshot = ENSEMBLE.snapshot()
+    sid = ENSEMBLE.shard_for(cid)
+    shard, cids, emb = EMBEDDING_INDEX.blocks(snapshot)[sid]
+    # within the retrained shard's embedding space only
+    nearest = EMBEDDING_INDEX.search(snapshot, lookup_persona_features([cid])[0], k, [sid])[0].get(sid, [])
+    nn_sim = nearest[0][1] if nearest else None
+
+    # retained customers' own nearest neighbour (rank 0 is themselves)
+    ref_nn = np.empty(0, dtype=np.float32)
+    if len(cids) > 1:
+        rng = np.random.default_rng(0)
+        ref = rng.choice(len(cids), size=min(FORGETTING_CHECK_SAMPLE, len(cids)), replace=False)
+        ref_nn = top_k(emb, emb[ref], 2)[1][:, 1]
 
     return {
-        "message": "Full system reset complete. All models retrained, personas rebuilt, and unlearning cleared.",
-        "total_customers": len(ID_TO_RECORD),
-        "augmented_records": len(TRAIN_RECORDS),
-        "shards": ENSEMBLE.num_shards
+        "customer_id": cid,
+        "shard": sid,
+        "shard_version": snapshot.shard_versions[sid],
+        "in_index": EMBEDDING_INDEX.contains(cid),
+        "nearest_retained": [{"customer_id": c, "similarity": sim} for c, sim in nearest],
+        "nn_similarity": nn_sim,
+        "retained_nn_similarity": {**_drift_summary(ref_nn), "sample": len(ref_nn)},
+        "nn_percentile": float(np.mean(ref_nn < nn_sim) * 100) if nn_sim is not None and len(ref_nn) else None,
     }
+
+@app.get("/similar/index_stats")
+def similar_index_stats():
+    """Embedding index size and rebuild counters."""
+    return {**EMBEDDING_INDEX.stats(), "ensemble_version": ENSEMBLE.version}
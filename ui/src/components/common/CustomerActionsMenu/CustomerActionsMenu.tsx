@@ -34,8 +34,9 @@ export const CustomerActionsMenu: FC<CustomerActionsMenuProps> = ({
     const handleProceed = async () => {
         setLoading(true);
         try {
+            // resolves once the retrain job is done, not just queued
             await customerService.triggerUnlearn(customerId);
-            console.log('Successfully triggered unlearn for customer:', customerId);
+            console.log('Successfully unlearned customer:', customerId);
             setDialogOpen(false);
             setSuccessDialogOpen(true);
             onInvokeRightToForgotten?.();
@@ -30,6 +30,22 @@ export interface PredictResponse {
   raw_score_pred: number;
 }
 
+export interface UnlearnResponse {
+  message: string;
+  retrained_shard: number;
+  job_id: string | null;
+  status: string;
+  mode: string | null;
+}
+
+export interface UnlearnJobStatus {
+  job_id: string;
+  status: string; // queued | training | done | failed | cancelled | not_found
+  error: string | null;
+}
+
+const UNLEARN_POLL_INTERVAL_MS = 1000;
+
 class ApiService {
   async getCustomers(): Promise<Customer[]> {
     return httpClient.get<Customer[]>('/customers');
@@ -45,8 +61,30 @@ class ApiService {
     );
   }
 
-  async triggerUnlearn(customerId: string): Promise<unknown> {
-    return httpClient.post('/unlearn_trigger', { customer_id: customerId });
+  // Unlearning runs as a background job: poll it until the retrain is
+  // over, so callers only see success once /metrics has the result
+  async triggerUnlearn(customerId: string): Promise<UnlearnJobStatus> {
+    const resp = await httpClient.post<UnlearnResponse>('/unlearn_trigger', {
+      customer_id: customerId,
+    });
+    if (!resp.job_id) {
+      throw new Error(resp.message);
+    }
+    let job = await this.getUnlearnJob(resp.job_id);
+    while (job.status === 'queued' || job.status === 'training') {
+      await new Promise((resolve) => setTimeout(resolve, UNLEARN_POLL_INTERVAL_MS));
+      job = await this.getUnlearnJob(resp.job_id);
+    }
+    if (job.status !== 'done') {
+      throw new Error(job.error ?? `Unlearning ${job.status} for ${customerId}`);
+    }
+    return job;
+  }
+
+  async getUnlearnJob(jobId: string): Promise<UnlearnJobStatus> {
+    return httpClient.get<UnlearnJobStatus>(
+      `/unlearn_jobs/${encodeURIComponent(jobId)}`
+    );
   }
 
   async predict(customerId: string): Promise<PredictResponse> {